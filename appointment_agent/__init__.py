@@ -0,0 +1 @@
+"""Storage and scheduling building blocks for the Medical Appointment Agent."""
@@ -0,0 +1,283 @@
+"""Headless HTTP API for the booking conversation.
+
+    uvicorn appointment_agent.api:app --workers 4
+
+``POST /sessions`` starts a conversation and returns its ID with the welcome
+message; ``POST /sessions/{id}/messages`` runs one turn and returns the
+assistant's replies. ``GET /availability`` lists the earliest openings for
+a duration, optionally with one doctor or at one location; ``GET /metrics``
+is this worker's timers and counters in Prometheus text format.
+``POST /appointments/{id}/cancel`` and ``/reschedule`` free or move a booking
+by its appointment ID and return who was booked from the waitlist into the
+freed time; ``POST /waitlist`` adds a patient to it. State lives in
+``sessions.db``, so any worker can serve any turn; a turn loads the state
+without its history, claims the session so a second message for it gets a
+409 instead of running against the same state, and saves only what changed. ``GET /sessions/{id}``
+pages the history backwards with ``before``. Handlers do blocking SQLite and
+file I/O and run in the thread pool.
+"""
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from .changes import AppointmentChange, ChangeStatus, slots_record
+from .config import NEW_PATIENT_DURATION, RECURRING_PATIENT_DURATION, SESSION_HISTORY_PAGE, SESSION_TURN_LEASE_SECONDS
+from .engine import (
+    WELCOME_MESSAGE, LangGraph, bootstrap_storage, build_graph, cancel_appointment, find_earliest_slots,
+    get_appointment_ledger, get_schedule_horizon, get_schedule_store, get_session_store, get_waitlist,
+    join_waitlist, new_conversation, reschedule_appointment, run_turn,
+)
+from .ledger import BOOKED
+from .metrics import METRICS
+from .sessions import SessionConflict, SessionStore
+
+
+class MessageIn(BaseModel):
+    text: str
+
+
+class TurnOut(BaseModel):
+    session_id: str
+    node: str
+    replies: List[str]
+    completed: bool
+
+
+class OpeningOut(BaseModel):
+    date: str
+    time: str
+    doctor: str
+    location: str
+
+
+class SessionOut(BaseModel):
+    session_id: str
+    node: str
+    completed: bool
+    history: List[List[str]]
+    before: Optional[int]  # pass back as ``before`` for the previous page; None at the start
+
+
+class AppointmentOut(BaseModel):
+    appointment_id: str
+    name: str
+    date: str
+    time: str
+    duration: int
+    doctor: str
+    location: str
+    status: str
+
+
+class BackfillOut(BaseModel):
+    waitlist_id: int
+    appointment_id: str
+    name: str
+    date: str
+    time: str
+    doctor: str
+
+
+class ChangeOut(BaseModel):
+    appointment: AppointmentOut
+    backfilled: List[BackfillOut]  # waitlisted patients booked into the freed time
+
+
+class CancelIn(BaseModel):
+    reason: str = ""
+
+
+class RescheduleIn(BaseModel):
+    date: date
+    time: str
+    doctor: Optional[str] = None  # default: the same doctor
+
+
+class WaitlistIn(BaseModel):
+    name: str
+    dob: str
+    email: str = ""
+    phone: str = ""
+    patient_type: str = "New"
+    duration: Optional[int] = None  # default: by patient type
+    first_day: date
+    last_day: date
+    doctor: str = ""  # '' for any doctor
+    priority: int = 0  # lower goes first
+
+
+class WaitlistOut(BaseModel):
+    id: int
+    duration: int
+    first_day: str
+    last_day: str
+
+
+_CHANGE_ERRORS = {
+    ChangeStatus.NOT_FOUND: (404, "Unknown appointment, or no longer in the live schedule"),
+    ChangeStatus.ALREADY_CANCELLED: (409, "Appointment is already cancelled"),
+    ChangeStatus.SLOT_TAKEN: (409, "Those slots are taken"),
+    ChangeStatus.NO_SUCH_SLOT: (422, "No such slot in the doctor's schedule"),
+}
+
+
+def appointment_out(record: dict) -> AppointmentOut:
+    return AppointmentOut(appointment_id=record.get("appointment_id", ""), name=record.get("name", ""),
+                          date=str(record.get("date", "")), time=str(record.get("time", "")),
+                          duration=int(record.get("duration") or 0), doctor=record.get("doctor", ""),
+                          location=record.get("location", ""), status=record.get("status") or BOOKED)
+
+
+def change_out(change: AppointmentChange) -> ChangeOut:
+    if change.status != ChangeStatus.DONE:
+        code, detail = _CHANGE_ERRORS[change.status]
+        raise HTTPException(status_code=code, detail=detail)
+    backfilled = [BackfillOut(waitlist_id=b.request.id, appointment_id=b.appointment_id, name=b.request.name,
+                              date=b.day, time=b.time, doctor=b.doctor) for b in change.backfilled]
+    return ChangeOut(appointment=appointment_out(change.record), backfilled=backfilled)
+
+
+def create_app(store: Optional[SessionStore] = None, graph: Optional[LangGraph] = None) -> FastAPI:
+    graph = graph or build_graph()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.store = store or get_session_store()
+        await run_in_threadpool(bootstrap_storage, date.today())
+        yield
+
+    app = FastAPI(title="Medical Appointment Agent", lifespan=lifespan)
+
+    def start_session() -> TurnOut:
+        state = new_conversation()
+        session_id = app.state.store.create(state)
+        return TurnOut(session_id=session_id, node=state["current_node"], replies=[WELCOME_MESSAGE],
+                       completed=False)
+
+    def take_turn(session_id: str, text: str) -> TurnOut:
+        bootstrap_storage(date.today())
+        loaded = app.state.store.load(session_id, history=0)
+        if loaded is None:
+            raise HTTPException(status_code=404, detail="Unknown session")
+        state, version = loaded
+        # A turn books, appends to the ledger and sends mail before it saves, so it must
+        # not run twice on the same state: claim the session first.
+        if not app.state.store.claim_turn(session_id, version, SESSION_TURN_LEASE_SECONDS):
+            raise HTTPException(status_code=409, detail="Another message for this session is being answered; "
+                                                        "resend once it is done")
+        try:
+            replies = run_turn(graph, state, text)
+            app.state.store.save(session_id, state, version)
+        except SessionConflict:
+            raise HTTPException(status_code=409, detail="Session was updated concurrently; resend the message")
+        except BaseException:
+            app.state.store.release_turn(session_id)
+            raise
+        return TurnOut(session_id=session_id, node=state["current_node"], replies=replies,
+                       completed=bool(state.get("completed")))
+
+    @app.post("/sessions", response_model=TurnOut, status_code=201)
+    async def create_session():
+        return await run_in_threadpool(start_session)
+
+    @app.post("/sessions/{session_id}/messages", response_model=TurnOut)
+    async def post_message(session_id: str, message: MessageIn):
+        if not message.text.strip():
+            raise HTTPException(status_code=422, detail="Empty message")
+        return await run_in_threadpool(take_turn, session_id, message.text)
+
+    def read_session(session_id: str, before: Optional[int], limit: int) -> SessionOut:
+        loaded = app.state.store.load(session_id, history=0)
+        if loaded is None:
+            raise HTTPException(status_code=404, detail="Unknown session")
+        state, _ = loaded
+        messages = app.state.store.history(session_id, before, limit)
+        first = messages[0][0] if messages else 0
+        return SessionOut(session_id=session_id, node=state["current_node"], completed=bool(state.get("completed")),
+                          history=[[speaker, text] for _, speaker, text in messages],
+                          before=first if first > 0 else None)
+
+    @app.get("/sessions/{session_id}", response_model=SessionOut)
+    async def get_session(session_id: str, before: Optional[int] = Query(None, ge=0),
+                          limit: int = Query(SESSION_HISTORY_PAGE, ge=1, le=500)):
+        """The latest ``limit`` messages, or those before seq ``before``."""
+        return await run_in_threadpool(read_session, session_id, before, limit)
+
+    @app.get("/availability", response_model=List[OpeningOut])
+    async def availability(duration: int = Query(RECURRING_PATIENT_DURATION, gt=0),
+                           start: Optional[date] = None, days: int = Query(14, ge=1),
+                           doctor: Optional[str] = None, location: Optional[str] = None,
+                           n: int = Query(5, ge=1, le=100)):
+        """Earliest ``n`` openings of ``duration`` minutes from ``start`` (default today) over ``days`` days."""
+        openings = await run_in_threadpool(find_earliest_slots, start or date.today(), days, duration, location,
+                                           doctor, n)
+        return [OpeningOut(date=d, time=t, doctor=doc, location=loc) for d, t, doc, loc in openings]
+
+    def read_appointment(appointment_id: str) -> AppointmentOut:
+        record = get_appointment_ledger().find(appointment_id)
+        if record is None:
+            slots = get_schedule_store().appointment(appointment_id)
+            if slots is None:
+                raise HTTPException(status_code=404, detail="Unknown appointment")
+            record = slots_record(slots)
+        return appointment_out(record)
+
+    @app.get("/appointments/{appointment_id}", response_model=AppointmentOut)
+    async def get_appointment(appointment_id: str):
+        return await run_in_threadpool(read_appointment, appointment_id)
+
+    @app.post("/appointments/{appointment_id}/cancel", response_model=ChangeOut)
+    async def cancel(appointment_id: str, body: Optional[CancelIn] = None):
+        """Free every slot of the appointment and backfill them from the waitlist."""
+        change = await run_in_threadpool(cancel_appointment, appointment_id, body.reason if body else "")
+        return change_out(change)
+
+    def move(appointment_id: str, body: RescheduleIn) -> ChangeOut:
+        horizon = get_schedule_horizon()
+        if not horizon.in_window(body.date, date.today()):
+            raise HTTPException(status_code=422, detail=f"Pick a date from today to {horizon.window()[1]}")
+        return change_out(reschedule_appointment(appointment_id, body.date, body.time, body.doctor))
+
+    @app.post("/appointments/{appointment_id}/reschedule", response_model=ChangeOut)
+    async def reschedule(appointment_id: str, body: RescheduleIn):
+        """Move the appointment (same ID) and backfill the slots it gave up from the waitlist."""
+        return await run_in_threadpool(move, appointment_id, body)
+
+    def add_to_waitlist(body: WaitlistIn) -> WaitlistOut:
+        if body.last_day < body.first_day:
+            raise HTTPException(status_code=422, detail="last_day is before first_day")
+        new = body.patient_type.lower() == "new"
+        duration = body.duration or (NEW_PATIENT_DURATION if new else RECURRING_PATIENT_DURATION)
+        patient = {"name": body.name, "dob": body.dob, "email": body.email, "phone": body.phone}
+        request = join_waitlist(patient, "New" if new else "Recurring", duration, body.first_day, body.last_day,
+                                body.doctor, body.priority)
+        return WaitlistOut(id=request.id, duration=request.duration, first_day=request.first_day,
+                           last_day=request.last_day)
+
+    @app.post("/waitlist", response_model=WaitlistOut, status_code=201)
+    async def post_waitlist(body: WaitlistIn):
+        return await run_in_threadpool(add_to_waitlist, body)
+
+    @app.delete("/waitlist/{request_id}", status_code=204)
+    async def delete_waitlist(request_id: int):
+        if not await run_in_threadpool(get_waitlist().withdraw, request_id):
+            raise HTTPException(status_code=404, detail="No waiting request with that ID")
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return PlainTextResponse(METRICS.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    @app.delete("/sessions/{session_id}", status_code=204)
+    async def delete_session(session_id: str):
+        if not await run_in_threadpool(app.state.store.delete, session_id):
+            raise HTTPException(status_code=404, detail="Unknown session")
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,121 @@
+"""Doctor and location assignment from live utilization.
+
+``DoctorAssigner.assign`` picks a doctor for a conversation in one pass over
+the roster, from three things it keeps current incrementally:
+
+* continuity: the doctor of each patient's latest appointment, loaded from
+  the ledger once and then followed through its tail like the reminder
+  scheduler does;
+* free capacity: from ``CapacityIndex.loads``, each doctor's first day in
+  the booking window with room for the duration and their unbooked minutes
+  in the window, read from the index's per-day free intervals;
+* location preference: only the days each doctor works at the location the
+  patient asked for (doctors rotate between clinics), unless nobody there
+  has room in the window.
+
+The patient's usual doctor is kept when they have room; otherwise the doctor
+with the most unbooked time is chosen, ties going to roster order.
+``colleague`` finds another doctor working at the same location on a given
+day with room that day, for when the assigned doctor's day is full.
+"""
+import threading
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from .capacity import CapacityIndex, DoctorLoad
+from .ledger import CANCELLED, AppointmentLedger
+from .patient_index import patient_key
+
+CONTINUITY = "continuity"
+AVAILABILITY = "availability"
+NO_OPENINGS = "no openings"
+
+
+class Assignment(NamedTuple):
+    doctor: str
+    location: str
+    reason: str  # CONTINUITY, AVAILABILITY or NO_OPENINGS
+
+
+class DoctorAssigner:
+    def __init__(self, capacity: CapacityIndex, ledger: AppointmentLedger, roster: Mapping[str, str]):
+        self.capacity = capacity
+        self.ledger = ledger
+        self.roster = dict(roster)  # doctor -> home location
+        self._lock = threading.Lock()
+        self._latest: Dict[Tuple[str, str], Tuple[str, str]] = {}  # patient key -> (date, doctor)
+        self._offset: Optional[int] = None
+
+    def refresh(self):
+        """Fold in appointments appended to the ledger since the last call."""
+        with self._lock:
+            if self._offset is None:
+                self._load()
+                return
+            records, offset = self.ledger.read_from(self._offset)
+            if offset < self._offset:  # ledger was replaced
+                self._load()
+                return
+            for r in records:
+                self._note(r.get("name", ""), r.get("dob", ""), r.get("date", ""), r.get("doctor", ""),
+                           r.get("status", ""))
+            self._offset = offset
+
+    def _load(self):
+        snap, records, offset = self.ledger.load()
+        self._latest.clear()
+        if snap is not None and len(snap):
+            columns = [snap.decode(c) for c in ("name", "dob", "date", "doctor")]
+            columns.append(snap.decode("status") if "status" in snap.schema else [""] * len(snap))
+            for name, dob, day, doctor, status in zip(*columns):
+                self._note(name, dob, day, doctor, status)
+        for r in records:
+            self._note(r.get("name", ""), r.get("dob", ""), r.get("date", ""), r.get("doctor", ""),
+                       r.get("status", ""))
+        self._offset = offset
+
+    def _note(self, name: str, dob: str, day: str, doctor: str, status: str = ""):
+        if not doctor or doctor not in self.roster or status == CANCELLED:
+            return
+        key = patient_key(name, dob)
+        day = str(day)[:10]
+        latest = self._latest.get(key)
+        if latest is None or day >= latest[0]:
+            self._latest[key] = (day, doctor)
+
+    def usual_doctor(self, name: str, dob: str) -> Optional[str]:
+        """Doctor of the patient's latest appointment in the ledger, if any."""
+        self.refresh()
+        latest = self._latest.get(patient_key(name, dob))
+        return latest[1] if latest else None
+
+    def assign(self, name: str, dob: str, duration: int, start_day: str, end_day: str,
+               location: Optional[str] = None) -> Assignment:
+        """Doctor for a ``duration``-minute visit in ``[start_day, end_day]``."""
+        usual = self.usual_doctor(name, dob)
+        open_ = []
+        if location:
+            open_ = [l for l in self.capacity.loads(self.roster, duration, start_day, end_day, location)
+                     if l.first_day]
+        if not open_:  # nothing at the preferred location; anywhere beats no visit
+            open_ = [l for l in self.capacity.loads(self.roster, duration, start_day, end_day) if l.first_day]
+        if not open_:
+            doctor = usual or next(iter(self.roster))
+            return Assignment(doctor, self.roster[doctor], NO_OPENINGS)
+        for l in open_:
+            if l.doctor == usual:
+                return Assignment(usual, l.location, CONTINUITY)
+        best = _least_loaded(open_)
+        return Assignment(best.doctor, best.location, AVAILABILITY)
+
+    def colleague(self, doctor: str, duration: int, day: str) -> Optional[str]:
+        """Least loaded other doctor working at ``doctor``'s location on ``day`` with room
+        that day, or None."""
+        location = self.capacity.location(doctor, day) or self.roster.get(doctor)
+        others = [d for d in self.roster if d != doctor]
+        open_ = [l for l in self.capacity.loads(others, duration, day, day, location) if l.first_day]
+        return _least_loaded(open_).doctor if open_ else None
+
+
+def _least_loaded(loads: List[DoctorLoad]) -> DoctorLoad:
+    # max() keeps the first of equals, i.e. roster order
+    return max(loads, key=lambda l: l.free_minutes)
@@ -0,0 +1,155 @@
+"""Interval-based slot availability.
+
+A day is kept as a sorted list of free ``(start, end)`` intervals in minutes
+since midnight, built in one pass over the day's slot rows. Valid start times
+for any duration then fall out of a single sweep over those intervals, with
+no per-slot DataFrame filtering or string parsing.
+"""
+import heapq
+from bisect import bisect_right
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def to_minutes(hhmm: str) -> int:
+    """'HH:MM' -> minutes since midnight."""
+    return int(hhmm[:2]) * 60 + int(hhmm[3:5])
+
+
+def format_minutes(minutes: int) -> str:
+    """Minutes since midnight -> 'HH:MM'."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def slots_needed(duration: int, step: int) -> int:
+    """Number of grid slots an appointment of ``duration`` minutes occupies."""
+    return max(1, -(-duration // step))
+
+
+def slot_times(start: str, duration: int, step: int) -> List[str]:
+    """The consecutive slot times an appointment starting at ``start`` occupies."""
+    first = to_minutes(start)
+    return [format_minutes(first + i * step) for i in range(slots_needed(duration, step))]
+
+
+class DayAvailability:
+    """Free intervals for one day (and one doctor) on a fixed slot grid."""
+
+    __slots__ = ("day", "step", "free", "_ends")
+
+    def __init__(self, day: str, step: int, free: List[Tuple[int, int]]):
+        self.day = day
+        self.step = step
+        self.free = free
+        self._ends = [e for _, e in free]
+
+    @classmethod
+    def from_slots(cls, day: str, slots: Iterable[dict], step: int) -> "DayAvailability":
+        """Build from slot rows (``time``/``patient`` keys) sorted by time."""
+        free: List[Tuple[int, int]] = []
+        run_start = run_end = -1
+        for slot in slots:
+            if slot["patient"]:
+                continue
+            m = to_minutes(slot["time"])
+            if m == run_end:
+                run_end = m + step
+            else:
+                if run_start >= 0:
+                    free.append((run_start, run_end))
+                run_start, run_end = m, m + step
+        if run_start >= 0:
+            free.append((run_start, run_end))
+        return cls(day, step, free)
+
+    def starts(self, duration: int, from_minute: int = 0) -> List[int]:
+        """Every grid start (minutes), none before ``from_minute``, where ``duration`` fits in free time."""
+        span = slots_needed(duration, self.step) * self.step
+        out: List[int] = []
+        for start, end in self.free:
+            if start < from_minute:
+                start += -(-(from_minute - start) // self.step) * self.step  # next grid start
+            out.extend(range(start, end - span + 1, self.step))
+        return out
+
+    def start_times(self, duration: int, from_minute: int = 0) -> List[str]:
+        return [format_minutes(m) for m in self.starts(duration, from_minute)]
+
+    def can_book(self, start: int, duration: int) -> bool:
+        """True if ``[start, start + duration)`` lies inside one free interval."""
+        i = bisect_right(self._ends, start)
+        if i == len(self.free):
+            return False
+        lo, hi = self.free[i]
+        return lo <= start and start + slots_needed(duration, self.step) * self.step <= hi
+
+    def first_start(self, duration: int) -> Optional[int]:
+        """Earliest grid start where ``duration`` fits, or None."""
+        span = slots_needed(duration, self.step) * self.step
+        for start, end in self.free:
+            if end - start >= span:
+                return start
+        return None
+
+    def take(self, start: int, duration: int):
+        """Remove ``[start, start + duration)`` from the free intervals (caller checked ``can_book``)."""
+        i = bisect_right(self._ends, start)
+        lo, hi = self.free[i]
+        stop = start + slots_needed(duration, self.step) * self.step
+        pieces = [(a, b) for a, b in ((lo, start), (stop, hi)) if b > a]
+        self.free[i:i + 1] = pieces
+        self._ends[i:i + 1] = [b for _, b in pieces]
+
+    def free_minutes(self, min_run: int = 0) -> int:
+        """Unbooked minutes, counting only free runs at least ``min_run`` long."""
+        return sum(e - s for s, e in self.free if e - s >= min_run)
+
+    def longest_free(self) -> int:
+        """Length in minutes of the longest free run."""
+        return max((e - s for s, e in self.free), default=0)
+
+
+def build_day_index(slots: Iterable[dict], step: int) -> Dict[str, DayAvailability]:
+    """One pass over rows sorted by (date, time) -> ``{date: DayAvailability}``."""
+    index: Dict[str, DayAvailability] = {}
+    day: Optional[str] = None
+    bucket: List[dict] = []
+    for slot in slots:
+        if slot["date"] != day:
+            if day is not None:
+                index[day] = DayAvailability.from_slots(day, bucket, step)
+            day, bucket = slot["date"], []
+        bucket.append(slot)
+    if day is not None:
+        index[day] = DayAvailability.from_slots(day, bucket, step)
+    return index
+
+
+def range_starts(index: Dict[str, DayAvailability], duration: int) -> Iterator[Tuple[str, str]]:
+    """Yield ``(date, 'HH:MM')`` for every valid start across the indexed days, in order."""
+    for day in sorted(index):
+        for m in index[day].starts(duration):
+            yield day, format_minutes(m)
+
+
+def earliest_slots(slots: Iterable[dict], duration: int, step: int, n: int) -> List[Tuple[str, str, str, str]]:
+    """Earliest ``n`` starts across doctors as ``(date, time, doctor, location)``.
+
+    ``slots`` must be ordered by (date, doctor, time), as ``ScheduleStore.iter_slots``
+    returns them. Each day's per-doctor free lists are built in the same pass and
+    merged by start time; reading stops once ``n`` starts are found.
+    """
+    found: List[Tuple[str, str, str, str]] = []
+    for day, day_rows in groupby(slots, key=itemgetter("date")):
+        streams = []
+        for doctor, rows in groupby(day_rows, key=itemgetter("doctor")):
+            rows = list(rows)
+            location = rows[0].get("location", "")
+            starts = DayAvailability.from_slots(day, rows, step).starts(duration)
+            streams.append([(m, doctor, location) for m in starts])
+        for m, doctor, location in heapq.merge(*streams):
+            found.append((day, format_minutes(m), doctor, location))
+            if len(found) == n:
+                return found
+    return found
@@ -0,0 +1,262 @@
+"""Batch-schedule a waitlist CSV in one pass.
+
+    python -m appointment_agent.batch waitlist.csv --start 2026-10-19 --days 7 --report unplaced.csv
+
+The CSV has ``name`` and ``dob`` and optionally ``type`` (new / recurring;
+looked up in the patient registry when blank), ``preferred_dates``
+(``;``-separated YYYY-MM-DD, tried in order before the rest of the window),
+``doctor``, ``email`` and ``phone``.
+
+The window's slots are read once into per-doctor free intervals. Patients
+are then packed greedily, most constrained first: a fixed doctor and
+preferred dates narrow the options, and longer visits go before shorter
+ones. Each patient gets the earliest start on the best day, preferring the
+least-booked doctor on ties. All bookings are claimed in one transaction, and
+the ledger and registry are appended with one write each. With
+``--enqueue-unplaced`` the patients left over join the live waitlist for the
+window, to be booked when a cancellation frees a slot.
+"""
+import argparse
+import csv
+import time as _time
+from datetime import date, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .availability import DayAvailability, format_minutes, slot_times
+from .config import (
+    DOCTOR_LOCATIONS, FINAL_FILE, FINAL_LEDGER, NEW_PATIENT_DURATION, PATIENT_FILE, RECURRING_PATIENT_DURATION,
+    SCHEDULE_DB, SCHEDULE_FILE, SLOT_STEP_MIN, WAITLIST_DB,
+)
+from .engine import init_schedule_days
+from .ledger import BOOKED, AppointmentLedger, append_csv_rows
+from .patient_index import PATIENT_COLUMNS, PatientIndex
+from .schedule_store import Booking, BookingStatus, ScheduleStore, new_appointment_id, open_schedule_store
+from .waitlist import Waitlist
+
+NEW_TYPES = ("new", "n")
+RECURRING_TYPES = ("recurring", "returning", "r")
+
+
+class WaitlistEntry(NamedTuple):
+    row: int
+    name: str
+    dob: str
+    patient_type: str  # "New" / "Recurring", as the chat flow stores it
+    duration: int
+    preferred_dates: Tuple[str, ...]
+    doctor: str
+    email: str
+    phone: str
+
+
+class Placement(NamedTuple):
+    entry: WaitlistEntry
+    day: str
+    time: str
+    doctor: str
+    location: str
+    preferred: bool
+    appointment_id: str = ""  # set by commit()
+
+
+class BatchResult(NamedTuple):
+    placed: List[Placement]
+    unplaced: List[Tuple[WaitlistEntry, str]]
+    invalid: List[Tuple[int, str]]
+
+
+def read_waitlist(path: str, patients: Optional[PatientIndex] = None) -> Tuple[List[WaitlistEntry], List[Tuple[int, str]]]:
+    """Parse the waitlist CSV. Returns entries and ``(row, reason)`` for rows that can't be used."""
+    entries, invalid = [], []
+    with open(path, newline="", encoding="utf-8") as fh:
+        for row_no, raw in enumerate(csv.DictReader(fh), start=2):
+            row = {(k or "").strip().lower(): (v or "").strip() for k, v in raw.items()}
+            name, dob = row.get("name", ""), row.get("dob", "")
+            if not name or not dob:
+                invalid.append((row_no, "missing name or dob"))
+                continue
+            kind = row.get("type", "").lower()
+            if not kind and patients is not None:
+                kind = "recurring" if patients.get(name, dob) is not None else "new"
+            if kind in NEW_TYPES or not kind:
+                patient_type, duration = "New", NEW_PATIENT_DURATION
+            elif kind in RECURRING_TYPES:
+                patient_type, duration = "Recurring", RECURRING_PATIENT_DURATION
+            else:
+                invalid.append((row_no, f"unknown type {row['type']!r}"))
+                continue
+            doctor = row.get("doctor", "")
+            if doctor and doctor not in DOCTOR_LOCATIONS:
+                invalid.append((row_no, f"unknown doctor {doctor!r}"))
+                continue
+            preferred = tuple(d.strip() for d in row.get("preferred_dates", "").split(";") if d.strip())
+            entries.append(WaitlistEntry(row_no, name, dob, patient_type, duration, preferred, doctor,
+                                         row.get("email", ""), row.get("phone", "")))
+    return entries, invalid
+
+
+def load_availability(store: ScheduleStore, days: Sequence[str]) -> Tuple[Dict[Tuple[str, str], DayAvailability],
+                                                                          Dict[Tuple[str, str], str]]:
+    """One read of the window -> ``{(doctor, day): DayAvailability}`` and ``{(doctor, day): location}``."""
+    table = store.slot_table(days[0], days[-1])
+    # Doctor '' is the legacy shared grid.
+    index = {key: avail for key, avail in table.availability(SLOT_STEP_MIN).items() if key[0]}
+    locations = {key: loc for key, loc in table.day_locations().items() if key[0]}
+    return index, locations
+
+
+def plan(entries: Sequence[WaitlistEntry], availability: Dict[Tuple[str, str], DayAvailability],
+         days: Sequence[str], locations: Dict[Tuple[str, str], str]
+         ) -> Tuple[List[Placement], List[Tuple[WaitlistEntry, str]]]:
+    """Greedy most-constrained-first packing. ``availability`` is consumed as slots are assigned."""
+    doctors = sorted({doctor for doctor, _ in locations})
+    window = set(days)
+
+    def options(entry: WaitlistEntry) -> int:
+        n_days = len([d for d in entry.preferred_dates if d in window]) or len(days)
+        return n_days * (1 if entry.doctor else len(doctors))
+
+    order = sorted(entries, key=lambda e: (options(e), -e.duration, e.row))
+    placed, unplaced = [], []
+    for entry in order:
+        preferred = [d for d in entry.preferred_dates if d in window]
+        seen = set(preferred)
+        candidates = [(d, True) for d in preferred] + [(d, False) for d in days if d not in seen]
+        who = [entry.doctor] if entry.doctor else doctors
+        placement = None
+        for day, is_preferred in candidates:
+            best = None
+            for doctor in who:
+                avail = availability.get((doctor, day))
+                if avail is None:
+                    continue
+                start = avail.first_start(entry.duration)
+                if start is not None and (best is None or (start, -avail.free_minutes()) < best[0]):
+                    best = ((start, -avail.free_minutes()), doctor, avail)
+            if best is not None:
+                (start, _), doctor, avail = best
+                avail.take(start, entry.duration)
+                placement = Placement(entry, day, format_minutes(start), doctor, locations[(doctor, day)],
+                                      is_preferred)
+                break
+        if placement is None:
+            unplaced.append((entry, "no opening in the window" if not entry.doctor
+                             else f"no opening with {entry.doctor} in the window"))
+        else:
+            placed.append(placement)
+    placed.sort(key=lambda p: p.entry.row)
+    return placed, unplaced
+
+
+def commit(store: ScheduleStore, placements: Sequence[Placement]) -> Tuple[List[Placement], List[Placement]]:
+    """Claim every placement in one transaction. Returns (booked, taken meanwhile)."""
+    placements = [p._replace(appointment_id=new_appointment_id()) for p in placements]
+    bookings = [
+        Booking(p.day, tuple(slot_times(p.time, p.entry.duration, SLOT_STEP_MIN)), p.entry.name,
+                p.entry.duration, p.entry.patient_type, p.doctor, p.appointment_id)
+        for p in placements
+    ]
+    statuses = store.book_many(bookings)
+    booked = [p for p, s in zip(placements, statuses) if s == BookingStatus.BOOKED]
+    lost = [p for p, s in zip(placements, statuses) if s != BookingStatus.BOOKED]
+    return booked, lost
+
+
+def schedule_waitlist(store: ScheduleStore, entries: Sequence[WaitlistEntry], start: date, days: int,
+                      dry_run: bool = False) -> BatchResult:
+    """Plan and (unless ``dry_run``) book ``entries`` into [start, start + days)."""
+    day_strs = [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+    if not dry_run:
+        init_schedule_days(start, days, store)
+    availability, locations = load_availability(store, day_strs)
+    placed, unplaced = plan(entries, availability, day_strs, locations)
+    if not dry_run:
+        placed, lost = commit(store, placed)
+        unplaced.extend((p.entry, "slot taken while committing") for p in lost)
+    unplaced.sort(key=lambda u: u[0].row)
+    return BatchResult(placed, unplaced, [])
+
+
+def ledger_record(p: Placement) -> dict:
+    e = p.entry
+    return {
+        "name": e.name, "dob": e.dob, "email": e.email, "phone": e.phone, "date": p.day, "time": p.time,
+        "duration": e.duration, "patient_type": e.patient_type, "doctor": p.doctor, "location": p.location,
+        "confirmed": "Yes", "notes": "batch scheduled", "appointment_id": p.appointment_id, "status": BOOKED,
+    }
+
+
+def record_placements(placed: Sequence[Placement], ledger: AppointmentLedger, patients: PatientIndex):
+    """Append booked appointments to the ledger and unseen patients to the registry."""
+    ledger.extend(ledger_record(p) for p in placed)
+    new_patients = []
+    for p in placed:
+        row = {"name": p.entry.name, "dob": p.entry.dob, "email": p.entry.email, "phone": p.entry.phone}
+        if patients.get(row["name"], row["dob"]) is None:
+            patients.add(row)
+            new_patients.append(row)
+    if new_patients:
+        append_csv_rows(patients.path, PATIENT_COLUMNS, new_patients)
+
+
+def enqueue_unplaced(waitlist: Waitlist, result: BatchResult, start: date, days: int) -> int:
+    """Put every unplaced patient on the live waitlist for [start, start + days). Returns how many."""
+    first, last = start.strftime("%Y-%m-%d"), (start + timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    return len(waitlist.add_many(
+        dict(name=e.name, dob=e.dob, patient_type=e.patient_type, duration=e.duration, first_day=first,
+             last_day=last, doctor=e.doctor, email=e.email, phone=e.phone)
+        for e, _ in result.unplaced
+    ))
+
+
+def write_report(path: str, result: BatchResult):
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["row", "name", "dob", "reason"])
+        for entry, reason in result.unplaced:
+            writer.writerow([entry.row, entry.name, entry.dob, reason])
+        for row_no, reason in result.invalid:
+            writer.writerow([row_no, "", "", reason])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-schedule a waitlist CSV.")
+    parser.add_argument("waitlist")
+    parser.add_argument("--start", type=date.fromisoformat, default=date.today() + timedelta(days=1))
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--db", default=SCHEDULE_DB)
+    parser.add_argument("--xlsx", default=SCHEDULE_FILE, help="legacy schedule imported if --db is new")
+    parser.add_argument("--ledger", default=FINAL_LEDGER)
+    parser.add_argument("--patients", default=PATIENT_FILE)
+    parser.add_argument("--report", help="write unplaced and invalid rows to this CSV")
+    parser.add_argument("--dry-run", action="store_true", help="plan only; book nothing")
+    parser.add_argument("--enqueue-unplaced", action="store_true",
+                        help="put unplaced patients on the waitlist for the window")
+    parser.add_argument("--waitlist-db", default=WAITLIST_DB)
+    args = parser.parse_args(argv)
+
+    t0 = _time.perf_counter()
+    patients = PatientIndex(args.patients)
+    entries, invalid = read_waitlist(args.waitlist, patients)
+    store = open_schedule_store(args.db, args.xlsx)
+    result = schedule_waitlist(store, entries, args.start, args.days, dry_run=args.dry_run)._replace(invalid=invalid)
+    if not args.dry_run:
+        record_placements(result.placed, AppointmentLedger(args.ledger, legacy_xlsx=FINAL_FILE), patients)
+    elapsed = _time.perf_counter() - t0
+
+    preferred = sum(p.preferred for p in result.placed)
+    verb = "Planned" if args.dry_run else "Booked"
+    print(f"{verb} {len(result.placed)} of {len(entries)} patients ({preferred} on a preferred date) "
+          f"in {elapsed * 1000:.0f} ms; {len(result.unplaced)} unplaced, {len(invalid)} invalid rows")
+    for entry, reason in result.unplaced[:20]:
+        print(f"  row {entry.row}: {entry.name} ({entry.dob}) - {reason}")
+    if args.report:
+        write_report(args.report, result)
+        print(f"Report written to {args.report}")
+    if args.enqueue_unplaced and not args.dry_run and result.unplaced:
+        queued = enqueue_unplaced(Waitlist(args.waitlist_db, SLOT_STEP_MIN), result, args.start, args.days)
+        print(f"{queued} unplaced patients added to the waitlist")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Per-day free-capacity index for earliest-opening searches.
+
+``CapacityIndex`` keeps a ``DayAvailability`` and the location for every
+live (doctor, day) (a doctor can work at different clinics on different
+days) and, per doctor and appointment span, the sorted list of days with a
+free run long enough for it. A search bisects to the first such day on or after the
+range start and walks only days that fit, so full days cost nothing and no
+slot rows are read at query time.
+
+The index follows the store's change log (``ScheduleStore.changed_days``):
+each search first asks which days changed since the last one, one indexed
+query, and re-reads just those days, one range query per run of consecutive
+changed days. ``loads()`` answers "how busy is everyone" from the same fit
+lists: it walks each doctor's fitting days in the asked range, so its cost
+is the number of those days, not slot rows.
+"""
+import heapq
+import threading
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .availability import DayAvailability, format_minutes, slots_needed
+from .metrics import METRICS
+from .schedule_store import ScheduleStore
+
+Opening = Tuple[str, str, str, str]  # (date, time, doctor, location)
+
+
+class DoctorLoad(NamedTuple):
+    doctor: str
+    location: str  # where the doctor works on first_day ('' without one)
+    free_minutes: int  # unbooked minutes in the asked range, in free runs long enough for the visit
+    first_day: Optional[str]  # first day of the asked range with a free run long enough, or None
+
+
+class CapacityIndex:
+    """Free intervals for every live (doctor, day), kept current from the store's change log."""
+
+    def __init__(self, store: ScheduleStore, step: int):
+        self.store = store
+        self.step = step
+        self._lock = threading.Lock()
+        self._synced = 0
+        self._days: Dict[str, Dict[str, DayAvailability]] = {}  # doctor -> day -> availability
+        self._locations: Dict[Tuple[str, str], str] = {}  # (doctor, day) -> location
+        self._fits: Dict[Tuple[str, int], List[str]] = {}  # (doctor, span) -> sorted days with a long enough run
+
+    def refresh(self) -> List[str]:
+        """Re-read the days changed since the last refresh. Returns them."""
+        with self._lock:
+            version, changed = self.store.changed_days(self._synced)
+            if changed:
+                self._reload(changed)
+            self._synced = version
+            return changed
+
+    def _reload(self, days: Sequence[str]):
+        fresh: Dict[Tuple[str, str], DayAvailability] = {}
+        locations: Dict[Tuple[str, str], str] = {}
+        for first, last in _day_runs(days):
+            table = self.store.slot_table(first, last)
+            METRICS.count("agent_rows_read_total", len(table), op="capacity_refresh")
+            fresh.update(table.availability(self.step))
+            locations.update(table.day_locations())
+        wanted = set(days)
+        for doctor in set(self._days) | {doctor for doctor, _ in fresh}:
+            by_day = self._days.setdefault(doctor, {})
+            for day in wanted:
+                old, new = by_day.pop(day, None), fresh.get((doctor, day))
+                self._locations.pop((doctor, day), None)
+                if new is not None:
+                    by_day[day] = new
+                    self._locations[(doctor, day)] = locations[(doctor, day)]
+                for (fit_doctor, span), fit_days in self._fits.items():
+                    if fit_doctor != doctor:
+                        continue
+                    was, now = _fits(old, span), _fits(new, span)
+                    if was and not now:
+                        fit_days.pop(bisect_left(fit_days, day))
+                    elif now and not was:
+                        insort(fit_days, day)
+
+    def _fit_days(self, doctor: str, span: int) -> List[str]:
+        key = (doctor, span)
+        days = self._fits.get(key)
+        if days is None:
+            days = self._fits[key] = sorted(d for d, a in self._days.get(doctor, {}).items() if _fits(a, span))
+        return days
+
+    def location(self, doctor: str, day: str) -> Optional[str]:
+        """Where ``doctor`` works on ``day``, or None if they have no slots that day."""
+        self.refresh()
+        with self._lock:
+            return self._locations.get((doctor, day))
+
+    def doctors(self, location: Optional[str] = None) -> List[str]:
+        """Doctors with live days (at ``location`` on any of them, when given)."""
+        return sorted({d for (d, _), loc in self._locations.items() if d and (location is None or loc == location)})
+
+    def earliest(self, start_day: str, end_day: str, duration: int, n: int, doctor: Optional[str] = None,
+                 location: Optional[str] = None, from_minute: int = 0) -> List[Opening]:
+        """Earliest ``n`` starts in ``[start_day, end_day]`` as ``(date, time, doctor, location)``,
+        none before ``from_minute`` on ``start_day``. With ``location``, every doctor working
+        there that day is searched."""
+        self.refresh()
+        span = slots_needed(duration, self.step) * self.step
+        with self._lock:
+            doctors = [doctor] if doctor is not None else self.doctors(location)
+            streams = [self._candidates(d, span, start_day, end_day, location) for d in doctors]
+            found: List[Opening] = []
+            for day, group in groupby(heapq.merge(*streams), key=itemgetter(0)):
+                starts = []
+                for _, doc in group:
+                    loc = self._locations[(doc, day)]
+                    first = from_minute if day == start_day else 0
+                    starts.append([(m, doc, loc) for m in self._days[doc][day].starts(duration, first)])
+                for m, doc, loc in heapq.merge(*starts):
+                    found.append((day, format_minutes(m), doc, loc))
+                    if len(found) == n:
+                        return found
+            return found
+
+    def loads(self, doctors: Iterable[str], duration: int, start_day: str, end_day: str,
+              location: Optional[str] = None) -> List[DoctorLoad]:
+        """Free capacity of each of ``doctors`` in ``[start_day, end_day]`` (only on the days
+        they work at ``location``, when given): O(fitting days in the range) apiece."""
+        self.refresh()
+        span = slots_needed(duration, self.step) * self.step
+        out = []
+        with self._lock:
+            for doctor in doctors:
+                first, free = None, 0
+                for day, _ in self._candidates(doctor, span, start_day, end_day, location):
+                    first = first or day
+                    free += self._days[doctor][day].free_minutes(span)
+                out.append(DoctorLoad(doctor, self._locations.get((doctor, first), ""), free, first))
+        return out
+
+    def _candidates(self, doctor: str, span: int, start_day: str, end_day: str,
+                    location: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        days = self._fit_days(doctor, span)
+        for i in range(bisect_left(days, start_day), len(days)):
+            if days[i] > end_day:
+                return
+            if location is None or self._locations[(doctor, days[i])] == location:
+                yield days[i], doctor
+
+
+def _day_runs(days: Sequence[str]) -> Iterator[Tuple[str, str]]:
+    """``(first, last)`` of each run of consecutive dates in the sorted ``days``."""
+    first = prev = None
+    for day in days:
+        current = date.fromisoformat(day)
+        if prev is None or current - prev != timedelta(days=1):
+            if prev is not None:
+                yield first.isoformat(), prev.isoformat()
+            first = current
+        prev = current
+    if prev is not None:
+        yield first.isoformat(), prev.isoformat()
+
+
+def _fits(avail: Optional[DayAvailability], span: int) -> bool:
+    return avail is not None and avail.longest_free() >= span
@@ -0,0 +1,114 @@
+"""Cancelling and rescheduling booked appointments.
+
+An appointment is addressed by the ``appointment_id`` its slots carry, never
+by patient name. ``cancel_appointment`` frees every slot of it in one
+transaction, ``reschedule_appointment`` frees them and claims the new ones
+in the same transaction (so a failed move changes nothing), and either way
+the ledger gets the appointment's new state appended. ``offer_to_waitlist``
+then hands the free run of the doctor's day that now contains the freed
+slots to the waitlist, and records the backfilled bookings in the ledger.
+
+The engine wraps these with its process-wide store, ledger and waitlist and
+notifies the patients involved.
+"""
+from datetime import datetime
+from enum import Enum
+from typing import List, NamedTuple, Optional, Tuple
+
+from .availability import DayAvailability, slot_times, to_minutes
+from .ledger import BOOKED, CANCELLED, RESCHEDULED, AppointmentLedger
+from .schedule_store import AppointmentSlots, BookingStatus, ScheduleStore
+from .waitlist import Backfilled, Waitlist
+
+
+class ChangeStatus(str, Enum):
+    DONE = "done"
+    NOT_FOUND = "not_found"  # unknown ID, or no longer in the live schedule
+    ALREADY_CANCELLED = "already_cancelled"
+    SLOT_TAKEN = "slot_taken"
+    NO_SUCH_SLOT = "no_such_slot"
+
+
+class AppointmentChange(NamedTuple):
+    status: ChangeStatus
+    record: Optional[dict]  # the appointment's ledger record, as appended when DONE
+    freed: Optional[AppointmentSlots]  # the slots given up when DONE
+    backfilled: List[Backfilled]
+
+
+def slots_record(slots: AppointmentSlots) -> dict:
+    """Ledger record for a booking the ledger has no line for (imported or booked before IDs)."""
+    return {
+        "name": slots.patient, "date": slots.day, "time": slots.times[0], "duration": slots.duration,
+        "patient_type": slots.patient_type, "doctor": slots.doctor, "location": slots.location,
+        "appointment_id": slots.appointment_id,
+    }
+
+
+def cancel_appointment(store: ScheduleStore, ledger: AppointmentLedger, appointment_id: str,
+                       reason: str = "") -> AppointmentChange:
+    record = ledger.find(appointment_id)
+    if record is not None and record.get("status") == CANCELLED:
+        return AppointmentChange(ChangeStatus.ALREADY_CANCELLED, record, None, [])
+    freed = store.release(appointment_id)
+    if freed is None:
+        return AppointmentChange(ChangeStatus.NOT_FOUND, record, None, [])
+    record = dict(record or slots_record(freed), status=CANCELLED, notes=reason or "cancelled")
+    ledger.append(record)
+    return AppointmentChange(ChangeStatus.DONE, record, freed, [])
+
+
+def reschedule_appointment(store: ScheduleStore, ledger: AppointmentLedger, appointment_id: str, day: str,
+                           start: str, step: int, doctor: Optional[str] = None) -> AppointmentChange:
+    """Move an appointment to ``start`` on ``day`` (with ``doctor``, default the same one)."""
+    record = ledger.find(appointment_id)
+    if record is not None and record.get("status") == CANCELLED:
+        return AppointmentChange(ChangeStatus.ALREADY_CANCELLED, record, None, [])
+    held = store.appointment(appointment_id)
+    if held is None:
+        return AppointmentChange(ChangeStatus.NOT_FOUND, record, None, [])
+    status, freed = store.move(appointment_id, day, slot_times(start, held.duration, step), doctor or held.doctor)
+    if status != BookingStatus.BOOKED:
+        return AppointmentChange(ChangeStatus(status.value), record, None, [])
+    moved = store.appointment(appointment_id)
+    record = dict(record or slots_record(freed), date=moved.day, time=moved.times[0], doctor=moved.doctor,
+                  location=moved.location, status=RESCHEDULED, notes=f"moved from {freed.day} {freed.times[0]}")
+    ledger.append(record)
+    return AppointmentChange(ChangeStatus.DONE, record, freed, [])
+
+
+def free_run(store: ScheduleStore, freed: AppointmentSlots, step: int, now: datetime) -> Optional[Tuple[int, int]]:
+    """Free ``[start, end)`` minutes around the freed slots on their doctor's day, from ``now`` on; None if past."""
+    today = now.date().isoformat()
+    if freed.day < today:
+        return None
+    avail = DayAvailability.from_slots(freed.day, store.day_slots(freed.day, freed.doctor), step)
+    first = to_minutes(freed.times[0])
+    run = next(((lo, hi) for lo, hi in avail.free if lo <= first < hi), None)
+    if run is None:  # already booked again
+        return None
+    lo, hi = run
+    if freed.day == today:
+        minute = now.hour * 60 + now.minute
+        if minute > lo:
+            lo += -(-(minute - lo) // step) * step  # next grid start
+    return (lo, hi) if hi > lo else None
+
+
+def offer_to_waitlist(waitlist: Waitlist, store: ScheduleStore, ledger: AppointmentLedger,
+                      freed: AppointmentSlots, now: datetime) -> List[Backfilled]:
+    """Book waitlisted patients into the time ``freed`` opened up and append them to the ledger.
+
+    They are booked on the freed doctor's day, so at the freed slots' location.
+    """
+    run = free_run(store, freed, waitlist.step, now)
+    if run is None:
+        return []
+    filled = waitlist.backfill(store, freed.day, freed.doctor, *run)
+    ledger.extend({
+        "name": b.request.name, "dob": b.request.dob, "email": b.request.email, "phone": b.request.phone,
+        "date": b.day, "time": b.time, "duration": b.request.duration, "patient_type": b.request.patient_type,
+        "doctor": b.doctor, "location": freed.location, "confirmed": "Yes",
+        "notes": "booked from the waitlist", "appointment_id": b.appointment_id, "status": BOOKED,
+    } for b in filled)
+    return filled
@@ -0,0 +1,74 @@
+"""Clinic settings shared by the Streamlit app and the background tools.
+
+Credentials come from the environment (``.env`` is loaded on import).
+"""
+import os
+from datetime import time
+
+from dotenv import load_dotenv
+
+PATIENT_FILE = "patients.csv"
+SCHEDULE_FILE = "schedule.xlsx"  # legacy store, imported into SCHEDULE_DB on first run
+SCHEDULE_DB = "schedule.db"
+FINAL_FILE = "final.xlsx"  # staff export of FINAL_LEDGER
+FINAL_LEDGER = "final.jsonl"
+NOTIFY_DB = "notifications.db"
+WAITLIST_DB = "waitlist.db"  # patients to book into cancelled or moved appointments' slots
+SESSION_DB = "sessions.db"  # conversation state for the HTTP API and the Streamlit app
+SESSION_TTL_SECONDS = 24 * 3600  # idle sessions are deleted after this long
+SESSION_SWEEP_SECONDS = 600
+SESSION_HISTORY_PAGE = 20  # messages rendered per page
+SESSION_TURN_LEASE_SECONDS = 60  # a worker holds a session this long at most while it runs a turn
+
+SLOT_START = time(10, 0)
+SLOT_END = time(21, 0)
+SLOT_STEP_MIN = 30
+
+# Bookable look-ahead; a day's slot grids are created the first time it is queried.
+SCHEDULE_HORIZON_DAYS = 30
+CLOSED_WEEKDAYS = ()  # date.weekday() numbers, e.g. (6,) to close on Sundays
+CLOSED_DATES = ()  # "YYYY-MM-DD" holidays
+
+
+NEW_PATIENT_DURATION = 60  # minutes
+RECURRING_PATIENT_DURATION = 30  # minutes
+# Lowest match score (0-1) at which a patient without an exact registry hit is
+# asked whether a similar registered patient is them.
+PATIENT_MATCH_THRESHOLD = 0.8
+
+DOCTORS = ["Dr. Smith", "Dr. Johnson", "Dr. Lee"]
+LOCATIONS = ["Main Clinic", "Downtown Office", "Uptown Branch"]
+# Each doctor keeps their own slot grid at their home clinic...
+DOCTOR_LOCATIONS = dict(zip(DOCTORS, LOCATIONS))
+# ...except on the weekdays (date.weekday()) they cover another one, so some
+# days a location has several doctors. doctor -> {weekday: location}
+DOCTOR_ROTATION = {
+    "Dr. Johnson": {0: "Main Clinic", 2: "Main Clinic"},
+    "Dr. Lee": {1: "Downtown Office", 3: "Downtown Office"},
+}
+# Working hours per doctor; anyone not listed works SLOT_START to SLOT_END.
+DOCTOR_HOURS = {}
+
+load_dotenv()
+
+# Observability: AGENT_METRICS_FILE appends JSONL metric snapshots; AGENT_PROFILE=cprofile|pyinstrument
+# saves a profile of every turn slower than AGENT_PROFILE_MIN_MS under AGENT_PROFILE_DIR.
+METRICS_FILE = os.getenv("AGENT_METRICS_FILE", "")
+METRICS_FLUSH_SECONDS = 60
+PROFILE_MODE = os.getenv("AGENT_PROFILE", "").lower()
+PROFILE_DIR = os.getenv("AGENT_PROFILE_DIR", "profiles")
+PROFILE_MIN_MS = float(os.getenv("AGENT_PROFILE_MIN_MS", "0"))
+
+
+EMAIL_ENABLED = os.getenv("EMAIL_ENABLED", "true").lower() == "true"
+EMAIL_USER = os.getenv("EMAIL_USER", "")
+EMAIL_PASS = os.getenv("EMAIL_PASS", "")
+EMAIL_SMTP_SERVER = "smtp.gmail.com"
+EMAIL_SMTP_PORT = 587
+
+
+SMS_ENABLED = os.getenv("ENABLE_SMS", "true").lower() == "true"
+TWILIO_ACCOUNT_SID = os.getenv("TWILIO_SID", "")
+TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH", "")
+TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE", "")
+PATIENT_NOTIFY_PHONE = os.getenv("PATIENT_NOTIFY_PHONE", "")
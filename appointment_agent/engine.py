@@ -0,0 +1,897 @@
+"""Conversation engine for the appointment agent, independent of any UI.
+
+The storage/notification helpers, the minimal LangGraph engine and its node
+handlers live here so the Streamlit app, the HTTP API and the benchmarks all
+drive the same code. Process-wide resources (schedule store, patient index,
+ledger, notification dispatcher, session store) are created once per process;
+errors are logged and reported through the handlers' responses instead of
+``st.error``. ``LangGraph.step`` and the helpers record timings and row counts
+in ``metrics.METRICS``.
+"""
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from .assignment import AVAILABILITY, CONTINUITY, NO_OPENINGS, Assignment, DoctorAssigner
+from .availability import DayAvailability, slot_times, to_minutes
+from .capacity import CapacityIndex
+from .changes import AppointmentChange, ChangeStatus, cancel_appointment as _cancel, offer_to_waitlist
+from .changes import reschedule_appointment as _reschedule
+from .config import (
+    PATIENT_FILE, SCHEDULE_FILE, SCHEDULE_DB, FINAL_FILE, FINAL_LEDGER, NOTIFY_DB, SLOT_START, SLOT_END,
+    SLOT_STEP_MIN, NEW_PATIENT_DURATION, RECURRING_PATIENT_DURATION, DOCTORS, DOCTOR_LOCATIONS, DOCTOR_HOURS,
+    SCHEDULE_HORIZON_DAYS, CLOSED_WEEKDAYS, CLOSED_DATES, PATIENT_NOTIFY_PHONE, SESSION_DB, SESSION_TTL_SECONDS,
+    SESSION_SWEEP_SECONDS, METRICS_FILE, METRICS_FLUSH_SECONDS, PROFILE_MODE, PROFILE_DIR, PROFILE_MIN_MS,
+    WAITLIST_DB, DOCTOR_ROTATION,
+)
+from .horizon import ClinicCalendar, ScheduleHorizon
+from .ledger import BOOKED, AppointmentLedger, append_csv_row, appointment_key
+from .metrics import METRICS, MetricsFileWriter, profile_turn
+from .notifications import NotificationDispatcher, NotificationQueue, Notifier, default_notifier
+from .parsing import parse_insurance, parse_patient
+from .patient_index import PATIENT_COLUMNS, PatientIndex
+from .reminders import reminder_times
+from .schedule_store import AppointmentSlots, BookingStatus, ScheduleStore, new_appointment_id, open_schedule_store
+from .sessions import SessionStore, SessionSweeper, SQLiteSessionStore
+from .summary import ScheduleSummary
+from .waitlist import Backfilled, Waitlist, WaitlistRequest
+
+logger = logging.getLogger(__name__)
+
+WELCOME_MESSAGE = """👋 Welcome to the Medical Appointment Scheduler!
+
+Please provide your information in the following format:
+
+**For New Patients:**
+• Name: [Full Name], DOB: [YYYY-MM-DD], Email: [email@example.com], Phone: [+1234567890]
+
+**For Returning Patients:**  
+• Name: [Full Name], DOB: [YYYY-MM-DD]
+
+**Example:** Name: John Doe, DOB: 1990-01-15, Email: john@email.com, Phone: +1234567890"""
+
+# Nodes that run straight away when a turn lands on them without a reply
+AUTO_ADVANCE_NODES = ("slots", "finalize")
+
+
+# -----------------------
+# Storage
+# -----------------------
+def ensure_files():
+    if not os.path.exists(PATIENT_FILE):
+        pd.DataFrame(columns=["name", "dob", "email", "phone"]).to_csv(PATIENT_FILE, index=False)
+    get_appointment_ledger()
+
+@lru_cache(maxsize=None)
+def get_schedule_store() -> ScheduleStore:
+    """Return the process-wide schedule store, importing schedule.xlsx on first use."""
+    return open_schedule_store(SCHEDULE_DB, SCHEDULE_FILE)
+
+def clinic_calendar() -> ClinicCalendar:
+    return ClinicCalendar(DOCTOR_LOCATIONS, (SLOT_START, SLOT_END), SLOT_STEP_MIN, DOCTOR_HOURS,
+                          frozenset(CLOSED_WEEKDAYS), frozenset(CLOSED_DATES), DOCTOR_ROTATION)
+
+@lru_cache(maxsize=None)
+def get_schedule_horizon() -> ScheduleHorizon:
+    """Bookable window over the process-wide store; grids are created as days are queried."""
+    return ScheduleHorizon(get_schedule_store(), clinic_calendar(), SCHEDULE_HORIZON_DAYS)
+
+def doctor_location(doctor: str, day: date) -> str:
+    """Where ``doctor`` works on ``day``; some doctors cover another clinic on some weekdays."""
+    return get_schedule_horizon().calendar.location(doctor, day)
+
+def init_schedule_days(start: date, days: int, store: ScheduleStore = None):
+    """Create per-doctor slot grids for the open days in [start, start + days) that don't have one yet."""
+    horizon = get_schedule_horizon() if store is None else ScheduleHorizon(store, clinic_calendar(), days)
+    return horizon.generate(start + timedelta(days=i) for i in range(days))
+
+@lru_cache(maxsize=1)
+def bootstrap_storage(today: date):
+    """Runs once per process per day (later turns hit the cache): archives past days."""
+    ensure_files()
+    if METRICS_FILE:
+        get_metrics_writer()
+    horizon = get_schedule_horizon()
+    moved = horizon.roll(today)
+    if moved:
+        logger.info("Archived %d past slot rows", moved)
+    horizon.ensure([today])
+    return True
+
+@METRICS.timed("agent_storage_seconds", op="day_availability")
+def get_day_availability(day: date, doctor: str) -> DayAvailability:
+    get_schedule_horizon().ensure([day])
+    day_str = day.strftime("%Y-%m-%d")
+    slots = get_schedule_store().day_slots(day_str, doctor)
+    METRICS.count("agent_rows_read_total", len(slots), op="day_availability")
+    return DayAvailability.from_slots(day_str, slots, SLOT_STEP_MIN)
+
+def earliest_start(day: date, now: datetime = None) -> int:
+    """First minute a visit on ``day`` may start: the current minute today, midnight on later days."""
+    now = now or datetime.now()
+    return now.hour * 60 + now.minute if day == now.date() else 0
+
+def get_available_slots_for_patient(day: date, is_new_patient: bool, doctor: str, now: datetime = None):
+    """Return the doctor's available slots considering patient type and duration requirements.
+
+    Starts that have already passed today are left out.
+    """
+    try:
+        required_duration = NEW_PATIENT_DURATION if is_new_patient else RECURRING_PATIENT_DURATION
+        return get_day_availability(day, doctor).start_times(required_duration, earliest_start(day, now))
+    except Exception as e:
+        logger.error("Error getting available slots: %s", e)
+        return []
+
+@lru_cache(maxsize=None)
+def get_capacity_index() -> CapacityIndex:
+    """Free-capacity index over the live schedule, shared by every session in this process."""
+    return CapacityIndex(get_schedule_store(), SLOT_STEP_MIN)
+
+@lru_cache(maxsize=None)
+def get_doctor_assigner() -> DoctorAssigner:
+    """Load- and continuity-aware doctor assignment, shared by every session in this process."""
+    return DoctorAssigner(get_capacity_index(), get_appointment_ledger(), DOCTOR_LOCATIONS)
+
+@METRICS.timed("agent_storage_seconds", op="assign_doctor")
+def assign_doctor(patient: dict, duration: int, location: str = None) -> Assignment:
+    """Doctor for the patient over the booking window, optionally at a preferred location."""
+    try:
+        horizon = get_schedule_horizon()
+        first, last = horizon.window()
+        horizon.ensure_range(first, (last - first).days + 1)
+        return get_doctor_assigner().assign(patient["name"], patient["dob"], duration, first.isoformat(),
+                                            last.isoformat(), location)
+    except Exception as e:
+        logger.error("Error assigning doctor: %s", e)
+        doctor = DOCTORS[len(patient["name"]) % len(DOCTORS)]
+        return Assignment(doctor, DOCTOR_LOCATIONS[doctor], NO_OPENINGS)
+
+def find_colleague(doctor: str, duration: int, day: date):
+    """Another doctor working at ``doctor``'s location on ``day`` with room that day, or None."""
+    try:
+        return get_doctor_assigner().colleague(doctor, duration, day.strftime("%Y-%m-%d"))
+    except Exception as e:
+        logger.error("Error finding a colleague: %s", e)
+        return None
+
+@METRICS.timed("agent_storage_seconds", op="earliest_slots")
+def find_earliest_slots(start: date, days: int, duration: int, location: str = None, doctor: str = None, n: int = 5,
+                        from_time: str = None):
+    """Earliest n (date, time, doctor, location) openings across doctors, optionally at one location or with one doctor.
+
+    ``from_time`` (HH:MM) skips earlier starts on the first day; starts already past today are always skipped.
+    """
+    try:
+        horizon = get_schedule_horizon()
+        end = min(start + timedelta(days=days - 1), horizon.window()[1])
+        horizon.ensure_range(start, (end - start).days + 1)
+        return get_capacity_index().earliest(
+            start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), duration, n, doctor=doctor, location=location,
+            from_minute=max(to_minutes(from_time) if from_time else 0, earliest_start(start)),
+        )
+    except Exception as e:
+        logger.error("Error searching slots: %s", e)
+        return []
+
+def can_book_duration(day_avail: DayAvailability, start_time: str, duration_minutes: int, from_minute: int = 0):
+    """Check if we can book consecutive slots for the required duration, starting no earlier than ``from_minute``."""
+    try:
+        start = to_minutes(start_time)
+        return start >= from_minute and day_avail.can_book(start, duration_minutes)
+    except Exception:
+        return False
+
+@METRICS.timed("agent_storage_seconds", op="book")
+def book_appointment_slot(day: date, start_time: str, patient_name: str, duration: int, patient_type: str, doctor: str,
+                          appointment_id: str = ""):
+    """Atomically book consecutive slots for the appointment duration under ``appointment_id``.
+
+    Returns a BookingStatus, or None if the store failed.
+    """
+    try:
+        day_str = day.strftime("%Y-%m-%d")
+        times = slot_times(start_time, duration, SLOT_STEP_MIN)
+        status = get_schedule_store().book(day_str, times, patient_name, duration, patient_type, doctor,
+                                           appointment_id)
+    except Exception as e:
+        logger.error("Error booking appointment: %s", e)
+        return None
+    METRICS.count("agent_bookings_total", status=status.value)
+    if status == BookingStatus.BOOKED:
+        METRICS.count("agent_rows_written_total", len(times), op="book")
+        get_schedule_summary().record_booking(day_str, start_time, patient_name, duration, patient_type, doctor,
+                                              doctor_location(doctor, day))
+    return status
+
+@lru_cache(maxsize=None)
+def get_schedule_summary() -> ScheduleSummary:
+    """Per-day overview aggregates shared by every session in this process."""
+    return ScheduleSummary(get_schedule_store(), SLOT_STEP_MIN, (RECURRING_PATIENT_DURATION, NEW_PATIENT_DURATION))
+
+
+@lru_cache(maxsize=None)
+def get_patient_index() -> PatientIndex:
+    """Patient registry index shared by every session in this process; its fuzzy-match
+    index is built on a background thread."""
+    index = PatientIndex(PATIENT_FILE)
+    threading.Thread(target=index.build_matcher, name="patient-matcher", daemon=True).start()
+    return index
+
+@METRICS.timed("agent_storage_seconds", op="find_patient")
+def find_patient(name: str, dob: str):
+    """Return the stored patient (name, dob, email, phone) or None."""
+    try:
+        return get_patient_index().get(name, dob)
+    except Exception:
+        return None
+
+@METRICS.timed("agent_storage_seconds", op="match_patient")
+def match_patient(info: dict):
+    """Likeliest registered patient for a name/DOB with no exact record (a ``matching.Match``), or None."""
+    try:
+        matches = get_patient_index().match(info["name"], info["dob"], info.get("email", ""), info.get("phone", ""),
+                                            limit=1)
+    except Exception as e:
+        logger.error("Error matching patient: %s", e)
+        return None
+    return matches[0] if matches else None
+
+@METRICS.timed("agent_storage_seconds", op="save_patient")
+def save_patient_if_new(patient: dict):
+    """Append a new patient to the registry (one fsync'd CSV row)."""
+    try:
+        index = get_patient_index()
+        if index.get(patient["name"], patient["dob"]) is None:
+            append_csv_row(PATIENT_FILE, PATIENT_COLUMNS, patient)
+            index.add(patient)
+            METRICS.count("agent_rows_written_total", op="save_patient")
+        return True
+    except Exception as e:
+        logger.error("Error saving patient: %s", e)
+        return False
+
+@lru_cache(maxsize=None)
+def get_appointment_ledger() -> AppointmentLedger:
+    """Finalized-appointment journal; seeded from final.xlsx on first use."""
+    return AppointmentLedger(FINAL_LEDGER, legacy_xlsx=FINAL_FILE)
+
+@METRICS.timed("agent_storage_seconds", op="save_final_details")
+def save_final_details(patient, appt_date, appt_time, duration, patient_type, insurance, doctor, location,
+                       appointment_id=""):
+    """Append final appointment details to the ledger."""
+    try:
+        row = {
+            "name": patient["name"],
+            "dob": patient["dob"],
+            "email": patient.get("email", ""),
+            "phone": patient.get("phone", ""),
+            "date": appt_date.strftime("%Y-%m-%d"),
+            "time": appt_time,
+            "duration": duration,
+            "patient_type": patient_type,
+            "doctor": doctor,
+            "location": location,
+            "insurance_carrier": insurance.get("insurance_carrier",""),
+            "member_id": insurance.get("member_id",""),
+            "group_number": insurance.get("group_number",""),
+            "confirmed": "Yes",
+            "notes": "",
+            "appointment_id": appointment_id,
+            "status": BOOKED,
+        }
+        get_appointment_ledger().append(row)
+        METRICS.count("agent_rows_written_total", op="save_final_details")
+        return True
+    except Exception as e:
+        logger.error("Error saving final details: %s", e)
+        return False
+
+# -----------------------
+# Sessions
+# -----------------------
+@lru_cache(maxsize=None)
+def get_session_store() -> SessionStore:
+    """Conversation checkpoints shared by every replica on the host; idle sessions are swept in the background."""
+    store = SQLiteSessionStore(SESSION_DB)
+    SessionSweeper(store, SESSION_TTL_SECONDS, SESSION_SWEEP_SECONDS).start()
+    return store
+
+# -----------------------
+# Metrics
+# -----------------------
+@lru_cache(maxsize=None)
+def get_metrics_writer() -> MetricsFileWriter:
+    """Appends this process's metrics to METRICS_FILE every METRICS_FLUSH_SECONDS."""
+    writer = MetricsFileWriter(METRICS, METRICS_FILE, METRICS_FLUSH_SECONDS)
+    writer.start()
+    return writer
+
+# -----------------------
+# Notifications
+# -----------------------
+@lru_cache(maxsize=None)
+def get_notifier() -> Notifier:
+    """Pooled SMTP connections and a shared Twilio client for this process."""
+    return default_notifier()
+
+@lru_cache(maxsize=None)
+def get_notification_dispatcher() -> NotificationDispatcher:
+    """Persistent queue plus background delivery workers, shared by every session."""
+    dispatcher = NotificationDispatcher(NotificationQueue(NOTIFY_DB), get_notifier())
+    dispatcher.start()
+    return dispatcher
+
+@METRICS.timed("agent_storage_seconds", op="queue_notification")
+def queue_notification(channel: str, recipient: str, message: str, subject: str = "", dedupe_key: str = None):
+    """Queue an email/SMS for background delivery; returns immediately."""
+    dispatcher = get_notification_dispatcher()
+    if channel not in dispatcher.notifier.senders:
+        label = {"email": "Email", "sms": "SMS"}.get(channel, channel)
+        logger.warning("%s not configured properly", label)
+        return False
+    try:
+        dispatcher.enqueue(channel, recipient, message, subject, dedupe_key)
+        return True
+    except Exception as e:
+        logger.error("Notification queue error: %s", e)
+        return False
+
+def notify_patient(record: dict, message: str, subject: str, event: str):
+    """Queue ``message`` to the email and phone on an appointment record; ``event`` keys the dedupe."""
+    appointment_id = record.get("appointment_id") or appointment_key(record)
+    if record.get("email"):
+        queue_notification("email", record["email"], message, subject, f"{appointment_id}:email:{event}")
+    phone = record.get("phone") or PATIENT_NOTIFY_PHONE
+    if phone:
+        queue_notification("sms", phone, message, dedupe_key=f"{appointment_id}:sms:{event}")
+
+def parse_patient_text(text: str):
+    """Parse patient information from text input (DOB normalized to YYYY-MM-DD)."""
+    return parse_patient(text).fields
+
+def parse_insurance_text(text: str):
+    """Parse insurance information from text input."""
+    return parse_insurance(text).fields
+
+# -----------------------
+# Cancellation, rescheduling & waitlist
+# -----------------------
+@lru_cache(maxsize=None)
+def get_waitlist() -> Waitlist:
+    """Waitlist index shared by every session in this process."""
+    return Waitlist(WAITLIST_DB, SLOT_STEP_MIN)
+
+def join_waitlist(patient: dict, patient_type: str, duration: int, first: date, last: date,
+                  doctor: str = "", priority: int = 0) -> WaitlistRequest:
+    """Book ``patient`` automatically if ``duration`` minutes open up in [first, last]."""
+    return get_waitlist().add(patient["name"], patient["dob"], patient_type, duration, first.strftime("%Y-%m-%d"),
+                              last.strftime("%Y-%m-%d"), doctor, patient.get("email", ""), patient.get("phone", ""),
+                              priority)
+
+def backfill_freed(freed: AppointmentSlots) -> List[Backfilled]:
+    """Offer freed slots to the waitlist and tell the patients booked into them."""
+    try:
+        filled = offer_to_waitlist(get_waitlist(), get_schedule_store(), get_appointment_ledger(), freed,
+                                   datetime.now())
+    except Exception as e:
+        logger.error("Error backfilling from the waitlist: %s", e)
+        return []
+    METRICS.count("agent_waitlist_backfills_total", len(filled))
+    for b in filled:
+        notify_patient(
+            {"appointment_id": b.appointment_id, "email": b.request.email, "phone": b.request.phone},
+            f"Hi {b.request.name}, a slot opened up: your {b.request.duration}-minute appointment is booked for "
+            f"{b.day} at {b.time} with {b.doctor} at {freed.location}. Appointment ID: {b.appointment_id}.",
+            f"Appointment Booked from Waitlist - {b.day} at {b.time}", "confirmation",
+        )
+    return filled
+
+@METRICS.timed("agent_storage_seconds", op="cancel")
+def cancel_appointment(appointment_id: str, reason: str = "") -> AppointmentChange:
+    """Free an appointment's slots, record the cancellation and backfill from the waitlist."""
+    change = _cancel(get_schedule_store(), get_appointment_ledger(), appointment_id, reason)
+    METRICS.count("agent_cancellations_total", status=change.status.value)
+    if change.status != ChangeStatus.DONE:
+        return change
+    r = change.record
+    notify_patient(r, f"Hi {r.get('name', '')}, your appointment on {r['date']} at {r['time']} with "
+                      f"{r.get('doctor', '')} has been cancelled.",
+                   f"Appointment Cancelled - {r['date']} at {r['time']}", "cancelled")
+    return change._replace(backfilled=backfill_freed(change.freed))
+
+@METRICS.timed("agent_storage_seconds", op="reschedule")
+def reschedule_appointment(appointment_id: str, day: date, start_time: str, doctor: str = None) -> AppointmentChange:
+    """Move an appointment to a new start (and optionally doctor), then backfill the old slots."""
+    get_schedule_horizon().ensure([day])
+    change = _reschedule(get_schedule_store(), get_appointment_ledger(), appointment_id, day.strftime("%Y-%m-%d"),
+                         start_time, SLOT_STEP_MIN, doctor)
+    METRICS.count("agent_reschedules_total", status=change.status.value)
+    if change.status != ChangeStatus.DONE:
+        return change
+    r = change.record
+    notify_patient(r, f"Hi {r.get('name', '')}, your appointment has moved to {r['date']} at {r['time']} with "
+                      f"{r['doctor']} at {r.get('location', '')}.",
+                   f"Appointment Rescheduled - {r['date']} at {r['time']}", f"rescheduled-{r['date']}T{r['time']}")
+    return change._replace(backfilled=backfill_freed(change.freed))
+
+
+# -----------------------
+# Minimal LangGraph Engine
+# -----------------------
+class LGNode:
+    def __init__(self, name: str, handler: Callable[[dict, str], dict]):
+        self.name = name
+        self.handler = handler
+
+class LangGraph:
+    def __init__(self):
+        self.nodes: Dict[str, LGNode] = {}
+        self.start_node: str = ""
+    def add_node(self, node: LGNode):
+        self.nodes[node.name] = node
+    def set_start(self, name: str):
+        self.start_node = name
+    def step(self, current: str, state: dict, user_input: str) -> dict:
+        if current not in self.nodes:
+            return {"next": "error", "response": "Invalid node"}
+        with METRICS.timer("agent_node_seconds", node=current):
+            return self.nodes[current].handler(state, user_input)
+
+# -----------------------
+# State & Handlers
+# -----------------------
+def make_initial_state():
+    return {
+        "phase": "greet",
+        "patient": {},
+        "existing": False,
+        "appointment_date": None,
+        "appointment_time": "",
+        "appointment_duration": 30,
+        "patient_type": "New",
+        "doctor": "",
+        "location": "",
+        "insurance": {},
+        "messages": [
+            "👋 Welcome to the Medical Appointment Scheduler!",
+            "Please provide your information in the following format:",
+            "**For New Patients:**",
+            "• Name: [Full Name], DOB: [YYYY-MM-DD], Email: [email@example.com], Phone: [+1234567890]",
+            "**For Returning Patients:**",
+            "• Name: [Full Name], DOB: [YYYY-MM-DD]",
+            "",
+            "**Example:** Name: John Doe, DOB: 1990-01-15, Email: john@email.com, Phone: +1234567890"
+        ],
+        "completed": False,
+        "reminders": [],
+        "offered_slots": [],
+        "appointment_id": "",
+        "waitlist_window": None,  # [first, last] day the patient may join the waitlist for
+        "waitlist_request": None,  # waitlist request ID once joined; the conversation ends without a booking
+        "identity_candidate": None,
+        "identity_declined": None,  # [name, dob] of a suggested record the patient said isn't them
+        "current_node": "greet"
+    }
+
+def admit_patient(state: dict, info: dict, record) -> dict:
+    """Set the patient type and duration (``record`` is the registry row, None for a new patient)."""
+    state["existing"] = record is not None
+    if record is not None:
+        # Existing patient contact info comes from the registry
+        info.update(name=record.get("name", info["name"]), dob=record.get("dob", info["dob"]),
+                    email=record.get("email", ""), phone=record.get("phone", ""))
+        state["patient_type"] = "Recurring"
+        state["appointment_duration"] = RECURRING_PATIENT_DURATION
+        response = f"✅ Welcome back, {info['name']}! (Returning Patient - 30 min appointment)"
+    else:
+        state["patient_type"] = "New"
+        state["appointment_duration"] = NEW_PATIENT_DURATION
+        response = f"✅ Welcome {info['name']}! (New Patient - 60 min appointment)"
+    state["patient"] = info
+    locations = " / ".join(dict.fromkeys(DOCTOR_LOCATIONS.values()))
+    return {"next": "doctor", "response": response + "\n\nChecking doctor and location assignment... "
+                                                     f"Reply with a preferred location ({locations}) or 'ok'."}
+
+NEW_PATIENT_CONTACT_REQUIRED = "❌ New patients must provide email and phone. Please include: Name, DOB, Email, and Phone."
+
+def mask_contact(record: dict) -> str:
+    """'j***@example.com, phone ending 42' - enough to recognize, not to read off."""
+    parts = []
+    email = record.get("email", "")
+    if "@" in email:
+        local, domain = email.split("@", 1)
+        parts.append(f"{local[:1]}***@{domain}")
+    phone = record.get("phone", "")
+    if len(phone) >= 2:
+        parts.append(f"phone ending {phone[-2:]}")
+    return ", ".join(parts)
+
+def node_greet_handler(state: dict, user_input: str) -> dict:
+    if not user_input:
+        return {"next": "greet", "response": "👋 Welcome! Please provide your information."}
+    
+    parsed = parse_patient(user_input)
+    info = parsed.fields
+    
+    if parsed.complete:
+        record = find_patient(info["name"], info["dob"])
+        if record is not None:
+            return admit_patient(state, info, record)
+
+        # No exact record: a typo'd name or DOB of a registered patient is confirmed before
+        # they are treated as new (the DOB on file is not shown)
+        match = match_patient(info)
+        if match is not None and [match.record.get("name"), match.record.get("dob")] != state.get("identity_declined"):
+            state["patient"] = info
+            state["identity_candidate"] = match.record
+            contact = mask_contact(match.record)
+            return {
+                "next": "confirm_identity",
+                "response": f"🔎 We have a patient record for **{match.record.get('name', '')}**"
+                            f"{f' ({contact})' if contact else ''}. Is that you? (yes / no)"
+            }
+
+        if not info["email"] or not info["phone"]:
+            return {"next": "greet", "response": NEW_PATIENT_CONTACT_REQUIRED}
+        return admit_patient(state, info, None)
+    
+    hint = f" ({'; '.join(parsed.issues)})" if parsed.issues else ""
+    return {"next": "greet", "response": f"❌ Please provide at least your name and date of birth.{hint}"}
+
+def node_confirm_identity_handler(state: dict, user_input: str) -> dict:
+    txt = (user_input or "").strip().lower().rstrip(".!")
+    record = state.get("identity_candidate")
+    info = state["patient"]
+    if record is None:
+        return {"next": "greet", "response": "👋 Please provide your information again."}
+    if txt in ("yes", "y", "yeah", "yep", "correct", "that's me", "that is me"):
+        state["identity_candidate"] = None
+        return admit_patient(state, info, record)
+    if txt in ("no", "n", "nope", "not me", "that's not me"):
+        state["identity_candidate"] = None
+        state["identity_declined"] = [record.get("name"), record.get("dob")]
+        if not info.get("email") or not info.get("phone"):
+            return {"next": "greet", "response": NEW_PATIENT_CONTACT_REQUIRED}
+        return admit_patient(state, info, None)
+    return {"next": "confirm_identity", "response": f"Please reply yes or no: are you {record.get('name', '')}?"}
+
+def location_preference(text: str):
+    """The clinic location named in ``text`` ('downtown', 'Uptown Branch', ...), or None."""
+    words = (text or "").lower().split()
+    for location in dict.fromkeys(DOCTOR_LOCATIONS.values()):
+        name = location.lower()
+        if name in " ".join(words) or name.split()[0] in words:
+            return location
+    return None
+
+def node_doctor_handler(state: dict, user_input: str) -> dict:
+    # The doctor's grid lives at their clinic
+    preferred = location_preference(user_input)
+    assignment = assign_doctor(state["patient"], state["appointment_duration"], preferred)
+    state["doctor"] = assignment.doctor
+    state["location"] = assignment.location
+
+    notes = {
+        CONTINUITY: " (from your previous visits)",
+        AVAILABILITY: " (most availability)",
+    }
+    note = ""
+    if preferred and assignment.location != preferred:
+        note = f"\nℹ️ No openings at {preferred} in the booking window, so here is the next best option."
+    duration_text = f"{state['appointment_duration']} minutes"
+    return {
+        "next": "date", 
+        "response": f"👨‍⚕️ **Doctor:** {assignment.doctor}{notes.get(assignment.reason, '')}\n📍 **Location:** {assignment.location}\n⏱️ **Duration:** {duration_text}{note}\n\n📅 **Choose date:** today / tomorrow / day after / first available / next week / YYYY-MM-DD"
+    }
+
+def date_range_choice(txt: str, today: date):
+    """(first, last) day for 'first available' / 'this week' / 'next week', else None."""
+    if txt in ("first available", "first", "earliest", "asap"):
+        return today, get_schedule_horizon().window(today)[1]
+    if txt == "this week":
+        return today, today + timedelta(days=6 - today.weekday())
+    if txt == "next week":
+        monday = today + timedelta(days=7 - today.weekday())
+        return monday, monday + timedelta(days=6)
+    return None
+
+def offer_openings(state: dict, first: date, last: date) -> dict:
+    """List the earliest openings with the patient's doctor in [first, last] and let them pick one."""
+    duration, doctor = state["appointment_duration"], state["doctor"]
+    openings = find_earliest_slots(first, (last - first).days + 1, duration, doctor=doctor)
+    if not openings:
+        return {"next": "date", "response": f"❌ No {duration}-minute openings with {doctor} between "
+                                            f"{first.strftime('%Y-%m-%d')} and {last.strftime('%Y-%m-%d')}. Pick another date."
+                                            + offer_waitlist(state, first, last)}
+    state["offered_slots"] = [[d, t] for d, t, _, _ in openings]
+    listing = "\n".join(f"{i}. {d} at {t} ({loc})" for i, (d, t, _, loc) in enumerate(openings, start=1))
+    return {
+        "next": "book",
+        "response": f"📅 **Earliest {duration}-minute openings with {doctor}:**\n{listing}\n\nReply with the option number (e.g., 1)."
+    }
+
+def offer_waitlist(state: dict, first: date, last: date) -> str:
+    """Remember [first, last] so a 'waitlist' reply can join it; the hint to append to the reply."""
+    state["waitlist_window"] = [first.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d")]
+    return "\n\nOr reply 'waitlist' to be booked automatically if a slot opens up in that time."
+
+def waitlist_join_reply(state: dict) -> dict:
+    first, last = (date.fromisoformat(d) for d in state["waitlist_window"])
+    if not state["existing"] and not save_patient_if_new(state["patient"]):
+        return {"next": "date", "response": "❌ Error saving patient information."}
+    try:
+        request = join_waitlist(state["patient"], state["patient_type"], state["appointment_duration"], first, last)
+    except Exception as e:
+        logger.error("Error joining the waitlist: %s", e)
+        return {"next": "date", "response": "❌ Could not add you to the waitlist. Please pick another date."}
+    state["waitlist_request"] = request.id
+    state["completed"] = True
+    span = first.strftime("%Y-%m-%d") if first == last else f"{first:%Y-%m-%d} to {last:%Y-%m-%d}"
+    return {"next": "done", "response": f"📝 You're on the waitlist for {span}. If a {state['appointment_duration']}-minute "
+                                        "slot opens up with any of our doctors, we'll book it and send you a confirmation."}
+
+def node_date_handler(state: dict, user_input: str) -> dict:
+    txt = (user_input or "").strip().lower()
+    today = date.today()
+    state["offered_slots"] = []
+    if txt == "waitlist" and state.get("waitlist_window"):
+        return waitlist_join_reply(state)
+    state["waitlist_window"] = None
+    
+    span = date_range_choice(txt, today)
+    if span:
+        return offer_openings(state, *span)
+    if txt in ("today", "t", "1"):
+        state["appointment_date"] = today
+    elif txt in ("tomorrow", "2"):
+        state["appointment_date"] = today + timedelta(days=1)
+    elif txt in ("day after", "3"):
+        state["appointment_date"] = today + timedelta(days=2)
+    else:
+        try:
+            state["appointment_date"] = datetime.strptime(txt, "%Y-%m-%d").date()
+        except Exception:
+            return {"next": "date", "response": "❌ Invalid date. Use today/tomorrow/day after/first available/next week or YYYY-MM-DD."}
+    
+    horizon = get_schedule_horizon()
+    if not horizon.in_window(state["appointment_date"], today):
+        _, last = horizon.window(today)
+        return {"next": "date", "response": f"❌ Please pick a date from today to {last.strftime('%Y-%m-%d')}."}
+    return {"next": "slots", "response": None}
+
+def node_slots_handler(state: dict, user_input: str) -> dict:
+    is_new_patient = not state["existing"]
+    available_slots = get_available_slots_for_patient(state["appointment_date"], is_new_patient, state["doctor"])
+    switched = ""
+
+    if not available_slots:
+        # A colleague at the same clinic may still have room that day
+        colleague = find_colleague(state["doctor"], state["appointment_duration"], state["appointment_date"])
+        if colleague:
+            available_slots = get_available_slots_for_patient(state["appointment_date"], is_new_patient, colleague)
+            if available_slots:
+                switched = f"ℹ️ {state['doctor']} is fully booked that day; {colleague} at {doctor_location(colleague, state['appointment_date'])} has openings.\n\n"
+                state["doctor"] = colleague
+
+    if not available_slots:
+        response = f"❌ No available {state['appointment_duration']}-minute slots with {state['doctor']} for this date. Pick another date."
+        openings = find_earliest_slots(
+            state["appointment_date"], 14, state["appointment_duration"], location=state["location"]
+        )
+        if openings:
+            listing = "\n".join(f"• {d} at {t} ({doc})" for d, t, doc, _ in openings)
+            response += f"\n\n📅 **Earliest openings at {state['location']}:**\n{listing}"
+        response += offer_waitlist(state, state["appointment_date"], state["appointment_date"])
+        return {"next": "date", "response": response}
+    
+    slots_str = ", ".join(available_slots)
+    duration_text = f"{state['appointment_duration']} minutes"
+    location = doctor_location(state["doctor"], state["appointment_date"])
+    return {
+        "next": "book", 
+        "response": f"{switched}🕒 **Available {duration_text} slots** for {state['appointment_date'].strftime('%Y-%m-%d')} with {state['doctor']} at {location}:\n{slots_str}\n\nPick a time (e.g., 10:00)."
+    }
+
+def node_book_handler(state: dict, user_input: str) -> dict:
+    time_slot = (user_input or "").strip()
+    offered = state.get("offered_slots") or []
+    if offered:
+        if not (time_slot.isdigit() and 1 <= int(time_slot) <= len(offered)):
+            return {"next": "book", "response": f"❌ Please reply with an option number from 1 to {len(offered)}."}
+        day_str, time_slot = offered[int(time_slot) - 1]
+        # From here on it's a booking on that day; a retry is typed as a time.
+        state["appointment_date"] = date.fromisoformat(day_str)
+        state["offered_slots"] = []
+    elif ":" not in time_slot and time_slot.isdigit():
+        time_slot = f"{time_slot}:00"
+    time_slot = str(time_slot).strip()[:5]
+    
+    is_new_patient = not state["existing"]
+    try:
+        day_avail = get_day_availability(state["appointment_date"], state["doctor"])
+    except Exception as e:
+        logger.error("Error getting available slots: %s", e)
+        return {"next": "book", "response": "❌ Failed to load the schedule. Please try again."}
+    
+    from_minute = earliest_start(state["appointment_date"])
+    if can_book_duration(day_avail, time_slot, state["appointment_duration"], from_minute):
+        appointment_id = new_appointment_id()
+        status = book_appointment_slot(
+            state["appointment_date"], 
+            time_slot, 
+            state["patient"]["name"],
+            state["appointment_duration"],
+            state["patient_type"],
+            state["doctor"],
+            appointment_id
+        )
+        
+        if status == BookingStatus.BOOKED:
+            state["appointment_time"] = time_slot
+            state["appointment_id"] = appointment_id
+            state["location"] = doctor_location(state["doctor"], state["appointment_date"])
+            return {
+                "next": "insurance",
+                "response": f"✅ **{state['appointment_duration']}-minute appointment** booked for {state['appointment_date'].strftime('%Y-%m-%d')} at {time_slot}!\n\n💳 Please provide your insurance information:\n**Example:** Insurance: Blue Cross, Member ID: 123456, Group Number: ABC123"
+            }
+        elif status == BookingStatus.SLOT_TAKEN:
+            available_slots = get_available_slots_for_patient(state["appointment_date"], is_new_patient, state["doctor"])
+            return {"next": "book", "response": f"❌ Sorry, {time_slot} was just taken by another patient. Try one of: {', '.join(available_slots)}"}
+        else:
+            return {"next": "book", "response": "❌ Failed to book the slot. Please try another time."}
+    else:
+        available_slots = day_avail.start_times(state["appointment_duration"], from_minute)
+        return {"next": "book", "response": f"❌ That time slot is not available. Try one of: {', '.join(available_slots)}"}
+
+def node_insurance_handler(state: dict, user_input: str) -> dict:
+    info = parse_insurance_text(user_input or "")
+    if info["insurance_carrier"] and info["member_id"] and info["group_number"]:
+        state["insurance"] = info
+        return {"next": "finalize", "response": None}
+    return {
+        "next": "insurance", 
+        "response": "❌ Missing insurance info. Please provide:\n**Insurance:** [Carrier Name], **Member ID:** [ID], **Group Number:** [Number]"
+    }
+
+def node_finalize_handler(state: dict, user_input: str) -> dict:
+    # Save patient if new
+    if not state["existing"]:
+        if not save_patient_if_new(state["patient"]):
+            return {"next": "finalize", "response": "❌ Error saving patient information."}
+    
+    # Save final appointment details
+    success = save_final_details(
+        state["patient"],
+        state["appointment_date"],
+        state["appointment_time"],
+        state["appointment_duration"],
+        state["patient_type"],
+        state["insurance"],
+        state["doctor"],
+        state["location"],
+        state["appointment_id"]
+    )
+    
+    if not success:
+        return {"next": "finalize", "response": "❌ Error finalizing appointment."}
+    
+    state["completed"] = True
+    # Sent by the reminder daemon (python -m appointment_agent.reminders) from the ledger entry above
+    state["reminders"] = [
+        f"⏰ Reminder {label} before: {due.strftime('%Y-%m-%d %H:%M')}"
+        for label, due in reminder_times(datetime.combine(state['appointment_date'],
+                                                          datetime.strptime(state['appointment_time'], "%H:%M").time()))
+    ]
+    
+    # Create confirmation messages
+    summary = f"""
+🎉 **Appointment Confirmed!**
+
+**Patient:** {state['patient']['name']} ({state['patient_type']})
+**Date:** {state['appointment_date'].strftime('%Y-%m-%d')}
+**Time:** {state['appointment_time']}
+**Duration:** {state['appointment_duration']} minutes
+**Doctor:** {state['doctor']}
+**Location:** {state['location']}
+**Insurance:** {state['insurance']['insurance_carrier']}
+**Appointment ID:** {state['appointment_id']} (quote it to cancel or reschedule)
+    """
+    
+    # Notifications are delivered in the background so the chat confirms immediately
+    notification_msg = (
+        f"Hi {state['patient']['name']}, your {state['appointment_duration']}-minute appointment is confirmed for "
+        f"{state['appointment_date']} at {state['appointment_time']} with {state['doctor']} at {state['location']}. "
+        f"Insurance: {state['insurance']['insurance_carrier']}. Appointment ID: {state['appointment_id']}."
+    )
+    
+    notifications_sent = []
+    key = state.get("appointment_id") or appointment_key({
+        "name": state['patient']['name'], "dob": state['patient']['dob'], "date": str(state['appointment_date']),
+        "time": state['appointment_time'], "doctor": state['doctor'],
+    })
+    
+    # Queue Email
+    if state['patient'].get('email'):
+        email_subject = f"Appointment Confirmation - {state['appointment_date']} at {state['appointment_time']}"
+        if queue_notification("email", state['patient']['email'], notification_msg, email_subject,
+                              f"{key}:email:confirmation"):
+            notifications_sent.append(f"📧 Email confirmation queued for {state['patient']['email']}")
+        else:
+            notifications_sent.append("❌ Email could not be queued")
+    
+    # Queue SMS
+    phone_number = state['patient'].get('phone', PATIENT_NOTIFY_PHONE)
+    if phone_number:
+        if queue_notification("sms", phone_number, notification_msg, dedupe_key=f"{key}:sms:confirmation"):
+            notifications_sent.append(f"📱 SMS confirmation queued for {phone_number}")
+        else:
+            notifications_sent.append("❌ SMS could not be queued")
+    
+    # Add notification status to messages
+    for notification in notifications_sent:
+        state["messages"].append(notification)
+    
+    return {"next": "done", "response": summary.strip()}
+
+def node_done_handler(state: dict, user_input: str) -> dict:
+    return {"next": "done", "response": "✅ Appointment completed. Click 'Start New Appointment' to begin again."}
+
+# -----------------------
+# Build Graph
+# -----------------------
+def build_graph() -> LangGraph:
+    g = LangGraph()
+    g.add_node(LGNode("greet", node_greet_handler))
+    g.add_node(LGNode("confirm_identity", node_confirm_identity_handler))
+    g.add_node(LGNode("doctor", node_doctor_handler))
+    g.add_node(LGNode("date", node_date_handler))
+    g.add_node(LGNode("slots", node_slots_handler))
+    g.add_node(LGNode("book", node_book_handler))
+    g.add_node(LGNode("insurance", node_insurance_handler))
+    g.add_node(LGNode("finalize", node_finalize_handler))
+    g.add_node(LGNode("done", node_done_handler))
+    g.set_start("greet")
+    return g
+
+
+# -----------------------
+# Conversation
+# -----------------------
+def new_conversation() -> dict:
+    """Fresh state with the welcome message already in the history."""
+    state = make_initial_state()
+    state["conversation_history"] = [("Assistant", WELCOME_MESSAGE)]
+    state["initialized"] = True
+    return state
+
+def run_turn(graph: LangGraph, state: dict, user_input: str) -> List[str]:
+    """Apply one user message to ``state`` and return the assistant's replies.
+
+    Timed as ``agent_turn_seconds``; profiled when PROFILE_MODE is set.
+    """
+    node = state.get("current_node", graph.start_node)
+    with profile_turn(PROFILE_MODE, PROFILE_DIR, node, PROFILE_MIN_MS), METRICS.timer("agent_turn_seconds", node=node):
+        return _run_turn(graph, state, user_input)
+
+def _run_turn(graph: LangGraph, state: dict, user_input: str) -> List[str]:
+    state.setdefault("conversation_history", []).append(("User", user_input))
+    current_node = state.get("current_node", graph.start_node)
+    result = graph.step(current_node, state, user_input)
+    next_node = result.get("next", current_node)
+    state["current_node"] = next_node
+    replies = [result["response"]] if result.get("response") else []
+
+    if next_node in AUTO_ADVANCE_NODES and result.get("response") is None:
+        res2 = graph.step(next_node, state, "")
+        state["current_node"] = res2.get("next", next_node)
+        if res2.get("response"):
+            replies.append(res2["response"])
+
+    state["conversation_history"].extend(("Assistant", reply) for reply in replies)
+    return replies
@@ -0,0 +1,96 @@
+"""Rolling schedule horizon: which days get slot grids, and archiving past ones.
+
+``ClinicCalendar`` says when and where each doctor works: clinic-wide closed
+weekdays and dates, per-doctor hours, and the weekdays a doctor covers a
+clinic other than their own. ``ScheduleHorizon`` creates a day's grids
+the first time a query touches it, and only for days between today and the
+look-ahead. ``roll(today)`` moves every earlier day to the store's archive
+table, so the live table holds about ``look_ahead`` days of slots however
+long the clinic has been running.
+"""
+import threading
+from dataclasses import dataclass, field
+from datetime import date, time, timedelta
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+
+from .schedule_store import ScheduleStore, day_slot_rows
+
+
+@dataclass(frozen=True)
+class ClinicCalendar:
+    """Working days, hours and locations for each doctor."""
+
+    locations: Mapping[str, str]  # doctor -> home location
+    default_hours: Tuple[time, time]
+    step: int
+    hours: Mapping[str, Tuple[time, time]] = field(default_factory=dict)
+    closed_weekdays: FrozenSet[int] = frozenset()
+    closed_dates: FrozenSet[str] = frozenset()
+    rotation: Mapping[str, Mapping[int, str]] = field(default_factory=dict)  # doctor -> {weekday: location}
+
+    def is_open(self, day: date) -> bool:
+        return day.weekday() not in self.closed_weekdays and day.isoformat() not in self.closed_dates
+
+    def working_hours(self, doctor: str) -> Tuple[time, time]:
+        return self.hours.get(doctor, self.default_hours)
+
+    def location(self, doctor: str, day: date) -> str:
+        """Where ``doctor`` works on ``day``."""
+        return self.rotation.get(doctor, {}).get(day.weekday()) or self.locations.get(doctor, "")
+
+    def slot_rows(self, day_str: str, doctor: str) -> List[tuple]:
+        start, end = self.working_hours(doctor)
+        return day_slot_rows(day_str, start, end, self.step, doctor,
+                             self.location(doctor, date.fromisoformat(day_str)))
+
+
+class ScheduleHorizon:
+    """Lazily generated slot grids over ``[today, today + look_ahead)``."""
+
+    def __init__(self, store: ScheduleStore, calendar: ClinicCalendar, look_ahead: int):
+        self.store = store
+        self.calendar = calendar
+        self.look_ahead = look_ahead
+        self._lock = threading.Lock()
+        self._ready: Set[str] = set()  # days already generated (or closed) in this process
+
+    def window(self, today: Optional[date] = None) -> Tuple[date, date]:
+        """First and last bookable day."""
+        today = today or date.today()
+        return today, today + timedelta(days=self.look_ahead - 1)
+
+    def in_window(self, day: date, today: Optional[date] = None) -> bool:
+        first, last = self.window(today)
+        return first <= day <= last
+
+    def ensure(self, days: Iterable[date], today: Optional[date] = None) -> Dict[str, List[str]]:
+        """Create grids for the queried ``days`` inside the window; others are left alone."""
+        return self.generate(d for d in days if self.in_window(d, today))
+
+    def ensure_range(self, start: date, days: int, today: Optional[date] = None) -> Dict[str, List[str]]:
+        return self.ensure((start + timedelta(days=i) for i in range(days)), today)
+
+    def generate(self, days: Iterable[date]) -> Dict[str, List[str]]:
+        """Create every doctor's grid for the open ``days`` that don't have one yet,
+        regardless of the window. Returns ``{doctor: [dates created]}``."""
+        wanted = [d for d in days if d.isoformat() not in self._ready]
+        if not wanted:
+            return {}
+        open_days = [d.isoformat() for d in wanted if self.calendar.is_open(d)]
+        created: Dict[str, List[str]] = {}
+        with self._lock:
+            for doctor in self.calendar.locations if open_days else ():
+                missing = self.store.missing_days(open_days, doctor)
+                if missing:
+                    self.store.add_slots(row for day_str in missing for row in self.calendar.slot_rows(day_str, doctor))
+                    created[doctor] = missing
+            self._ready.update(d.isoformat() for d in wanted)
+        return created
+
+    def roll(self, today: Optional[date] = None) -> int:
+        """Archive every day before ``today``. Returns slot rows moved."""
+        today_str = (today or date.today()).isoformat()
+        moved = self.store.archive_before(today_str)
+        with self._lock:
+            self._ready = {d for d in self._ready if d >= today_str}
+        return moved
@@ -0,0 +1,238 @@
+"""Append-only journals for finalized appointments and new patients.
+
+Finalizing an appointment appends one fsync'd JSON line to ``final.jsonl``
+instead of re-reading and re-writing ``final.xlsx``; new patients are
+appended to ``patients.csv`` the same way. ``final.xlsx`` becomes an export
+produced on demand for staff.
+
+Appointments booked since IDs were introduced carry an ``appointment_id``. A
+cancellation or reschedule appends the appointment again with its new
+``status`` (and, when moved, its new date, time and doctor); the last line
+for an ID is its current state, and that is what the export shows:
+
+    python -m appointment_agent.ledger export --ledger final.jsonl --xlsx final.xlsx
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import threading
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .metrics import METRICS
+from .snapshot import CATEGORY, DAY, INT, MINUTE, Snapshot, load_snapshot, write_snapshot
+
+FINAL_COLUMNS = [
+    "name", "dob", "email", "phone", "date", "time", "duration", "patient_type", "doctor", "location",
+    "insurance_carrier", "member_id", "group_number", "confirmed", "notes", "appointment_id", "status",
+]
+
+BOOKED = "booked"
+RESCHEDULED = "rescheduled"
+CANCELLED = "cancelled"
+
+_append_lock = threading.Lock()
+
+
+def append_bytes(path: str, data: bytes):
+    """Append ``data`` with a single O_APPEND write and fsync it."""
+    with _append_lock:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    METRICS.count("agent_io_bytes_total", len(data), direction="write", file=os.path.basename(path))
+
+
+def append_csv_row(path: str, columns: Sequence[str], row: dict):
+    """Append one row to a CSV, writing the header first if the file is new."""
+    append_csv_rows(path, columns, [row])
+
+
+def append_csv_rows(path: str, columns: Sequence[str], rows: Iterable[dict]):
+    """Append rows to a CSV in a single write, writing the header first if the file is new."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    needs_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    if needs_header:
+        writer.writerow(columns)
+    elif not ends_with_newline(path):
+        buf.write("\n")
+    for row in rows:
+        writer.writerow(["" if row.get(c) is None else row.get(c) for c in columns])
+    append_bytes(path, buf.getvalue().encode("utf-8"))
+
+
+def ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as fh:
+        fh.seek(-1, os.SEEK_END)
+        return fh.read(1) == b"\n"
+
+
+FINAL_SCHEMA = {c: CATEGORY for c in FINAL_COLUMNS}
+FINAL_SCHEMA.update(date=DAY, time=MINUTE, duration=INT)
+
+
+class AppointmentLedger:
+    """JSONL journal of finalized appointments, one record per line.
+
+    Bulk reads go through ``load()``: a memory-mapped columnar snapshot of the
+    journal up to some offset (see ``snapshot.py``) plus the lines appended
+    since. Once that tail reaches ``compact_every`` lines the snapshot is
+    rewritten, so a load never parses more than that much JSON.
+    """
+
+    def __init__(self, path: str, legacy_xlsx: Optional[str] = None, snapshot_dir: Optional[str] = None,
+                 compact_every: Optional[int] = 10_000):
+        self.path = path
+        self.snapshot_dir = snapshot_dir or os.path.splitext(path)[0] + ".snapshot"
+        self.compact_every = compact_every
+        if not os.path.exists(path) and legacy_xlsx and os.path.exists(legacy_xlsx):
+            self._import_xlsx(legacy_xlsx)
+
+    def _import_xlsx(self, xlsx_path: str):
+        df = pd.read_excel(xlsx_path, dtype=str)
+        lines = []
+        for rec in df.to_dict("records"):
+            lines.append(json.dumps({c: _cell(rec.get(c)) for c in FINAL_COLUMNS}))
+        append_bytes(self.path, ("\n".join(lines) + "\n").encode("utf-8") if lines else b"")
+
+    def append(self, record: dict):
+        """Append one appointment; O(1) regardless of ledger size."""
+        line = json.dumps({c: record.get(c, "") for c in FINAL_COLUMNS}) + "\n"
+        append_bytes(self.path, line.encode("utf-8"))
+
+    def __iter__(self) -> Iterator[dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                # A torn final line (crash mid-write) is skipped, not fatal.
+                if line.endswith("\n") and line.strip():
+                    yield json.loads(line)
+
+    def extend(self, records: Iterable[dict]) -> int:
+        """Append many appointments with a single write and fsync. Returns records written."""
+        lines = [json.dumps({c: record.get(c, "") for c in FINAL_COLUMNS}) + "\n" for record in records]
+        if lines:
+            append_bytes(self.path, "".join(lines).encode("utf-8"))
+        return len(lines)
+
+    def read_from(self, offset: int = 0) -> Tuple[List[dict], int]:
+        """Records appended after byte ``offset`` and the offset to resume from.
+
+        A torn last line is left for the next call rather than skipped.
+        """
+        try:
+            with open(self.path, "rb") as fh:
+                fh.seek(offset)
+                data = fh.read()
+        except FileNotFoundError:
+            return [], 0
+        METRICS.count("agent_io_bytes_total", len(data), direction="read", file=os.path.basename(self.path))
+        end = data.rfind(b"\n") + 1
+        records = [json.loads(line) for line in data[:end].decode("utf-8").splitlines() if line.strip()]
+        return records, offset + end
+
+    def load(self) -> Tuple[Optional[Snapshot], List[dict], int]:
+        """The current snapshot (None if missing or stale), the records appended
+        after it, and the journal offset to tail from next."""
+        snap = self._snapshot()
+        tail, offset = self.read_from(snap.source_offset if snap is not None else 0)
+        if self.compact_every is not None and len(tail) >= self.compact_every:
+            self.compact()
+            return self.load()
+        return snap, tail, offset
+
+    def _snapshot(self) -> Optional[Snapshot]:
+        snap = load_snapshot(self.snapshot_dir)
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if snap is not None and snap.source_offset > size:
+            return None  # journal was replaced since the snapshot was taken
+        return snap
+
+    def compact(self) -> int:
+        """Rewrite the columnar snapshot to cover the whole journal. Returns rows in it."""
+        records, offset = self.read_from(0)
+        return write_snapshot(self.snapshot_dir, records, FINAL_SCHEMA, source_offset=offset)
+
+    def find(self, appointment_id: str) -> Optional[dict]:
+        """Latest record for ``appointment_id``, or None.
+
+        The journal tail is searched as bytes and only the matching line is
+        parsed; failing that, one snapshot column is compared.
+        """
+        if not appointment_id:
+            return None
+        snap = self._snapshot()
+        try:
+            with open(self.path, "rb") as fh:
+                fh.seek(snap.source_offset if snap is not None else 0)
+                data = fh.read()
+        except FileNotFoundError:
+            data = b""
+        # As append() writes it
+        pos = data.rfind(f'"appointment_id": {json.dumps(appointment_id)}'.encode("utf-8"))
+        end = data.find(b"\n", pos)
+        if pos >= 0 and end >= 0:
+            return json.loads(data[data.rfind(b"\n", 0, pos) + 1:end])
+        if snap is None or "appointment_id" not in snap.schema:
+            return None
+        rows = np.flatnonzero(np.asarray(snap.columns["appointment_id"]) == snap.code("appointment_id", appointment_id))
+        return snap.records([int(rows[-1])])[0] if len(rows) else None
+
+    def to_dataframe(self, current: bool = False) -> pd.DataFrame:
+        """Every journal line, or with ``current`` only the latest line of each appointment ID."""
+        snap, tail, _ = self.load()
+        frames = [pd.DataFrame(tail, columns=FINAL_COLUMNS)]
+        if snap is not None and len(snap):
+            frames.insert(0, snap.to_dataframe().astype(str).assign(duration=np.asarray(snap.columns["duration"])))
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        df = df.reindex(columns=FINAL_COLUMNS, fill_value="")  # snapshots from before a column was added
+        if current:
+            ids = df["appointment_id"].fillna("").astype(str)
+            df = df[(ids == "") | ~ids.duplicated(keep="last")].reset_index(drop=True)
+        return df
+
+    @METRICS.timed("agent_storage_seconds", op="ledger_export_xlsx")
+    def export_xlsx(self, xlsx_path: str) -> int:
+        """Compact the journal into an xlsx workbook for staff, one row per appointment. Returns rows written."""
+        df = self.to_dataframe(current=True)
+        tmp = xlsx_path + ".tmp.xlsx"
+        df.to_excel(tmp, index=False)
+        os.replace(tmp, xlsx_path)
+        return len(df)
+
+
+def appointment_key(record: dict) -> str:
+    """Stable identity of a booked appointment, used as the notification dedupe prefix."""
+    return "|".join(str(record.get(c, "")) for c in ("name", "dob", "date", "time", "doctor"))
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    text = str(value).strip()
+    return "" if text.lower() in ("nan", "none") else text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the finalized-appointment ledger.")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--ledger", default="final.jsonl")
+    parser.add_argument("--xlsx", default="final.xlsx")
+    args = parser.parse_args(argv)
+
+    # Seeds the ledger from an existing final.xlsx first, so exporting never drops history.
+    rows = AppointmentLedger(args.ledger, legacy_xlsx=args.xlsx).export_xlsx(args.xlsx)
+    print(f"Exported {rows} appointments from {args.ledger} to {args.xlsx}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Fuzzy returning-patient matching.
+
+``PatientIndex.get`` only finds a patient whose name and DOB are typed
+exactly as registered. ``PatientMatcher`` finds the likely ones: "Jon Doe"
+for "John A. Doe", a DOB with two digits or day and month swapped, "Doe,
+John". It is a blocked index, so a lookup scores a handful of records
+rather than the registry:
+
+* records are blocked on the ISO date of birth, and within a date on the
+  Soundex code of each name token (first and last; initials are ignored);
+* a query looks up its own DOB, taking records that share a Soundex code
+  with either of its names, and every DOB one typo away (a digit of the
+  day, month or two-digit year changed, two of them swapped, or day and
+  month swapped), taking records with the same pair of codes;
+* candidates are scored with Jaro-Winkler on the first and last names,
+  weighted towards the worse of the two, times 0.9 for a near DOB, plus
+  0.1 when the email or phone agrees.
+
+A name on its own never matches: without a DOB at or near the registered
+one there are too many namesakes to ask about.
+"""
+import re
+from calendar import monthrange
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Tuple
+
+from .config import PATIENT_MATCH_THRESHOLD
+from .parsing import normalize_dob
+
+NEAR_DOB_FACTOR = 0.9
+CONTACT_BONUS = 0.1
+
+_ISO_RE = re.compile(r"\d{4}-\d{2}-\d{2}$")
+_TOKEN_RE = re.compile(r"[^\W\d_]+")
+_TWO_DIGITS = [f"{i:02d}" for i in range(100)]
+_SOUNDEX = {c: code for code, letters in
+            {"1": "bfpv", "2": "cgjkqsxz", "3": "dt", "4": "l", "5": "mn", "6": "r"}.items() for c in letters}
+
+
+class Match(NamedTuple):
+    record: dict
+    score: float
+    exact_dob: bool
+
+
+def name_tokens(name: str) -> Tuple[str, str]:
+    """(first, last) lowercase name tokens, initials and punctuation dropped; ('', '') if none."""
+    tokens = [t for t in _TOKEN_RE.findall(str(name).lower().replace("'", "")) if len(t) > 1]
+    if not tokens:
+        return "", ""
+    return tokens[0], tokens[-1]
+
+
+@lru_cache(maxsize=1 << 16)  # name tokens repeat a lot
+def soundex(token: str) -> str:
+    if not token:
+        return ""
+    out = [token[0].upper()]
+    last = _SOUNDEX.get(token[0], "")
+    for c in token[1:]:
+        code = _SOUNDEX.get(c, "")
+        if code and code != last:
+            out.append(code)
+        if c not in "hw":
+            last = code
+    return ("".join(out) + "000")[:4]
+
+
+def jaro_winkler(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    la, lb = len(a), len(b)
+    if not la or not lb:
+        return 0.0
+    window = max(0, max(la, lb) // 2 - 1)
+    used = [False] * lb
+    a_matched = []
+    for i, c in enumerate(a):
+        for j in range(max(0, i - window), min(lb, i + window + 1)):
+            if not used[j] and b[j] == c:
+                used[j] = True
+                a_matched.append(c)
+                break
+    m = len(a_matched)
+    if not m:
+        return 0.0
+    b_matched = [b[j] for j in range(lb) if used[j]]
+    half_transpositions = sum(x != y for x, y in zip(a_matched, b_matched)) / 2
+    jaro = (m / la + m / lb + (m - half_transpositions) / m) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+def name_similarity(a: Tuple[str, str], b: Tuple[str, str]) -> float:
+    """0-1 similarity of two (first, last) pairs, either order; mostly the worse of the two names."""
+    best = 0.0
+    for x, y in ((b[0], b[1]), (b[1], b[0])):
+        s1, s2 = jaro_winkler(a[0], x), jaro_winkler(a[1], y)
+        best = max(best, 0.75 * min(s1, s2) + 0.25 * max(s1, s2))
+    return best
+
+
+def iso_dob(dob: str) -> str:
+    dob = str(dob).strip()
+    return dob if _ISO_RE.match(dob) else normalize_dob(dob)[0]
+
+
+@lru_cache(maxsize=None)
+def _typos(value: int, width: int) -> Tuple[int, ...]:
+    """Numbers whose ``width``-digit form is one changed digit or one adjacent swap away from ``value``'s."""
+    text = f"{value:0{width}d}"
+    out = {text[:i] + r + text[i + 1:] for i in range(width) for r in "0123456789"}
+    out.update(text[:i] + text[i + 1] + text[i] + text[i + 2:] for i in range(width - 1))
+    return tuple(sorted(int(t) for t in out if t != text))
+
+
+@lru_cache(maxsize=None)
+def _days_in_month(year: int, month: int) -> int:
+    return monthrange(year, month)[1]
+
+
+def dob_variants(dob: str) -> List[str]:
+    """Valid ISO dates one typo away from ``dob``: a digit of the day, month or two-digit year
+    changed, two of them swapped, or day and month swapped."""
+    try:
+        y, m, d = int(dob[:4]), int(dob[5:7]), int(dob[8:10])
+    except ValueError:
+        return []
+    century = y - y % 100
+    dates = [(century + yy, m, d) for yy in _typos(y % 100, 2)]
+    dates.extend((y, mm, d) for mm in _typos(m, 2))
+    dates.extend((y, m, dd) for dd in _typos(d, 2))
+    if d != m:
+        dates.append((y, d, m))
+    return [f"{yy}-{_TWO_DIGITS[mm]}-{_TWO_DIGITS[dd]}" for yy, mm, dd in dates
+            if yy >= 1000 and 1 <= mm <= 12 and 1 <= dd <= _days_in_month(yy, mm)]
+
+
+@lru_cache(maxsize=1 << 16)
+def _keys(first_code: str, last_code: str) -> Tuple[str, ...]:
+    """Block keys of a name: each code, then the order-independent pair."""
+    pair = "|".join(sorted((first_code, last_code)))
+    return (first_code, pair) if first_code == last_code else (first_code, last_code, pair)
+
+
+class PatientMatcher:
+    """DOB -> Soundex key -> records. Not thread-safe; ``PatientIndex`` guards it.
+
+    A record is listed under the code of its first name, of its last name and
+    under the pair ("D000|J500"), which near-DOB lookups use.
+    """
+
+    def __init__(self):
+        self._blocks: Dict[str, Dict[str, List[dict]]] = {}
+
+    def add(self, record: dict):
+        dob = iso_dob(record.get("dob", ""))
+        first, last = name_tokens(record.get("name", ""))
+        if not dob or not first:
+            return
+        block = self._blocks.get(dob)
+        if block is None:
+            block = self._blocks[dob] = {}
+        for key in _keys(soundex(first), soundex(last)):
+            bucket = block.get(key)
+            if bucket is None:
+                block[key] = [record]
+            else:
+                bucket.append(record)
+
+    def match(self, name: str, dob: str, email: str = "", phone: str = "", limit: int = 3,
+              threshold: float = PATIENT_MATCH_THRESHOLD) -> List[Match]:
+        """Registered patients scoring at least ``threshold`` for this name and DOB, best first."""
+        dob = iso_dob(dob)
+        tokens = name_tokens(name)
+        if not dob or not tokens[0]:
+            return []
+        *codes, pair = _keys(soundex(tokens[0]), soundex(tokens[1]))
+        candidates: Dict[int, Tuple[dict, bool]] = {}
+        block = self._blocks.get(dob, {})
+        for code in codes:
+            for record in block.get(code, ()):
+                candidates[id(record)] = (record, True)
+        # Two changed fields are too many: near a DOB both names must sound alike
+        for variant in dob_variants(dob):
+            block = self._blocks.get(variant)
+            for record in block.get(pair, ()) if block else ():
+                candidates.setdefault(id(record), (record, False))
+
+        email, phone = email.strip().lower(), phone.strip()
+        matches = []
+        for record, exact_dob in candidates.values():
+            score = name_similarity(tokens, name_tokens(record.get("name", "")))
+            if not exact_dob:
+                score *= NEAR_DOB_FACTOR
+            if (email and email == record.get("email", "").lower()) or (phone and phone == record.get("phone", "")):
+                score = min(1.0, score + CONTACT_BONUS)
+            if score >= threshold:
+                matches.append(Match(record, score, exact_dob))
+        matches.sort(key=lambda m: -m.score)
+        return matches[:limit]
@@ -0,0 +1,251 @@
+"""In-process timers and counters for the conversation hot path.
+
+``METRICS`` is the process-wide registry. Timers keep a call count, a total
+and a sliding window of the latest samples, from which p50/p95/p99 are read;
+counters are plain running totals (rows read/written, bytes of I/O,
+notifications sent). Every series is a metric name plus labels, e.g.
+``agent_node_seconds{node="book"}``.
+
+The registry is exposed as Prometheus text (``render_prometheus``, served
+by the API at ``GET /metrics``) and as JSON lines appended to a file by
+``MetricsFileWriter``. Each worker process has its own registry; the JSONL
+records carry the pid.
+
+``profile_turn`` wraps one conversation turn in cProfile or pyinstrument and
+writes the profile to a directory when the turn took at least ``min_ms``.
+"""
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]  # (name, sorted labels)
+
+
+def _key(name: str, labels: dict) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def quantile(ordered: List[float], q: float) -> float:
+    """Nearest-rank quantile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class _Timer:
+    __slots__ = ("calls", "total", "samples")
+
+    def __init__(self, window: int):
+        self.calls = 0
+        self.total = 0.0
+        self.samples: Deque[float] = deque(maxlen=window)
+
+
+class Metrics:
+    """Thread-safe registry of timers and counters; quantiles cover the last ``window`` samples."""
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._timers: Dict[Key, _Timer] = {}
+        self._counters: Dict[Key, float] = {}
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = self._timers[key] = _Timer(self.window)
+            timer.calls += 1
+            timer.total += seconds
+            timer.samples.append(seconds)
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Time the block, exceptions included."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def timed(self, name: str, **labels):
+        """Decorator form of ``timer``."""
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self) -> dict:
+        """Current values: ``{"timers": [...], "counters": [...]}`` with quantiles in seconds."""
+        with self._lock:
+            timers = [(k, t.calls, t.total, sorted(t.samples)) for k, t in self._timers.items()]
+            counters = list(self._counters.items())
+        out = {"timers": [], "counters": []}
+        for (name, labels), calls, total, ordered in sorted(timers):
+            entry = {"name": name, "labels": dict(labels), "calls": calls, "sum": total}
+            entry.update({f"p{int(q * 100)}": quantile(ordered, q) for q in QUANTILES})
+            out["timers"].append(entry)
+        for (name, labels), value in sorted(counters):
+            out["counters"].append({"name": name, "labels": dict(labels), "value": value})
+        return out
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition: timers as summaries, counters as counters."""
+        snap = self.snapshot()
+        lines: List[str] = []
+        typed = set()
+        for t in snap["timers"]:
+            if t["name"] not in typed:
+                typed.add(t["name"])
+                lines.append(f"# TYPE {t['name']} summary")
+            for q in QUANTILES:
+                lines.append(f"{t['name']}{_labels(t['labels'], quantile=q)} {t[f'p{int(q * 100)}']:.6g}")
+            lines.append(f"{t['name']}_sum{_labels(t['labels'])} {t['sum']:.6g}")
+            lines.append(f"{t['name']}_count{_labels(t['labels'])} {t['calls']}")
+        for c in snap["counters"]:
+            if c["name"] not in typed:
+                typed.add(c["name"])
+                lines.append(f"# TYPE {c['name']} counter")
+            lines.append(f"{c['name']}{_labels(c['labels'])} {c['value']:.6g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+
+def _labels(labels: dict, **extra) -> str:
+    items = list(labels.items()) + [(k, v) for k, v in extra.items()]
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+METRICS = Metrics()
+
+
+class MetricsFileWriter:
+    """Background thread appending a JSON snapshot of ``metrics`` to ``path`` every ``interval`` seconds."""
+
+    def __init__(self, metrics: Metrics, path: str, interval: float = 60.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def run_once(self):
+        record = {"ts": time.time(), "pid": os.getpid(), **self.metrics.snapshot()}
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record) + "\n")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.run_once()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("Writing metrics failed: %s", e)
+
+
+_profile_seq = itertools.count(1)
+
+
+@contextmanager
+def profile_turn(mode: str, directory: str, label: str = "turn", min_ms: float = 0.0) -> Iterator[None]:
+    """Profile the block with ``mode`` ("cprofile" or "pyinstrument"; anything else
+    is a no-op) and save it under ``directory`` if it took at least ``min_ms``."""
+    profiler = _start_profiler(mode)
+    if profiler is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        profiler.stop()
+        if elapsed_ms >= min_ms:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_profile_seq)}-{label}-{elapsed_ms:.0f}ms"
+                stem = os.path.join(directory, name)
+                logger.info("Saved turn profile %s", profiler.save(stem))
+            except Exception as e:
+                logger.error("Saving profile failed: %s", e)
+
+
+class _CProfiler:
+    def __init__(self):
+        import cProfile
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def save(self, stem: str) -> str:
+        self.profile.dump_stats(stem + ".prof")
+        return stem + ".prof"
+
+
+class _PyInstrument:
+    def __init__(self):
+        from pyinstrument import Profiler
+        self.profiler = Profiler()
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+
+    def save(self, stem: str) -> str:
+        with open(stem + ".html", "w", encoding="utf-8") as fh:
+            fh.write(self.profiler.output_html())
+        return stem + ".html"
+
+
+def _start_profiler(mode: str):
+    profilers = {"cprofile": _CProfiler, "pyinstrument": _PyInstrument}
+    if mode not in profilers:
+        return None
+    try:
+        return profilers[mode]()
+    except (ImportError, ValueError) as e:
+        # pyinstrument not installed, or another profiler already active on this thread
+        logger.warning("Turn profiling (%s) unavailable: %s", mode, e)
+        return None
@@ -0,0 +1,434 @@
+"""Background email/SMS delivery.
+
+Finalizing an appointment enqueues notification jobs in a persistent SQLite
+queue and returns immediately. ``NotificationDispatcher`` claims due jobs and
+delivers them on a worker pool, retrying failures with exponential backoff.
+Each job has a dedupe key (e.g. ``<appointment>:email:confirmation``) so a
+rerun or restart never sends the same notification twice.
+"""
+import logging
+import smtplib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import config
+from .metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+
+class NotificationQueue:
+    """Persistent job queue with per-job status, attempts and next retry time."""
+
+    def __init__(self, path: str, lease_seconds: float = 300, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    dedupe_key TEXT NOT NULL UNIQUE,
+                    channel TEXT NOT NULL,
+                    recipient TEXT NOT NULL,
+                    subject TEXT NOT NULL DEFAULT '',
+                    body TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT NOT NULL DEFAULT '',
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs(status, next_attempt_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def enqueue(self, channel: str, recipient: str, body: str, subject: str = "",
+                dedupe_key: Optional[str] = None, not_before: Optional[float] = None) -> bool:
+        """Queue one notification. Returns False if ``dedupe_key`` was already queued."""
+        now = self.clock()
+        key = dedupe_key or f"{channel}:{recipient}:{now}"
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO jobs (dedupe_key, channel, recipient, subject, body, "
+                "next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, channel, recipient, subject, body, now if not_before is None else not_before, now, now),
+            )
+        return cur.rowcount == 1
+
+    def enqueue_many(self, jobs: Iterable[dict]) -> int:
+        """Queue a batch in one transaction. Each job has ``enqueue``'s keyword
+        names and a ``dedupe_key``; returns how many were new."""
+        now = self.clock()
+        added = 0
+        with self._transaction() as conn:
+            for job in jobs:
+                not_before = job.get("not_before")
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO jobs (dedupe_key, channel, recipient, subject, body, "
+                    "next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job["dedupe_key"], job["channel"], job["recipient"], job.get("subject", ""), job["body"],
+                     now if not_before is None else not_before, now, now),
+                )
+                added += cur.rowcount
+        return added
+
+    def claim(self, limit: int, now: Optional[float] = None) -> List[dict]:
+        """Mark up to ``limit`` due jobs as sending and return them.
+
+        Jobs stuck in ``sending`` longer than the lease (a crashed worker) are
+        claimable again.
+        """
+        now = self.clock() if now is None else now
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE (status = ? AND next_attempt_at <= ?) "
+                "OR (status = ? AND updated_at <= ?) ORDER BY next_attempt_at LIMIT ?",
+                (PENDING, now, SENDING, now - self.lease_seconds, limit),
+            ).fetchall()
+            for r in rows:
+                conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (SENDING, now, r["id"]))
+        return [dict(r) for r in rows]
+
+    def mark_sent(self, job_id: int):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, last_error = '', updated_at = ? WHERE id = ?",
+                (SENT, self.clock(), job_id),
+            )
+
+    def mark_failed(self, job_id: int, error: str, retry_at: Optional[float]):
+        """Record a failed attempt; ``retry_at=None`` gives up on the job."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, last_error = ?, "
+                "next_attempt_at = COALESCE(?, next_attempt_at), updated_at = ? WHERE id = ?",
+                (PENDING if retry_at is not None else FAILED, error[:500], retry_at, self.clock(), job_id),
+            )
+
+    def status(self, dedupe_key: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE dedupe_key = ?", (dedupe_key,)).fetchone()
+        return dict(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {r[0]: r[1] for r in rows}
+
+
+class SMTPConnectionPool:
+    """Keep-alive SMTP connections shared between senders.
+
+    Idle connections are health-checked with NOOP before reuse, broken ones
+    are replaced, and each connection is retired after ``max_messages`` sends.
+    """
+
+    def __init__(self, host: str, port: int, user: str = "", password: str = "", size: int = 4,
+                 max_messages: int = 100, idle_check_seconds: float = 30.0, use_tls: bool = True,
+                 timeout: float = 30.0, factory: Callable[..., smtplib.SMTP] = smtplib.SMTP):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.max_messages = max_messages
+        self.idle_check_seconds = idle_check_seconds
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.factory = factory
+        self._idle: List[list] = []  # [smtp, messages_sent, last_used]
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connects = 0
+
+    def _connect(self) -> list:
+        server = self.factory(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            _quietly_close(server)
+            raise
+        self.connects += 1
+        return [server, 0, time.monotonic()]
+
+    def _checkout(self) -> list:
+        while True:
+            with self._lock:
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                return self._connect()
+            if time.monotonic() - entry[2] < self.idle_check_seconds:
+                return entry
+            try:
+                if entry[0].noop()[0] == 250:
+                    return entry
+            except (smtplib.SMTPException, OSError):
+                pass
+            _quietly_close(entry[0])
+
+    def _checkin(self, entry: list):
+        entry[1] += 1
+        entry[2] = time.monotonic()
+        if entry[1] >= self.max_messages:
+            _quietly_close(entry[0])
+            return
+        with self._lock:
+            self._idle.append(entry)
+
+    def sendmail(self, from_addr: str, to_addr: str, message: str):
+        """Send on a pooled connection, reconnecting once if the server dropped it."""
+        with self._slots:
+            for attempt in (1, 2):
+                entry = self._checkout()
+                try:
+                    entry[0].sendmail(from_addr, to_addr, message)
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    _quietly_close(entry[0])
+                    if attempt == 2:
+                        raise
+                    continue
+                except Exception:
+                    _quietly_close(entry[0])
+                    raise
+                self._checkin(entry)
+                return
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            try:
+                entry[0].quit()
+            except Exception:
+                _quietly_close(entry[0])
+
+
+def _quietly_close(server):
+    try:
+        server.close()
+    except Exception:
+        pass
+
+
+class EmailSender:
+    """SMTP sender over a ``SMTPConnectionPool``. ``send`` raises on failure so the dispatcher can retry."""
+
+    def __init__(self, user: str, password: str, host: str, port: int, pool: Optional[SMTPConnectionPool] = None,
+                 pool_size: int = 4, max_messages_per_connection: int = 100):
+        self.user = user
+        self.pool = pool or SMTPConnectionPool(host, port, user, password, size=pool_size,
+                                               max_messages=max_messages_per_connection)
+
+    def send(self, recipient: str, subject: str, body: str):
+        msg = MIMEMultipart()
+        msg["From"] = self.user
+        msg["To"] = recipient
+        msg["Subject"] = subject
+        msg.attach(MIMEText(body, "plain"))
+        self.pool.sendmail(self.user, recipient, msg.as_string())
+
+    def close(self):
+        self.pool.close()
+
+
+class SMSSender:
+    """Twilio sender sharing one client (and its pooled HTTP session) across sends.
+
+    ``client`` may be injected (tests, a fake Twilio client).
+    """
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str, client=None):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self._client = client
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from twilio.rest import Client
+                    self._client = Client(self.account_sid, self.auth_token)
+        return self._client
+
+    def send(self, recipient: str, subject: str, body: str):
+        self.client.messages.create(body=body, from_=self.from_number, to=recipient)
+
+    def close(self):
+        pass
+
+
+class Notifier:
+    """Email/SMS front end whose senders reuse connections across messages.
+
+    ``send_bulk`` fans a batch out over a thread pool no larger than the SMTP
+    pool, so a reminder run reuses a handful of logged-in connections.
+    """
+
+    def __init__(self, email: Optional[EmailSender] = None, sms: Optional[SMSSender] = None):
+        self.senders: Dict[str, object] = {}
+        if email is not None:
+            self.senders["email"] = email
+        if sms is not None:
+            self.senders["sms"] = sms
+
+    def send(self, channel: str, recipient: str, body: str, subject: str = ""):
+        sender = self.senders.get(channel)
+        if sender is None:
+            raise RuntimeError(f"no sender configured for {channel}")
+        sender.send(recipient, subject, body)
+
+    def send_email(self, recipient: str, subject: str, body: str):
+        self.send("email", recipient, body, subject)
+
+    def send_sms(self, recipient: str, body: str):
+        self.send("sms", recipient, body)
+
+    def send_bulk(self, messages: Iterable[Tuple[str, str, str, str]], workers: int = 4) -> List[Optional[Exception]]:
+        """Send ``(channel, recipient, subject, body)`` tuples; returns None or the error for each."""
+        def one(message):
+            channel, recipient, subject, body = message
+            try:
+                self.send(channel, recipient, body, subject)
+                return None
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notify-bulk") as pool:
+            return list(pool.map(one, messages))
+
+    def close(self):
+        for sender in self.senders.values():
+            sender.close()
+
+
+def default_notifier() -> Notifier:
+    """Notifier for whichever channels are configured in the environment."""
+    email = sms = None
+    if config.EMAIL_ENABLED and config.EMAIL_USER and config.EMAIL_PASS:
+        email = EmailSender(config.EMAIL_USER, config.EMAIL_PASS, config.EMAIL_SMTP_SERVER, config.EMAIL_SMTP_PORT)
+    if config.SMS_ENABLED and config.TWILIO_ACCOUNT_SID and config.TWILIO_AUTH_TOKEN:
+        sms = SMSSender(config.TWILIO_ACCOUNT_SID, config.TWILIO_AUTH_TOKEN, config.TWILIO_PHONE_NUMBER)
+    return Notifier(email, sms)
+
+
+class NotificationDispatcher:
+    """Polls the queue and delivers jobs concurrently with exponential-backoff retries."""
+
+    def __init__(self, queue: NotificationQueue, notifier: Notifier, workers: int = 4,
+                 max_attempts: int = 5, backoff_base: float = 30.0, backoff_cap: float = 3600.0,
+                 poll_interval: float = 1.0):
+        self.queue = queue
+        self.notifier = notifier
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.poll_interval = poll_interval
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def enqueue(self, channel: str, recipient: str, body: str, subject: str = "",
+                dedupe_key: Optional[str] = None) -> bool:
+        queued = self.queue.enqueue(channel, recipient, body, subject, dedupe_key)
+        self._wake.set()
+        return queued
+
+    def backoff(self, attempts: int) -> float:
+        """Delay before retry number ``attempts`` (1-based)."""
+        return min(self.backoff_cap, self.backoff_base * (2 ** (attempts - 1)))
+
+    def deliver(self, job: dict) -> bool:
+        try:
+            with METRICS.timer("agent_notification_send_seconds", channel=job["channel"]):
+                self.notifier.send(job["channel"], job["recipient"], job["body"], job["subject"])
+        except Exception as e:
+            METRICS.count("agent_notifications_total", channel=job["channel"], outcome="failed")
+            attempts = job["attempts"] + 1
+            retry_at = self.queue.clock() + self.backoff(attempts) if attempts < self.max_attempts else None
+            self.queue.mark_failed(job["id"], str(e), retry_at)
+            logger.warning("%s to %s failed (attempt %d): %s", job["channel"], job["recipient"], attempts, e)
+            return False
+        self.queue.mark_sent(job["id"])
+        METRICS.count("agent_notifications_total", channel=job["channel"], outcome="sent")
+        return True
+
+    def run_once(self, limit: int = 100) -> int:
+        """Deliver every job due now and wait for the results. Returns jobs attempted."""
+        jobs = self.queue.claim(limit)
+        if not jobs:
+            return 0
+        if self._pool is None:
+            for job in jobs:
+                self.deliver(job)
+        else:
+            list(self._pool.map(self.deliver, jobs))
+        return len(jobs)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="notify")
+        self._thread = threading.Thread(target=self._loop, name="notify-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                handled = self.run_once(self.workers * 4)
+            except Exception:
+                logger.exception("notification dispatch failed")
+                handled = 0
+            if not handled:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
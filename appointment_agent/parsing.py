@@ -0,0 +1,255 @@
+"""Labelled-field parser for patient and insurance messages.
+
+One precompiled label pattern finds every ``Label: value`` pair in a single
+``finditer`` scan; each value runs up to the next label or separator and is
+checked with a precompiled value pattern. Dates of birth are normalized to
+ISO (YYYY-MM-DD) from the formats patients type: ISO, US ``MM/DD/YYYY`` (and
+``DD/MM/YYYY`` when the day is over 12), and month names.
+
+The same parser handles chat turns and bulk intake emails, so results carry
+which fields are missing and how confident each value is rather than raising.
+"""
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+PATIENT_FIELDS = ("name", "dob", "email", "phone")
+INSURANCE_FIELDS = ("insurance_carrier", "member_id", "group_number")
+
+# Longer forms first inside each group so "insurance carrier" isn't read as "insurance".
+_LABELS = {
+    "name": r"(?:full\s+|patient\s+)?name",
+    "dob": r"d\.?o\.?b\.?|date\s+of\s+birth|birth\s*date",
+    "email": r"e-?mail(?:\s+address)?",
+    "phone": r"(?:phone|mobile|cell|tel)(?:\s+(?:number|no\.?))?",
+    "insurance_carrier": r"insurance(?:\s+(?:carrier|provider|company))?|carrier",
+    "member_id": r"member[\s_-]*(?:id|number|no\.?|\#)",
+    "group_number": r"group[\s_-]*(?:number|no\.?|id|\#)?",
+}
+_LABEL_PATTERN = (
+    # The lookahead on the labels' first letters lets most positions fail before the alternation.
+    r"\b(?=[bcdefgimnpt])(?<![@.])(?:" + "|".join(f"(?P<{key}>{pattern})" for key, pattern in _LABELS.items()) + r")"
+    r"(?![\w@])\s*(?:[:=]|-(?!\d)|(?=\s))\s*"
+)
+# Scanning a lowercased copy case-sensitively is about twice as fast as IGNORECASE;
+# the latter is only for text whose lowercase form has a different length.
+_LABEL_RE = re.compile(_LABEL_PATTERN)
+_LABEL_ANYCASE_RE = re.compile(_LABEL_PATTERN, re.IGNORECASE)
+_SEPARATOR_RE = re.compile(r"[,;|\n]")
+_SEPARATOR_AFTER_RE = re.compile(r"[:=]|-\s*$")
+_BARE_WORD_LABELS = {"insurance_carrier", "group_number"}
+
+_NAME_RE = re.compile(r"[A-Za-z][A-Za-z\s.'-]*")
+_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+_PHONE_RE = re.compile(r"\+?[\d\-().\s]{7,20}")
+_CODE_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9\-\s]*")
+_CARRIER_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9&.'\-\s]*")
+_NON_DIGIT_RE = re.compile(r"\D")
+
+_MONTH_NAME = r"(?i:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[A-Za-z]{0,6}"
+_DATE_RE = re.compile(
+    # Month names are spelled out so a search doesn't try a date at every word of the message.
+    rf"""
+    (?P<iy>\d{{4}})[-/.](?P<im>\d{{1,2}})[-/.](?P<id>\d{{1,2}})
+    | (?P<na>\d{{1,2}})[-/.](?P<nb>\d{{1,2}})[-/.](?P<ny>\d{{4}})
+    | (?P<dd>\d{{1,2}})(?:st|nd|rd|th)?\s+(?P<dm>{_MONTH_NAME})\.?,?\s+(?P<dy>\d{{4}})
+    | \b(?P<mm>{_MONTH_NAME})\.?\s+(?P<md>\d{{1,2}})(?:st|nd|rd|th)?,?\s+(?P<my>\d{{4}})
+    """,
+    re.VERBOSE,
+)
+_ISO_DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+_MONTHS = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1)}
+
+LABELLED = 1.0
+AMBIGUOUS = 0.8  # e.g. 03/04/1990 read month-first
+UNLABELLED = 0.6  # found without its label
+
+
+@dataclass
+class ParseResult:
+    """Parsed fields ('' when absent) plus what is missing and how sure each value is."""
+
+    fields: Dict[str, str]
+    missing: List[str] = field(default_factory=list)
+    confidence: Dict[str, float] = field(default_factory=dict)
+    issues: List[str] = field(default_factory=list)
+
+    def __getitem__(self, key: str) -> str:
+        return self.fields.get(key, "")
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+def normalize_dob(text: str, today: Optional[date] = None) -> Tuple[str, float]:
+    """First date in ``text`` as ISO plus its confidence, or ('', 0.0)."""
+    text = text or ""
+    m = _ISO_DATE_RE.fullmatch(text)  # the format the chat asks for
+    if m:
+        y, mo, d = int(m.group(1)), int(m.group(2)), int(m.group(3))
+        return _checked_date(y, mo, d, LABELLED, today)
+    m = _DATE_RE.search(text)
+    if not m:
+        return "", 0.0
+    confidence = LABELLED
+    if m.group("iy"):
+        y, mo, d = int(m.group("iy")), int(m.group("im")), int(m.group("id"))
+    elif m.group("ny"):
+        a, b, y = int(m.group("na")), int(m.group("nb")), int(m.group("ny"))
+        if a > 12:
+            d, mo = a, b
+        else:
+            mo, d = a, b
+            if b <= 12 and a != b:
+                confidence = AMBIGUOUS
+    else:
+        name = (m.group("dm") or m.group("mm"))[:3].lower()
+        if name not in _MONTHS:
+            return "", 0.0
+        mo = _MONTHS[name]
+        y = int(m.group("dy") or m.group("my"))
+        d = int(m.group("dd") or m.group("md"))
+    return _checked_date(y, mo, d, confidence, today)
+
+
+def _checked_date(y: int, mo: int, d: int, confidence: float, today: Optional[date]) -> Tuple[str, float]:
+    try:
+        value = date(y, mo, d)
+    except ValueError:
+        return "", 0.0
+    if y < 1900 or value > (today or _today()):
+        return "", 0.0
+    return value.isoformat(), confidence
+
+
+_today_cache = [0.0, date.min]  # [next local midnight as a timestamp, today]
+
+
+def _today() -> date:
+    """``date.today()``, recomputed only once the day has changed (it costs more than a DOB check)."""
+    if time.time() >= _today_cache[0]:
+        today = date.today()
+        _today_cache[:] = [datetime.combine(today + timedelta(days=1), datetime.min.time()).timestamp(), today]
+    return _today_cache[1]
+
+
+def normalize_name(text: str) -> str:
+    """Leading run of name characters with whitespace collapsed, or ''."""
+    return " ".join(_clean(_NAME_RE, (text or "").strip()).split())
+
+
+def normalize_email(text: str) -> str:
+    return _clean(_EMAIL_RE, (text or "").strip())
+
+
+def normalize_phone(text: str) -> str:
+    """Digits with an optional leading '+', or '' unless there are 10-15 of them."""
+    phone = _clean(_PHONE_RE, (text or "").strip())
+    digits = _NON_DIGIT_RE.sub("", phone)
+    if phone and 10 <= len(digits) <= 15:
+        return ("+" if phone.startswith("+") else "") + digits
+    return ""
+
+
+def _labelled_values(text: str) -> Dict[str, str]:
+    """Single scan: ``{field: raw value}`` for the first occurrence of each label."""
+    folded = text.lower()
+    matches = _LABEL_RE.finditer(folded) if len(folded) == len(text) else _LABEL_ANYCASE_RE.finditer(text)
+    # Words that also occur inside values ("Blue Cross Group") only count as
+    # labels with ':' / '=' / '-' after them or at the start of a segment.
+    bounds = [(m.lastgroup, m.start(), m.end()) for m in matches
+              if m.lastgroup not in _BARE_WORD_LABELS or _SEPARATOR_AFTER_RE.search(m.group(0))
+              or _at_segment_start(text, m.start())]
+    bounds.append((None, len(text), len(text)))
+    values: Dict[str, str] = {}
+    for (label, _, start), (_, end, _) in zip(bounds, bounds[1:]):
+        if label in values:
+            continue
+        # Dates may contain a comma ("Feb 3, 1977"); normalize_dob finds the date itself.
+        if label != "dob":
+            sep = _SEPARATOR_RE.search(text, start, end)
+            if sep:
+                end = sep.start()
+        raw = text[start:end].strip(" \t.,;:-")
+        if raw:
+            values[label] = raw
+    return values
+
+
+def _at_segment_start(text: str, pos: int) -> bool:
+    pos -= 1
+    while pos >= 0 and text[pos] in " \t":
+        pos -= 1
+    return pos < 0 or text[pos] in ",;|\n"
+
+
+def _clean(pattern: "re.Pattern", raw: str) -> str:
+    m = pattern.match(raw)
+    return m.group(0).strip() if m else ""
+
+
+def _finish(fields: Dict[str, str], confidence: Dict[str, float], issues: List[str],
+            required: Sequence[str]) -> ParseResult:
+    return ParseResult(fields, [f for f in required if not fields.get(f)], confidence, issues)
+
+
+def parse_patient(text: str, required: Sequence[str] = ("name", "dob")) -> ParseResult:
+    """Name, DOB (ISO), email and phone from a patient message."""
+    text = text or ""
+    raw = _labelled_values(text)
+    fields = {f: "" for f in PATIENT_FIELDS}
+    confidence: Dict[str, float] = {}
+    issues: List[str] = []
+
+    name = normalize_name(raw.get("name", ""))
+    if name:
+        fields["name"], confidence["name"] = name, LABELLED
+
+    if "dob" in raw:
+        dob, conf = normalize_dob(raw["dob"])
+        if not dob:
+            issues.append(f"unrecognized date of birth {raw['dob']!r}")
+    else:
+        dob, conf = normalize_dob(text)
+        conf *= UNLABELLED
+    if dob:
+        fields["dob"], confidence["dob"] = dob, conf
+
+    email = normalize_email(raw.get("email", ""))
+    if email:
+        fields["email"], confidence["email"] = email, LABELLED
+    elif "email" in raw and raw["email"]:
+        issues.append(f"invalid email {raw['email']!r}")
+    elif "@" in text:
+        m = _EMAIL_RE.search(text)
+        if m:
+            fields["email"], confidence["email"] = m.group(0), UNLABELLED
+
+    phone = normalize_phone(raw.get("phone", ""))
+    if phone:
+        fields["phone"], confidence["phone"] = phone, LABELLED
+    elif raw.get("phone"):
+        issues.append(f"invalid phone {raw['phone']!r}")
+
+    return _finish(fields, confidence, issues, required)
+
+
+def parse_insurance(text: str, required: Sequence[str] = INSURANCE_FIELDS) -> ParseResult:
+    """Carrier, member ID and group number from an insurance message."""
+    raw = _labelled_values(text or "")
+    fields = {f: "" for f in INSURANCE_FIELDS}
+    confidence: Dict[str, float] = {}
+    issues: List[str] = []
+    for f in INSURANCE_FIELDS:
+        value = raw.get(f)
+        if value:
+            fields[f] = _clean(_CARRIER_RE if f == "insurance_carrier" else _CODE_RE, value)
+            if fields[f]:
+                confidence[f] = LABELLED
+            else:
+                issues.append(f"unreadable {f.replace('_', ' ')} {value!r}")
+    return _finish(fields, confidence, issues, required)
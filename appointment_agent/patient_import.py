@@ -0,0 +1,282 @@
+"""Bulk import of external patient exports into the registry.
+
+    python -m appointment_agent.patient_import export1.csv export2.csv --report conflicts.csv --workers 4
+
+Each input CSV is read in chunks of ``--chunk-rows``, so inputs larger than
+memory stream through. Columns are matched by name (``name`` or
+``first_name``/``last_name``, ``dob``/``date_of_birth``/``birthdate``,
+``email``, ``phone``/``mobile``, any case). Chunks are normalized on a
+process pool with the chat parser's rules: name whitespace collapsed, DOB
+to ISO from ISO, US or month-name dates, email checked, phone to digits
+with an optional ``+``.
+
+Deduplication is a hash join on the normalized (name, dob) key. The build
+side is the key set of the current registry plus every patient accepted so
+far in this import; input rows probe it. A row whose key is taken is a
+duplicate when its email and phone agree with the kept row (or are blank),
+otherwise a conflict. The first row wins either way, as in ``PatientIndex``.
+Conflicts and invalid rows are streamed to the ``--report`` CSV.
+
+The registry is copied to a temporary file, new patients are appended to
+it chunk by chunk, and it replaces ``patients.csv`` in one rename. Rows
+another process appended meanwhile are carried over first. Only the keys
+and contacts are held in memory, not the input rows.
+"""
+import argparse
+import csv
+import os
+import shutil
+import time as _time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from .config import PATIENT_FILE
+from .ledger import ends_with_newline
+from .parsing import normalize_dob, normalize_email, normalize_name, normalize_phone
+from .patient_index import PATIENT_COLUMNS, patient_key
+
+COLUMN_ALIASES = {
+    "name": ("name", "full_name", "patient_name", "patient"),
+    "first_name": ("first_name", "firstname", "given_name", "first"),
+    "last_name": ("last_name", "lastname", "surname", "family_name", "last"),
+    "dob": ("dob", "date_of_birth", "birthdate", "birth_date", "birthday"),
+    "email": ("email", "e_mail", "email_address"),
+    "phone": ("phone", "phone_number", "mobile", "cell", "telephone", "tel"),
+}
+
+Contact = Tuple[str, str]  # (email, phone)
+CONTACT_CONFLICT = "contact differs from kept row"
+
+
+class Conflict(NamedTuple):
+    source: str
+    row: int
+    name: str
+    dob: str
+    reason: str
+    kept: str  # "email / phone" of the row that was kept
+    incoming: str
+
+
+class ImportResult(NamedTuple):
+    rows: int
+    added: int
+    duplicates: int
+    conflicts: int
+    invalid: int
+    examples: List[Conflict]  # the first few conflicting or invalid rows
+
+
+def _canonical(column: str) -> str:
+    key = "_".join(str(column).strip().lower().replace("-", " ").split())
+    for field, aliases in COLUMN_ALIASES.items():
+        if key in aliases:
+            return field
+    return key
+
+
+def normalize_chunk(chunk: pd.DataFrame, today: Optional[date] = None) -> pd.DataFrame:
+    """Normalized ``name``/``dob``/``email``/``phone`` plus ``reason`` ('' for a usable row)."""
+    chunk = chunk.rename(columns=_canonical)
+    blank = pd.Series("", index=chunk.index)
+    if "name" in chunk:
+        raw_name = chunk["name"]
+    else:
+        raw_name = chunk.get("first_name", blank).str.cat(chunk.get("last_name", blank), sep=" ")
+    raw_dob = chunk.get("dob", blank).str.strip()
+
+    # Most exports already use ISO dates: parse those vectorized, the rest one by one.
+    today = today or date.today()
+    iso = pd.to_datetime(raw_dob, format="%Y-%m-%d", errors="coerce")
+    iso_ok = iso.notna() & (iso.dt.year >= 1900) & (iso <= pd.Timestamp(today))
+    dob = raw_dob.where(iso_ok, "")
+    others = ~iso_ok & (raw_dob != "")
+    dob[others] = [normalize_dob(v, today)[0] for v in raw_dob[others].tolist()]
+
+    # Plain lists: iterating an Arrow-backed column element by element is several times slower.
+    out = pd.DataFrame({
+        "name": [normalize_name(v) for v in raw_name.tolist()],
+        "dob": dob,
+        "email": [normalize_email(v) for v in chunk.get("email", blank).tolist()],
+        "phone": [normalize_phone(v) for v in chunk.get("phone", blank).tolist()],
+    }, index=chunk.index)
+    out["reason"] = ""
+    out.loc[out["dob"] == "", "reason"] = "missing or unrecognized dob"
+    out.loc[out["name"] == "", "reason"] = "missing name"
+    return out
+
+
+def read_chunks(path: str, chunk_rows: int) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """``(first data row number, chunk)`` pairs; row numbers count the header as row 1."""
+    first = 2
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+        yield first, chunk
+        first += len(chunk)
+
+
+def _ordered_map(pool: Optional[Executor], fn, items: Iterable, window: int) -> Iterator:
+    """``map`` with at most ``window`` items in flight, so a long input isn't read ahead into memory."""
+    if pool is None:
+        yield from map(fn, items)
+        return
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _normalize_job(job: Tuple[str, int, pd.DataFrame]) -> Tuple[str, int, pd.DataFrame]:
+    source, first, chunk = job
+    return source, first, normalize_chunk(chunk)
+
+
+def load_registry(path: str, chunk_rows: int) -> Dict[Tuple[str, str], Contact]:
+    """Key -> contact for every patient in the registry; the first row of a key wins.
+
+    Registry rows go through ``normalize_chunk`` like the input, so rows an
+    older version wrote with US dates or formatted phones still match.
+    """
+    keys: Dict[Tuple[str, str], Contact] = {}
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return keys
+    for _, chunk in read_chunks(path, chunk_rows):
+        norm = normalize_chunk(chunk)
+        values = (norm[c].tolist() for c in ("name", "dob", "email", "phone", "reason"))
+        for name, dob, email, phone, reason in zip(*values):
+            if not reason:
+                keys.setdefault(patient_key(name, dob), (email, phone))
+    return keys
+
+
+def _differs(kept: Contact, incoming: Contact) -> bool:
+    """A blank incoming field agrees with anything; emails compare case-insensitively."""
+    email, phone = incoming
+    return bool(email and email.lower() != kept[0].lower()) or bool(phone and phone != kept[1])
+
+
+def import_patients(inputs: List[str], registry: str = PATIENT_FILE, workers: int = 1, chunk_rows: int = 100_000,
+                    report: Optional[str] = None, dry_run: bool = False) -> ImportResult:
+    """Merge ``inputs`` into ``registry``, streaming conflicting and invalid rows to ``report``."""
+    tmp = registry + ".import.tmp"
+    out = None
+    size = 0
+    if not dry_run:
+        # The keys are read from the copy, so they match what will be written back
+        if os.path.exists(registry):
+            shutil.copyfile(registry, tmp)
+            size = os.path.getsize(tmp)
+        out = open(tmp, "a", newline="", encoding="utf-8")
+    keys = load_registry(tmp if size else registry, chunk_rows)
+    columns = _header(tmp if size else registry) or PATIENT_COLUMNS
+    writer = csv.writer(out, lineterminator="\n") if out else None
+    if writer is not None:
+        if not size:
+            writer.writerow(columns)
+        elif not ends_with_newline(tmp):
+            out.write("\n")
+    report_fh = open(report, "w", newline="", encoding="utf-8") if report else None
+    report_writer = csv.writer(report_fh) if report_fh else None
+    if report_writer is not None:
+        report_writer.writerow(Conflict._fields)
+
+    rows = added = duplicates = conflicts = invalid = 0
+    examples: List[Conflict] = []
+    jobs = ((path, first, chunk) for path in inputs for first, chunk in read_chunks(path, chunk_rows))
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for source, first, norm in _ordered_map(pool, _normalize_job, jobs, window=workers * 2):
+            rows += len(norm)
+            new_rows, flagged = [], []
+            values = (norm[c].tolist() for c in ("name", "dob", "email", "phone", "reason"))
+            for i, (name, dob, email, phone, reason) in enumerate(zip(*values)):
+                if reason:
+                    invalid += 1
+                    flagged.append(Conflict(source, first + i, name, dob, reason, "", f"{email} / {phone}"))
+                    continue
+                key = patient_key(name, dob)
+                kept = keys.get(key)
+                if kept is None:
+                    keys[key] = (email, phone)
+                    row = {"name": name, "dob": dob, "email": email, "phone": phone}
+                    new_rows.append([row.get(c, "") for c in columns])
+                elif _differs(kept, (email, phone)):
+                    conflicts += 1
+                    flagged.append(Conflict(source, first + i, name, dob, CONTACT_CONFLICT,
+                                            " / ".join(kept), f"{email} / {phone}"))
+                else:
+                    duplicates += 1
+            if writer is not None:
+                writer.writerows(new_rows)
+            if report_writer is not None:
+                report_writer.writerows(flagged)
+            examples.extend(flagged[:20 - len(examples)])
+            added += len(new_rows)
+    except BaseException:
+        if out is not None:
+            out.close()
+            os.remove(tmp)
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if report_fh is not None:
+            report_fh.close()
+
+    if out is not None:
+        out.flush()
+        _carry_over_tail(registry, size, out)
+        os.fsync(out.fileno())
+        out.close()
+        os.replace(tmp, registry)
+    return ImportResult(rows, added, duplicates, conflicts, invalid, examples)
+
+
+def _header(path: str) -> List[str]:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return []
+    with open(path, newline="", encoding="utf-8") as fh:
+        return [h.strip() for h in next(csv.reader(fh), [])]
+
+
+def _carry_over_tail(registry: str, size: int, out):
+    """Append rows that were added to the registry after it was copied."""
+    if not os.path.exists(registry) or os.path.getsize(registry) <= size:
+        return
+    with open(registry, "r", newline="", encoding="utf-8") as fh:
+        fh.seek(size)
+        tail = fh.read()
+    out.write(tail if tail.endswith("\n") else tail + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge patient exports into the registry.")
+    parser.add_argument("inputs", nargs="+")
+    parser.add_argument("--patients", default=PATIENT_FILE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    parser.add_argument("--report", help="write conflicting and invalid rows to this CSV")
+    parser.add_argument("--dry-run", action="store_true", help="count only; leave the registry alone")
+    args = parser.parse_args(argv)
+
+    t0 = _time.perf_counter()
+    result = import_patients(args.inputs, args.patients, args.workers, args.chunk_rows, args.report, args.dry_run)
+    elapsed = _time.perf_counter() - t0
+    verb = "Would add" if args.dry_run else "Added"
+    print(f"{verb} {result.added} of {result.rows} rows in {elapsed:.1f} s "
+          f"({result.rows / max(elapsed, 1e-9):,.0f} rows/s); {result.duplicates} duplicates, "
+          f"{result.conflicts} conflicts, {result.invalid} invalid")
+    for c in result.examples:
+        print(f"  {c.source}:{c.row}: {c.name} ({c.dob}) - {c.reason}")
+    if args.report:
+        print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""In-memory patient registry index.
+
+``PatientIndex`` loads ``patients.csv`` once and keys every row on the
+normalized (name, dob) pair, so a returning-patient check and the contact
+lookup are a single dict hit. ``refresh()`` is a ``stat`` call when nothing
+changed; when the file only grew it parses just the new tail. ``match()``
+finds near misses through a ``matching.PatientMatcher``, built on first use
+(or by ``build_matcher()`` ahead of time) without holding up lookups and
+writes, then kept up to date with the same tail reads.
+"""
+import csv
+import io
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .matching import Match, PatientMatcher
+from .metrics import METRICS
+
+PATIENT_COLUMNS = ["name", "dob", "email", "phone"]
+
+
+def patient_key(name: str, dob: str) -> Tuple[str, str]:
+    return (str(name).strip().lower(), str(dob).strip())
+
+
+def _clean(value) -> str:
+    text = "" if value is None else str(value).strip()
+    return "" if text.lower() in ("nan", "none") else text
+
+
+class PatientIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_key: Dict[Tuple[str, str], dict] = {}
+        self._matcher: Optional[PatientMatcher] = None
+        self._pending: Optional[List[dict]] = None  # rows inserted while the matcher is being built
+        self._build_lock = threading.Lock()
+        self._fieldnames = list(PATIENT_COLUMNS)
+        self._offset = 0
+        self._stat: Optional[Tuple[int, int, int]] = None
+        self.refresh()
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._by_key
+
+    def get(self, name: str, dob: str) -> Optional[dict]:
+        """Return the stored patient for (name, dob), or None."""
+        self.refresh()
+        return self._by_key.get(patient_key(name, dob))
+
+    def match(self, name: str, dob: str, email: str = "", phone: str = "", limit: int = 3, **kwargs) -> List[Match]:
+        """Registered patients similar to (name, dob), best first; see ``PatientMatcher.match``."""
+        self.refresh()
+        while True:
+            self.build_matcher()
+            with self._lock:
+                if self._matcher is not None:  # None again only if the file was replaced meanwhile
+                    return self._matcher.match(name, dob, email, phone, limit, **kwargs)
+
+    def build_matcher(self):
+        """Build the fuzzy-match index if there is none; ``get`` and ``add`` aren't blocked meanwhile."""
+        with self._build_lock:
+            with self._lock:
+                if self._matcher is not None:
+                    return
+                records = list(self._by_key.values())
+                self._pending = []
+            matcher = PatientMatcher()
+            for record in records:
+                matcher.add(record)
+            with self._lock:
+                if self._pending is not None:
+                    for record in self._pending:
+                        matcher.add(record)
+                    self._matcher = matcher
+                self._pending = None
+
+    def refresh(self):
+        """Pick up changes to the CSV: nothing if unchanged, the new tail if it grew."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            with self._lock:
+                self._by_key.clear()
+                self._matcher = self._pending = None
+                self._offset, self._stat = 0, None
+            return
+        stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stat == self._stat:
+            return
+        with self._lock:
+            if stat == self._stat:
+                return
+            replaced = self._stat is None or stat[0] != self._stat[0] or st.st_size < self._offset
+            if replaced:
+                self._by_key.clear()
+                self._matcher = self._pending = None
+                self._offset = 0
+            self._read_from(self._offset)
+            self._stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _read_from(self, offset: int):
+        with open(self.path, "rb") as fh:
+            fh.seek(offset)
+            data = fh.read()
+        METRICS.count("agent_io_bytes_total", len(data), direction="read", file=os.path.basename(self.path))
+        # Leave a half-written last line for the next refresh.
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return
+        text = data[:end].decode("utf-8")
+        reader = csv.reader(io.StringIO(text))
+        if offset == 0:
+            header = next(reader, None)
+            if header:
+                self._fieldnames = [h.strip() for h in header]
+        for row in reader:
+            if row:
+                self._insert(dict(zip(self._fieldnames, row)))
+        self._offset = offset + end
+
+    def _insert(self, row: dict):
+        record = {col: _clean(row.get(col)) for col in self._fieldnames}
+        key = patient_key(record.get("name", ""), record.get("dob", ""))
+        if key[0]:
+            # First row wins, as the DataFrame lookups did.
+            if self._by_key.setdefault(key, record) is record:
+                if self._matcher is not None:
+                    self._matcher.add(record)
+                elif self._pending is not None:
+                    self._pending.append(record)
+
+    def add(self, patient: dict):
+        """Record a patient the caller just appended to the CSV.
+
+        The row is visible immediately; the next ``refresh()`` still parses the
+        tail so rows appended by other processes aren't skipped.
+        """
+        with self._lock:
+            self._insert(patient)
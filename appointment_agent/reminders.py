@@ -0,0 +1,242 @@
+"""Reminder scheduler for booked appointments.
+
+Every appointment in the final ledger gets reminders 24h, 3h and 30min before
+it starts. Pending reminders sit in a min-heap keyed by due time, so a tick
+pops only what is due and adding an appointment is O(log n). Due reminders are
+handed to the notification queue in one batch; their dedupe keys
+(``<appointment ID>:<date>T<time>:<channel>:reminder-24h``) make a restart,
+which rebuilds the heap from the ledger, safe to run over already-sent
+reminders.
+
+A cancelled or rescheduled appointment's later ledger line supersedes its
+earlier ones: the scheduler remembers the latest state of every appointment
+that has more than one line, and a popped reminder whose appointment has
+since moved or been cancelled is dropped.
+
+Runs outside Streamlit as a daemon:
+
+    python -m appointment_agent.reminders --ledger final.jsonl --queue notifications.db
+"""
+import argparse
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from . import config
+from .ledger import BOOKED, CANCELLED, AppointmentLedger, appointment_key
+from .notifications import NotificationDispatcher, NotificationQueue, default_notifier
+from .snapshot import Snapshot
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+REMINDER_OFFSETS = [
+    ("24h", timedelta(hours=24)),
+    ("3h", timedelta(hours=3)),
+    ("30min", timedelta(minutes=30)),
+]
+
+
+def appointment_start(record: dict) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(f"{record['date']}T{record['time']}")
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def reminder_times(start: datetime) -> List[Tuple[str, datetime]]:
+    """``(label, due)`` for each reminder of an appointment starting at ``start``."""
+    return [(label, start - offset) for label, offset in REMINDER_OFFSETS]
+
+
+def reminder_jobs(record: dict, label: str) -> List[dict]:
+    """Notification jobs (email and/or SMS) for one reminder of one appointment."""
+    # A rescheduled appointment keeps its ID, so the start is part of the key;
+    # legacy records without an ID fall back to name, DOB, slot and doctor.
+    key = f"{record['appointment_id']}:{record['date']}T{record['time']}" if record.get("appointment_id") \
+        else appointment_key(record)
+    body = (
+        f"Reminder ({label}): hi {record.get('name', '')}, your appointment with {record.get('doctor', '')} "
+        f"at {record.get('location', '')} is on {record['date']} at {record['time']}."
+    )
+    jobs = []
+    if record.get("email"):
+        jobs.append({"channel": "email", "recipient": record["email"], "body": body,
+                     "subject": f"Appointment Reminder - {record['date']} at {record['time']}",
+                     "dedupe_key": f"{key}:email:reminder-{label}"})
+    phone = record.get("phone") or config.PATIENT_NOTIFY_PHONE
+    if phone:
+        jobs.append({"channel": "sms", "recipient": phone, "body": body,
+                     "dedupe_key": f"{key}:sms:reminder-{label}"})
+    return jobs
+
+
+class ReminderScheduler:
+    """Min-heap of pending reminders fed from the appointment ledger."""
+
+    def __init__(self, ledger: AppointmentLedger, queue: NotificationQueue,
+                 clock: Callable[[], float] = time.time, grace_seconds: float = 15 * 60):
+        self.ledger = ledger
+        self.queue = queue
+        self.clock = clock
+        # After downtime, reminders overdue by less than this still go out.
+        self.grace_seconds = grace_seconds
+        self._heap: List[Tuple[float, int, str, Union[dict, int]]] = []
+        self._seq = itertools.count()
+        self._offset = 0
+        self._snapshot: Optional[Snapshot] = None
+        # appointment ID -> appointment_key of its latest line ('' once cancelled),
+        # for IDs whose status has changed since booking
+        self._current: Dict[str, str] = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def _pending(self, record: dict, now: float) -> Iterable[Tuple[float, int, str, dict]]:
+        start = appointment_start(record)
+        if start is None or start.timestamp() <= now:
+            return
+        for label, due in reminder_times(start):
+            due_ts = due.timestamp()
+            if due_ts >= now - self.grace_seconds:
+                yield (due_ts, next(self._seq), label, record)
+
+    def _note(self, record: dict) -> bool:
+        """Track a changed appointment's latest state; False for a cancellation (nothing to remind)."""
+        status = record.get("status") or BOOKED
+        if status != BOOKED and record.get("appointment_id"):
+            self._current[record["appointment_id"]] = "" if status == CANCELLED else appointment_key(record)
+        return status != CANCELLED
+
+    def _superseded(self, record: dict) -> bool:
+        current = self._current.get(record.get("appointment_id") or "")
+        return current is not None and current != appointment_key(record)
+
+    def schedule(self, record: dict) -> int:
+        """Add one appointment's upcoming reminders; O(log n) each. Returns how many."""
+        if not self._note(record):
+            return 0
+        added = 0
+        for entry in self._pending(record, self.clock()):
+            heapq.heappush(self._heap, entry)
+            added += 1
+        return added
+
+    def rebuild(self) -> int:
+        """Reload every upcoming reminder from the ledger (startup / restart)."""
+        now = self.clock()
+        self._snapshot, records, self._offset = self.ledger.load()
+        self._current = {}
+        if self._snapshot is not None and "status" in self._snapshot.schema:
+            snap = self._snapshot
+            changed = np.flatnonzero(~np.isin(snap.columns["status"], [snap.code("status", ""), snap.code("status", BOOKED)]))
+            for record in snap.records(changed):
+                self._note(record)
+        self._heap = [entry for record in records if self._note(record) for entry in self._pending(record, now)]
+        if self._snapshot is not None and len(self._snapshot):
+            self._heap.extend(self._pending_rows(self._snapshot, now))
+        heapq.heapify(self._heap)
+        return len(self._heap)
+
+    def _pending_rows(self, snap: Snapshot, now: float) -> Iterable[Tuple[float, int, str, int]]:
+        """Reminders for snapshot rows, computed on the date/time columns.
+
+        Entries carry the row number; the record is only decoded when the
+        reminder fires.
+        """
+        days, minutes = snap.columns["date"], snap.columns["time"]
+        rows = np.flatnonzero((days >= 0) & (minutes >= 0))
+        starts, inverse = np.unique(days[rows].astype(np.int64) * 1440 + minutes[rows], return_inverse=True)
+        # One wall-clock conversion per distinct start time, as reminder_times does it.
+        table = np.array([
+            [(start - offset).timestamp() for _, offset in REMINDER_OFFSETS] + [start.timestamp()]
+            for start in (_EPOCH + timedelta(minutes=int(m)) for m in starts)
+        ]).reshape(-1, len(REMINDER_OFFSETS) + 1)
+        upcoming = table[inverse, -1] > now
+        rows, inverse = rows[upcoming], inverse[upcoming]
+        for i, (label, _) in enumerate(REMINDER_OFFSETS):
+            due = table[inverse, i]
+            keep = due >= now - self.grace_seconds
+            for row, due_ts in zip(rows[keep].tolist(), due[keep].tolist()):
+                yield (due_ts, next(self._seq), label, row)
+
+    def poll_ledger(self) -> int:
+        """Schedule appointments appended to the ledger since the last read."""
+        records, offset = self.ledger.read_from(self._offset)
+        if offset < self._offset:  # ledger was replaced
+            return self.rebuild()
+        self._offset = offset
+        return sum(self.schedule(record) for record in records)
+
+    def run_due(self, now: Optional[float] = None) -> int:
+        """Queue every reminder due by ``now`` in one batch. Returns jobs newly queued."""
+        now = self.clock() if now is None else now
+        jobs = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, label, record = heapq.heappop(self._heap)
+            if isinstance(record, int):
+                record = self._snapshot.records([record])[0]
+            if record.get("status") == CANCELLED or self._superseded(record):
+                continue
+            jobs.extend(reminder_jobs(record, label))
+        return self.queue.enqueue_many(jobs) if jobs else 0
+
+    def run_forever(self, poll_interval: float = 5.0, sleep: Callable[[float], None] = time.sleep,
+                    stop: Callable[[], bool] = lambda: False):
+        self.rebuild()
+        while not stop():
+            try:
+                self.poll_ledger()
+                queued = self.run_due()
+                if queued:
+                    logger.info("queued %d reminders", queued)
+            except Exception:
+                logger.exception("reminder tick failed")
+            next_due = self.next_due()
+            wait = poll_interval if next_due is None else min(poll_interval, next_due - self.clock())
+            sleep(max(0.0, wait))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send 24h / 3h / 30min appointment reminders.")
+    parser.add_argument("--ledger", default=config.FINAL_LEDGER)
+    parser.add_argument("--queue", default=config.NOTIFY_DB)
+    parser.add_argument("--poll", type=float, default=5.0, help="seconds between ledger checks")
+    parser.add_argument("--once", action="store_true", help="queue and deliver what is due now, then exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    queue = NotificationQueue(args.queue)
+    scheduler = ReminderScheduler(AppointmentLedger(args.ledger), queue)
+    dispatcher = NotificationDispatcher(queue, default_notifier())
+    if args.once:
+        scheduler.rebuild()
+        queued, delivered = scheduler.run_due(), 0
+        while True:
+            attempted = dispatcher.run_once()
+            if not attempted:
+                break
+            delivered += attempted
+        print(f"Queued {queued} reminders, attempted {delivered} deliveries; "
+              f"{len(scheduler)} reminders pending")
+        return
+    dispatcher.start()
+    try:
+        scheduler.run_forever(args.poll)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dispatcher.stop(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
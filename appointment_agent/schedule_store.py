@@ -0,0 +1,662 @@
+"""Schedule storage backends.
+
+The app talks to a ``ScheduleStore``; ``SQLiteScheduleStore`` is the default
+backend. ``schedule.xlsx`` is only used to import an existing schedule and to
+export one for staff.
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from enum import Enum
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import pandas as pd
+
+from .metrics import METRICS
+from .slot_table import SlotTable
+
+SCHEDULE_COLUMNS = ["date", "time", "patient", "duration", "patient_type", "doctor", "location"]
+_SELECT_COLUMNS = ", ".join(SCHEDULE_COLUMNS)
+_EXPORT_COLUMNS = f"{_SELECT_COLUMNS}, appointment_id"
+# SlotTable.from_columns order: days since 1970-01-01 and minutes since midnight, computed in SQL.
+_TYPED_COLUMNS = (
+    "CAST(julianday(date) - 2440587.5 AS INTEGER), "
+    "CAST(substr(time, 1, 2) AS INTEGER) * 60 + CAST(substr(time, 4, 2) AS INTEGER), "
+    "duration, patient_type, patient, doctor, location"
+)
+
+_TIME_RE = re.compile(r"(\d{1,2}):(\d{2})")
+
+
+def normalize_time(value) -> str:
+    """Normalize a time cell ('9:30', '09:30:00', ...) to 'HH:MM'."""
+    m = _TIME_RE.search(str(value))
+    if not m:
+        return ""
+    return f"{int(m.group(1)):02d}:{m.group(2)}"
+
+
+def normalize_patient(value) -> str:
+    """Empty cells come back from Excel as NaN/None; store them as ''."""
+    if value is None:
+        return ""
+    text = str(value).strip()
+    return "" if text.lower() in ("nan", "none") else text
+
+
+def day_slot_rows(day_str: str, start: time, end: time, step_min: int,
+                  doctor: str = "", location: str = "") -> List[tuple]:
+    """Empty slot grid for one day, ``start`` to ``end`` inclusive."""
+    rows = []
+    day = datetime.strptime(day_str, "%Y-%m-%d").date()
+    cur = datetime.combine(day, start)
+    end_dt = datetime.combine(day, end)
+    while cur <= end_dt:
+        rows.append((day_str, cur.strftime("%H:%M"), "", 30, "", doctor, location))  # Default 30min slots
+        cur += timedelta(minutes=step_min)
+    return rows
+
+
+def new_appointment_id() -> str:
+    """Random ID for one appointment; it stays with the booking when it is moved."""
+    return uuid.uuid4().hex[:16]
+
+
+class BookingStatus(str, Enum):
+    BOOKED = "booked"
+    SLOT_TAKEN = "slot_taken"
+    NO_SUCH_SLOT = "no_such_slot"
+
+
+class Booking(NamedTuple):
+    """One appointment to claim: consecutive slot ``times`` on ``day`` with ``doctor``."""
+    day: str
+    times: Tuple[str, ...]
+    patient: str
+    duration: int
+    patient_type: str
+    doctor: str = ""
+    appointment_id: str = ""
+
+
+class AppointmentSlots(NamedTuple):
+    """The consecutive slot ``times`` one appointment holds (or held, once released) on ``day``."""
+    appointment_id: str
+    day: str
+    times: Tuple[str, ...]
+    patient: str
+    duration: int
+    patient_type: str
+    doctor: str
+    location: str
+
+
+class _SlotConflict(Exception):
+    """Raised inside a booking transaction to roll back a partial claim."""
+
+
+class ScheduleStore(ABC):
+    """Interface for slot storage.
+
+    Rows are ``date`` (YYYY-MM-DD), ``time`` (HH:MM), ``patient`` ('' when
+    free), ``duration`` (minutes, 0 on continuation slots), ``patient_type``
+    ``doctor`` ('' for the legacy shared grid) and the doctor's ``location``.
+    Each doctor has their own grid; (date, time, doctor) is unique. Every
+    slot of a booking carries its ``appointment_id``, which is how it is
+    released or moved.
+    """
+
+    @abstractmethod
+    def days(self) -> Set[str]:
+        """Return every date that has slots."""
+
+    @abstractmethod
+    def add_slots(self, rows: Iterable[Sequence]) -> int:
+        """Insert slot rows, skipping ones that already exist. Returns rows added."""
+
+    @abstractmethod
+    def day_slots(self, day_str: str, doctor: str = "") -> List[dict]:
+        """Return the slots for one day ordered by time."""
+
+    @abstractmethod
+    def range_slots(self, start_day: str, end_day: str, doctor: str = "") -> List[dict]:
+        """Return slots for ``start_day``..``end_day`` inclusive, ordered by (date, time)."""
+
+    @abstractmethod
+    def iter_slots(self, start_day: str, end_day: str, location: Optional[str] = None,
+                   doctor: Optional[str] = None) -> Iterator[dict]:
+        """Stream slots across every doctor (optionally one location or doctor),
+        ordered by (date, doctor, time)."""
+
+    def slot_table(self, start_day: str, end_day: str, location: Optional[str] = None,
+                   doctor: Optional[str] = None) -> SlotTable:
+        """The rows ``iter_slots`` returns, normalized into a typed ``SlotTable``."""
+        return SlotTable.from_rows(self.iter_slots(start_day, end_day, location, doctor))
+
+    @abstractmethod
+    def book(self, day_str: str, times: Sequence[str], patient: str, duration: int,
+             patient_type: str, doctor: str = "", appointment_id: str = "") -> BookingStatus:
+        """Claim all of ``times`` for ``patient`` atomically, touching only those rows.
+
+        Either every slot is claimed (``BOOKED``) or none is: ``SLOT_TAKEN`` when
+        another booking got one of them first, ``NO_SUCH_SLOT`` when a time is
+        missing from the grid or ``times`` is empty. The slots are tagged with ``appointment_id``
+        (a new one when blank).
+        """
+
+    def book_many(self, bookings: Sequence[Booking]) -> List[BookingStatus]:
+        """Claim a batch of bookings in one transaction; one status per booking.
+
+        A booking that can't be claimed is skipped without undoing the others.
+        """
+        return [self.book(b.day, b.times, b.patient, b.duration, b.patient_type, b.doctor, b.appointment_id)
+                for b in bookings]
+
+    @abstractmethod
+    def appointment(self, appointment_id: str) -> Optional[AppointmentSlots]:
+        """The live slots booked under ``appointment_id``, or None."""
+
+    @abstractmethod
+    def release(self, appointment_id: str) -> Optional[AppointmentSlots]:
+        """Free every slot of one appointment in one transaction. Returns what was
+        freed, or None if the appointment holds no live slots."""
+
+    @abstractmethod
+    def move(self, appointment_id: str, day_str: str, times: Sequence[str],
+             doctor: str) -> Tuple[BookingStatus, Optional[AppointmentSlots]]:
+        """Release an appointment and claim ``times`` for it, keeping its ID, in one transaction.
+
+        Returns ``BOOKED`` and the slots given up, or the claim's failure status
+        with nothing changed (the new times may overlap the old ones).
+        ``(NO_SUCH_SLOT, None)`` when the appointment holds no live slots.
+        """
+
+    @abstractmethod
+    def to_dataframe(self, day_str: Optional[str] = None, include_archive: bool = False) -> pd.DataFrame:
+        """Return the schedule (or one day of it) as a DataFrame, optionally with archived days."""
+
+    @abstractmethod
+    def archive_before(self, day_str: str) -> int:
+        """Move every slot dated before ``day_str`` out of the live table. Returns rows moved.
+
+        Archived rows are kept for exports and reports but no query on the
+        booking path reads them.
+        """
+
+    @abstractmethod
+    def day_version(self, day_str: str) -> int:
+        """Counter that grows with every change to the day's slot rows (0 if never changed)."""
+
+    def day_snapshot(self, day_str: str) -> Tuple[int, List[dict]]:
+        """The day's version and every slot row on it (ordered by doctor, time), read consistently.
+
+        The rows reflect exactly the changes counted by the version. This
+        fallback re-reads until the version is unchanged across the read; a day
+        that never settles comes back with version -1, which matches no real
+        version so callers treat it as stale.
+        """
+        for _ in range(3):
+            version = self.day_version(day_str)
+            rows = list(self.iter_slots(day_str, day_str))
+            if self.day_version(day_str) == version:
+                return version, rows
+        return -1, rows
+
+    @abstractmethod
+    def changed_days(self, since: int) -> Tuple[int, List[str]]:
+        """The store-wide change counter, and the dates changed after counter value ``since``.
+
+        ``changed_days(0)`` lists every date that has ever had rows; pass the
+        returned counter back in to get only what changed since.
+        """
+
+    def has_day(self, day_str: str) -> bool:
+        return day_str in self.days()
+
+    def missing_days(self, day_strs: Sequence[str], doctor: str = "") -> List[str]:
+        """Return the dates in ``day_strs`` that have no slots yet for ``doctor``."""
+        if not day_strs:
+            return []
+        existing = {s["date"] for s in self.iter_slots(min(day_strs), max(day_strs), doctor=doctor)}
+        return [d for d in day_strs if d not in existing]
+
+    @METRICS.timed("agent_storage_seconds", op="schedule_import_xlsx")
+    def import_xlsx(self, path: str) -> int:
+        """Load an existing ``schedule.xlsx`` into the store."""
+        df = pd.read_excel(path, dtype={"date": str, "time": str})
+        if df.empty:
+            return 0
+        for col, default in (("patient", ""), ("duration", 30), ("patient_type", ""), ("doctor", ""), ("location", "")):
+            if col not in df.columns:
+                df[col] = default
+        rows = []
+        for rec in df.to_dict("records"):
+            slot_time = normalize_time(rec["time"])
+            if not slot_time:
+                continue
+            duration = rec["duration"]
+            rows.append((
+                str(rec["date"]).strip()[:10],
+                slot_time,
+                normalize_patient(rec["patient"]),
+                30 if pd.isna(duration) else int(duration),
+                normalize_patient(rec["patient_type"]),
+                normalize_patient(rec["doctor"]),
+                normalize_patient(rec["location"]),
+            ))
+        return self.add_slots(rows)
+
+    @METRICS.timed("agent_storage_seconds", op="schedule_export_xlsx")
+    def export_xlsx(self, path: str):
+        """Write the whole schedule, archived days included, to an xlsx workbook for staff."""
+        self.to_dataframe(include_archive=True).to_excel(path, index=False)
+
+
+class SQLiteScheduleStore(ScheduleStore):
+    """SQLite backend in WAL mode, indexed on (date, time, doctor)."""
+
+    _ADDED_COLUMNS = {
+        "version": "INTEGER NOT NULL DEFAULT 0",
+        "location": "TEXT NOT NULL DEFAULT ''",
+        "appointment_id": "TEXT NOT NULL DEFAULT ''",
+    }
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE takes the write lock up front so check-and-claim can't interleave."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def _init_schema(self):
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS slots (
+                    id INTEGER PRIMARY KEY,
+                    date TEXT NOT NULL,
+                    time TEXT NOT NULL,
+                    doctor TEXT NOT NULL DEFAULT '',
+                    patient TEXT NOT NULL DEFAULT '',
+                    duration INTEGER NOT NULL DEFAULT 30,
+                    patient_type TEXT NOT NULL DEFAULT '',
+                    version INTEGER NOT NULL DEFAULT 0,
+                    location TEXT NOT NULL DEFAULT '',
+                    appointment_id TEXT NOT NULL DEFAULT ''
+                )
+                """
+            )
+            columns = {r[1] for r in conn.execute("PRAGMA table_info(slots)")}
+            for name, decl in self._ADDED_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE slots ADD COLUMN {name} {decl}")
+            if "appointment_id" not in columns:
+                self._assign_appointment_ids(conn)
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_slots_date_time_doctor "
+                "ON slots(date, time, doctor)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_slots_doctor_date ON slots(doctor, date, time)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_slots_location_date ON slots(location, date, doctor, time)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_slots_appointment ON slots(appointment_id) WHERE appointment_id != ''"
+            )
+            # Past days, moved here by archive_before() so the live table stays the size of the horizon.
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS slots_archive (
+                    date TEXT NOT NULL,
+                    time TEXT NOT NULL,
+                    doctor TEXT NOT NULL DEFAULT '',
+                    patient TEXT NOT NULL DEFAULT '',
+                    duration INTEGER NOT NULL DEFAULT 30,
+                    patient_type TEXT NOT NULL DEFAULT '',
+                    location TEXT NOT NULL DEFAULT '',
+                    appointment_id TEXT NOT NULL DEFAULT '',
+                    UNIQUE (date, time, doctor)
+                )
+                """
+            )
+            if "appointment_id" not in {r[1] for r in conn.execute("PRAGMA table_info(slots_archive)")}:
+                conn.execute("ALTER TABLE slots_archive ADD COLUMN appointment_id TEXT NOT NULL DEFAULT ''")
+            # Per-day change counter maintained by triggers, so every writer
+            # (chat, batch, imports) invalidates cached day summaries. A global
+            # counter stamps each day's last change (changed_at), so readers can
+            # ask which days changed since they last looked.
+            conn.execute("CREATE TABLE IF NOT EXISTS day_versions (date TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            if "changed_at" not in {r[1] for r in conn.execute("PRAGMA table_info(day_versions)")}:
+                conn.execute("ALTER TABLE day_versions ADD COLUMN changed_at INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_day_versions_changed ON day_versions(changed_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS schedule_version (id INTEGER PRIMARY KEY CHECK (id = 0), "
+                "version INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO schedule_version (id, version) VALUES (0, 0)")
+            for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+                conn.execute(f"DROP TRIGGER IF EXISTS slots_{event.lower()}_day_version")
+                conn.execute(
+                    f"""
+                    CREATE TRIGGER slots_{event.lower()}_day_version AFTER {event} ON slots
+                    BEGIN
+                        UPDATE schedule_version SET version = version + 1;
+                        INSERT OR IGNORE INTO day_versions (date, version) VALUES ({row}.date, 0);
+                        UPDATE day_versions SET version = version + 1,
+                            changed_at = (SELECT version FROM schedule_version)
+                        WHERE date = {row}.date;
+                    END
+                    """
+                )
+
+    @staticmethod
+    def _assign_appointment_ids(conn: sqlite3.Connection):
+        """Give booked rows without an appointment ID one (imports, databases from before IDs).
+
+        A row with a duration starts an appointment; the 0-duration rows after
+        it for the same patient and doctor that day continue it.
+        """
+        rows = conn.execute(
+            "SELECT id, date, doctor, patient, duration FROM slots "
+            "WHERE patient != '' AND appointment_id = '' ORDER BY date, doctor, time"
+        ).fetchall()
+        updates, current, owner = [], "", None
+        for r in rows:
+            if r["duration"] or owner != (r["date"], r["doctor"], r["patient"]):
+                current, owner = new_appointment_id(), (r["date"], r["doctor"], r["patient"])
+            updates.append((current, r["id"]))
+        conn.executemany("UPDATE slots SET appointment_id = ? WHERE id = ?", updates)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def days(self) -> Set[str]:
+        rows = self._conn().execute("SELECT DISTINCT date FROM slots").fetchall()
+        return {r[0] for r in rows}
+
+    def has_day(self, day_str: str) -> bool:
+        row = self._conn().execute("SELECT 1 FROM slots WHERE date = ? LIMIT 1", (day_str,)).fetchone()
+        return row is not None
+
+    def missing_days(self, day_strs: Sequence[str], doctor: str = "") -> List[str]:
+        # Answered from the (doctor, date, time) index alone; no slot rows are read.
+        if not day_strs:
+            return []
+        placeholders = ", ".join("?" * len(day_strs))
+        rows = self._conn().execute(
+            f"SELECT DISTINCT date FROM slots WHERE doctor = ? AND date IN ({placeholders})",
+            (doctor, *day_strs),
+        ).fetchall()
+        existing = {r[0] for r in rows}
+        return [d for d in day_strs if d not in existing]
+
+    def day_version(self, day_str: str) -> int:
+        row = self._conn().execute("SELECT version FROM day_versions WHERE date = ?", (day_str,)).fetchone()
+        return row[0] if row else 0
+
+    def day_snapshot(self, day_str: str) -> Tuple[int, List[dict]]:
+        sql, params = self._range_query(_SELECT_COLUMNS, day_str, day_str, None, None)
+        conn = self._conn()
+        # One read transaction so the version counts exactly the changes in the rows.
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT version FROM day_versions WHERE date = ?", (day_str,)).fetchone()
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return (row[0] if row else 0), [dict(r) for r in rows]
+
+    def changed_days(self, since: int) -> Tuple[int, List[str]]:
+        conn = self._conn()
+        # One read transaction so the counter and the days agree.
+        conn.execute("BEGIN")
+        try:
+            version = conn.execute("SELECT version FROM schedule_version").fetchone()[0]
+            rows = conn.execute("SELECT date FROM day_versions WHERE changed_at > ?", (since,)).fetchall() \
+                if version > since else []
+        finally:
+            conn.execute("COMMIT")
+        return version, sorted(r[0] for r in rows)
+
+    def add_slots(self, rows: Iterable[Sequence]) -> int:
+        rows = list(rows)
+        with self._transaction() as conn:
+            cur = conn.executemany(
+                "INSERT OR IGNORE INTO slots (date, time, patient, duration, patient_type, doctor, location) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            added = cur.rowcount
+            if any(r[2] for r in rows):  # imported bookings
+                self._assign_appointment_ids(conn)
+        return added
+
+    def day_slots(self, day_str: str, doctor: str = "") -> List[dict]:
+        rows = self._conn().execute(
+            f"SELECT {_SELECT_COLUMNS} FROM slots WHERE date = ? AND doctor = ? ORDER BY time",
+            (day_str, doctor),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def range_slots(self, start_day: str, end_day: str, doctor: str = "") -> List[dict]:
+        rows = self._conn().execute(
+            f"SELECT {_SELECT_COLUMNS} FROM slots "
+            "WHERE doctor = ? AND date BETWEEN ? AND ? ORDER BY date, time",
+            (doctor, start_day, end_day),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    @staticmethod
+    def _range_query(select: str, start_day: str, end_day: str, location: Optional[str],
+                     doctor: Optional[str], order: str = "date, doctor, time") -> Tuple[str, list]:
+        sql = f"SELECT {select} FROM slots WHERE date BETWEEN ? AND ?"
+        params: list = [start_day, end_day]
+        if location is not None:
+            sql += " AND location = ?"
+            params.append(location)
+        if doctor is not None:
+            sql += " AND doctor = ?"
+            params.append(doctor)
+        return f"{sql} ORDER BY {order}", params
+
+    def iter_slots(self, start_day: str, end_day: str, location: Optional[str] = None,
+                   doctor: Optional[str] = None) -> Iterator[dict]:
+        sql, params = self._range_query(_SELECT_COLUMNS, start_day, end_day, location, doctor)
+        for row in self._conn().execute(sql, params):
+            yield dict(row)
+
+    def slot_table(self, start_day: str, end_day: str, location: Optional[str] = None,
+                   doctor: Optional[str] = None) -> SlotTable:
+        # SQLite does the date/time arithmetic and rows come back as plain tuples
+        # in index order; SlotTable sorts by (day, doctor, minute) itself.
+        sql, params = self._range_query(_TYPED_COLUMNS, start_day, end_day, location, doctor, "date, time, doctor")
+        cur = self._conn().cursor()
+        cur.row_factory = None
+        columns = list(zip(*cur.execute(sql, params).fetchall())) or [()] * 7
+        return SlotTable.from_columns(*columns)
+
+    def book(self, day_str: str, times: Sequence[str], patient: str, duration: int,
+             patient_type: str, doctor: str = "", appointment_id: str = "") -> BookingStatus:
+        try:
+            with self._transaction() as conn:
+                return self._claim(conn, Booking(day_str, tuple(times), patient, duration, patient_type, doctor,
+                                                 appointment_id))
+        except _SlotConflict:
+            return BookingStatus.SLOT_TAKEN
+
+    def book_many(self, bookings: Sequence[Booking]) -> List[BookingStatus]:
+        statuses = []
+        with self._transaction() as conn:
+            for booking in bookings:
+                conn.execute("SAVEPOINT claim")
+                try:
+                    status = self._claim(conn, booking)
+                except _SlotConflict:
+                    status = BookingStatus.SLOT_TAKEN
+                if status == BookingStatus.BOOKED:
+                    conn.execute("RELEASE claim")
+                else:
+                    conn.execute("ROLLBACK TO claim")
+                    conn.execute("RELEASE claim")
+                statuses.append(status)
+        return statuses
+
+    @staticmethod
+    def _claim(conn: sqlite3.Connection, booking: Booking) -> BookingStatus:
+        """Claim one booking's rows inside the caller's transaction."""
+        times = booking.times
+        if not times:
+            return BookingStatus.NO_SUCH_SLOT
+        placeholders = ", ".join("?" * len(times))
+        rows = conn.execute(
+            f"SELECT id, time, patient, version FROM slots "
+            f"WHERE date = ? AND doctor = ? AND time IN ({placeholders})",
+            (booking.day, booking.doctor, *times),
+        ).fetchall()
+        if len(rows) != len(set(times)):
+            return BookingStatus.NO_SUCH_SLOT
+        if any(r["patient"] for r in rows):
+            return BookingStatus.SLOT_TAKEN
+
+        # Claim each row against the version we just read; a zero
+        # rowcount means someone else got there first.
+        first = times[0]
+        appointment_id = booking.appointment_id or new_appointment_id()
+        for r in rows:
+            cur = conn.execute(
+                "UPDATE slots SET patient = ?, duration = ?, patient_type = ?, appointment_id = ?, "
+                "version = version + 1 WHERE id = ? AND version = ? AND patient = ''",
+                (booking.patient, booking.duration if r["time"] == first else 0, booking.patient_type,
+                 appointment_id, r["id"], r["version"]),
+            )
+            if cur.rowcount == 0:
+                raise _SlotConflict()
+        return BookingStatus.BOOKED
+
+    @staticmethod
+    def _held(conn: sqlite3.Connection, appointment_id: str) -> Optional[AppointmentSlots]:
+        rows = conn.execute(
+            "SELECT date, time, patient, duration, patient_type, doctor, location FROM slots "
+            "WHERE appointment_id = ? ORDER BY date, time",
+            (appointment_id,),
+        ).fetchall() if appointment_id else []
+        if not rows:
+            return None
+        head = rows[0]
+        return AppointmentSlots(appointment_id, head["date"], tuple(r["time"] for r in rows), head["patient"],
+                                max(r["duration"] for r in rows), head["patient_type"], head["doctor"],
+                                head["location"])
+
+    def appointment(self, appointment_id: str) -> Optional[AppointmentSlots]:
+        return self._held(self._conn(), appointment_id)
+
+    @staticmethod
+    def _free(conn: sqlite3.Connection, appointment_id: str):
+        # Back to how day_slot_rows lays out a free slot
+        conn.execute(
+            "UPDATE slots SET patient = '', duration = 30, patient_type = '', appointment_id = '', "
+            "version = version + 1 WHERE appointment_id = ?",
+            (appointment_id,),
+        )
+
+    def release(self, appointment_id: str) -> Optional[AppointmentSlots]:
+        with self._transaction() as conn:
+            held = self._held(conn, appointment_id)
+            if held is not None:
+                self._free(conn, appointment_id)
+        return held
+
+    def move(self, appointment_id: str, day_str: str, times: Sequence[str],
+             doctor: str) -> Tuple[BookingStatus, Optional[AppointmentSlots]]:
+        try:
+            with self._transaction() as conn:
+                held = self._held(conn, appointment_id)
+                if held is None:
+                    return BookingStatus.NO_SUCH_SLOT, None
+                self._free(conn, appointment_id)
+                status = self._claim(conn, Booking(day_str, tuple(times), held.patient, held.duration,
+                                                   held.patient_type, doctor, appointment_id))
+                if status != BookingStatus.BOOKED:
+                    raise _SlotConflict(status)
+                return status, held
+        except _SlotConflict as e:
+            return (e.args[0] if e.args else BookingStatus.SLOT_TAKEN), None
+
+    def to_dataframe(self, day_str: Optional[str] = None, include_archive: bool = False) -> pd.DataFrame:
+        source = "slots"
+        if include_archive:
+            source = f"(SELECT {_EXPORT_COLUMNS} FROM slots_archive UNION ALL SELECT {_EXPORT_COLUMNS} FROM slots)"
+        sql = f"SELECT {_EXPORT_COLUMNS} FROM {source}"
+        params: tuple = ()
+        if day_str is not None:
+            sql += " WHERE date = ?"
+            params = (day_str,)
+        sql += " ORDER BY date, time, doctor"
+        return pd.read_sql_query(sql, self._conn(), params=params)
+
+    def archive_before(self, day_str: str) -> int:
+        with self._transaction() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO slots_archive ({_EXPORT_COLUMNS}) "
+                f"SELECT {_EXPORT_COLUMNS} FROM slots WHERE date < ?",
+                (day_str,),
+            )
+            moved = conn.execute("DELETE FROM slots WHERE date < ?", (day_str,)).rowcount
+        return moved
+
+
+def open_schedule_store(db_path: str, xlsx_path: Optional[str] = None) -> ScheduleStore:
+    """Open the SQLite store, migrating ``xlsx_path`` into it on first use."""
+    is_new = not os.path.exists(db_path)
+    store = SQLiteScheduleStore(db_path)
+    if is_new and xlsx_path and os.path.exists(xlsx_path):
+        store.import_xlsx(xlsx_path)
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import/export the appointment schedule.")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("--db", default="schedule.db")
+    parser.add_argument("--xlsx", default="schedule.xlsx")
+    args = parser.parse_args(argv)
+
+    store = SQLiteScheduleStore(args.db)
+    if args.command == "import":
+        added = store.import_xlsx(args.xlsx)
+        print(f"Imported {added} slots from {args.xlsx} into {args.db}")
+    else:
+        store.export_xlsx(args.xlsx)
+        print(f"Exported {args.db} to {args.xlsx}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""Server-side conversation state for the HTTP API and the Streamlit app.
+
+Each session is the engine's state dict under a random ID. The conversation
+history is kept apart from the rest of the state as numbered messages, so a
+checkpoint after a turn writes only what the turn changed: the top-level
+fields whose value differs from the last checkpoint and the messages added
+since. ``load(..., history=n)`` brings back just the last ``n`` messages;
+older ones are paged in with ``history()``.
+
+Saves carry the version that was loaded, so two workers answering the same
+session at once cannot silently overwrite each other's turn. A turn that
+books or notifies claims the session first with ``claim_turn()``: only one
+worker holds a session until it saves, releases, or the lease runs out, so
+a second message for the same session is refused before it runs. Sessions idle
+for longer than the TTL are removed by ``sweep()``, which ``SessionSweeper``
+runs in the background.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+HISTORY = "conversation_history"
+# Baseline of the last checkpoint, kept in the state dict and never persisted:
+# the JSON of each field, the seq of the first message held and how many were held.
+_CHECKPOINT = "_checkpoint"
+
+Message = Tuple[int, str, str]  # (seq, speaker, text)
+
+
+class SessionConflict(Exception):
+    """The session changed since it was loaded."""
+
+
+def _encode(value) -> str:
+    return json.dumps(value, default=lambda v: v.isoformat() if isinstance(v, date) else str(v))
+
+
+def encode_fields(state: dict) -> Dict[str, str]:
+    """JSON of every persisted top-level field (history and the checkpoint excluded)."""
+    return {k: _encode(v) for k, v in state.items() if k not in (HISTORY, _CHECKPOINT)}
+
+
+def decode_state(fields: dict, messages: List[Message], first_seq: int) -> dict:
+    state = dict(fields)
+    if state.get("appointment_date"):
+        state["appointment_date"] = date.fromisoformat(state["appointment_date"])
+    state[HISTORY] = [(speaker, text) for _, speaker, text in messages]
+    _mark_checkpoint(state, first_seq)
+    return state
+
+
+def _mark_checkpoint(state: dict, first_seq: int):
+    """The state as it is now is the baseline the next save is diffed against."""
+    state[_CHECKPOINT] = {"fields": encode_fields(state), "first_seq": first_seq,
+                          "loaded": len(state.get(HISTORY, []))}
+
+
+def checkpoint_delta(state: dict) -> Tuple[Dict[str, str], List[str], int, List[Tuple[str, str]]]:
+    """What changed since the last checkpoint: ``(changed fields as JSON, removed
+    fields, seq of the first new message, new messages)``."""
+    base = state.get(_CHECKPOINT) or {"fields": {}, "first_seq": 0}
+    fields = encode_fields(state)
+    changed = {k: v for k, v in fields.items() if base["fields"].get(k) != v}
+    removed = [k for k in base["fields"] if k not in fields]
+    loaded = base.get("loaded", 0)
+    history = state.get(HISTORY, [])
+    return changed, removed, base["first_seq"] + loaded, [tuple(m) for m in history[loaded:]]
+
+
+def trim_history(state: dict, keep: int):
+    """Drop all but the last ``keep`` messages from a saved state; they stay in the store."""
+    history = state.get(HISTORY, [])
+    drop = max(0, len(history) - keep)
+    if drop:
+        base = state[_CHECKPOINT]
+        state[HISTORY] = history[drop:]
+        base["first_seq"] += drop
+        base["loaded"] = base.get("loaded", 0) - drop
+
+
+def history_start(state: dict) -> int:
+    """Sequence number of the first message held in ``state``."""
+    return (state.get(_CHECKPOINT) or {}).get("first_seq", 0)
+
+
+class SessionStore(ABC):
+    """Interface for session persistence; versions start at 1."""
+
+    def create(self, state: dict) -> str:
+        """Store a new session at version 1 and make ``state`` its checkpoint."""
+        session_id = uuid.uuid4().hex
+        state.pop(_CHECKPOINT, None)
+        self._insert(session_id, state)
+        _mark_checkpoint(state, 0)
+        return session_id
+
+    @abstractmethod
+    def _insert(self, session_id: str, state: dict):
+        """Store a new session (fields and history) at version 1."""
+
+    @abstractmethod
+    def load(self, session_id: str, history: Optional[int] = None) -> Optional[Tuple[dict, int]]:
+        """Return ``(state, version)`` with the last ``history`` messages (all if None),
+        or None for an unknown session."""
+
+    def save(self, session_id: str, state: dict, version: int) -> int:
+        """Write what changed since ``state`` was loaded or last saved, if the session
+        is still at ``version``; returns the new version or raises ``SessionConflict``."""
+        changed, removed, first_new, messages = checkpoint_delta(state)
+        with METRICS.timer("agent_storage_seconds", op="session_save"):
+            self._apply(session_id, version, changed, removed, first_new, messages)
+        METRICS.count("agent_rows_written_total", len(messages), op="session_save")
+        _mark_checkpoint(state, history_start(state))
+        return version + 1
+
+    @abstractmethod
+    def _apply(self, session_id: str, version: int, changed: Dict[str, str], removed: List[str],
+               first_new: int, messages: List[Tuple[str, str]]):
+        """Apply one checkpoint delta atomically and drop any turn claim, or raise ``SessionConflict``."""
+
+    @abstractmethod
+    def claim_turn(self, session_id: str, version: int, lease: float) -> bool:
+        """Hold the session for one turn if it is still at ``version`` and nobody else
+        holds it; the claim lasts until ``save()``, ``release_turn()`` or ``lease`` seconds."""
+
+    @abstractmethod
+    def release_turn(self, session_id: str):
+        """Drop a claim without saving, e.g. after the turn failed."""
+
+    @abstractmethod
+    def history(self, session_id: str, before: Optional[int] = None, limit: int = 50) -> List[Message]:
+        """Up to ``limit`` messages with seq < ``before`` (default: the latest), oldest first."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Drop a session. Returns False if it did not exist."""
+
+    @abstractmethod
+    def sweep(self, ttl: float, now: Optional[float] = None) -> int:
+        """Delete sessions not saved for ``ttl`` seconds. Returns how many."""
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process store, for a single worker or tests."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        # id -> [fields as JSON, version, messages, updated_at, claimed until]
+        self._sessions: Dict[str, list] = {}
+
+    def _insert(self, session_id: str, state: dict):
+        history = [(i, s, t) for i, (s, t) in enumerate(state.get(HISTORY, []))]
+        with self._lock:
+            self._sessions[session_id] = [encode_fields(state), 1, history, self.clock(), 0.0]
+
+    def load(self, session_id: str, history: Optional[int] = None) -> Optional[Tuple[dict, int]]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            fields, version, messages = dict(entry[0]), entry[1], list(entry[2])
+        tail = messages if history is None else messages[-history:] if history else []
+        first_seq = tail[0][0] if tail else len(messages)
+        return decode_state({k: json.loads(v) for k, v in fields.items()}, tail, first_seq), version
+
+    def _apply(self, session_id, version, changed, removed, first_new, messages):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[1] != version:
+                raise SessionConflict(session_id)
+            entry[0].update(changed)
+            for k in removed:
+                entry[0].pop(k, None)
+            entry[1] = version + 1
+            entry[2].extend((first_new + i, s, t) for i, (s, t) in enumerate(messages))
+            entry[3] = self.clock()
+            entry[4] = 0.0
+
+    def claim_turn(self, session_id: str, version: int, lease: float) -> bool:
+        now = self.clock()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[1] != version or entry[4] > now:
+                return False
+            entry[4] = now + lease
+            return True
+
+    def release_turn(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry[4] = 0.0
+
+    def history(self, session_id: str, before: Optional[int] = None, limit: int = 50) -> List[Message]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            older = [m for m in entry[2] if before is None or m[0] < before]
+        return older[-limit:] if limit else []
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def sweep(self, ttl: float, now: Optional[float] = None) -> int:
+        cutoff = (now if now is not None else self.clock()) - ttl
+        with self._lock:
+            idle = [sid for sid, entry in self._sessions.items() if entry[3] < cutoff]
+            for sid in idle:
+                del self._sessions[sid]
+        return len(idle)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a WAL-mode SQLite file shared by every worker and replica on the host.
+
+    ``sessions.state`` holds the fields as a JSON object, patched in place with
+    ``json_set``; ``session_messages`` holds the history, one row per message.
+    """
+
+    def __init__(self, path: str, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                claimed_until REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                speaker TEXT NOT NULL,
+                message TEXT NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at)")
+        if "claimed_until" not in {r[1] for r in conn.execute("PRAGMA table_info(sessions)")}:
+            conn.execute("ALTER TABLE sessions ADD COLUMN claimed_until REAL NOT NULL DEFAULT 0")
+        self._migrate_history()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _migrate_history(self):
+        """Sessions saved before history had its own table carry it inside ``state``."""
+        conn = self._conn()
+        rows = conn.execute(
+            f"SELECT id, json_extract(state, '$.{HISTORY}') FROM sessions "
+            f"WHERE json_type(state, '$.{HISTORY}') IS NOT NULL"
+        ).fetchall()
+        if not rows:
+            return
+        with self._transaction() as conn:
+            for session_id, history in rows:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO session_messages (session_id, seq, speaker, message) VALUES (?, ?, ?, ?)",
+                    [(session_id, i, s, t) for i, (s, t) in enumerate(json.loads(history))],
+                )
+                conn.execute(f"UPDATE sessions SET state = json_remove(state, '$.{HISTORY}') WHERE id = ?",
+                             (session_id,))
+        logger.info("Moved the history of %d sessions into session_messages", len(rows))
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def _insert(self, session_id: str, state: dict):
+        fields = "{" + ",".join(f"{json.dumps(k)}:{v}" for k, v in encode_fields(state).items()) + "}"
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO sessions (id, state, version, updated_at) VALUES (?, ?, 1, ?)",
+                (session_id, fields, self.clock()),
+            )
+            conn.executemany(
+                "INSERT INTO session_messages (session_id, seq, speaker, message) VALUES (?, ?, ?, ?)",
+                [(session_id, i, s, t) for i, (s, t) in enumerate(state.get(HISTORY, []))],
+            )
+
+    def load(self, session_id: str, history: Optional[int] = None) -> Optional[Tuple[dict, int]]:
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT state, version FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            if history is None:
+                messages = self._messages(conn, session_id, None, -1)
+            else:
+                messages = self._messages(conn, session_id, None, history) if history else []
+            total = conn.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM session_messages WHERE session_id = ?",
+                                 (session_id,)).fetchone()[0]
+        finally:
+            conn.execute("COMMIT")
+        first_seq = messages[0][0] if messages else total
+        return decode_state(json.loads(row[0]), messages, first_seq), row[1]
+
+    @staticmethod
+    def _messages(conn, session_id: str, before: Optional[int], limit: int) -> List[Message]:
+        rows = conn.execute(
+            "SELECT seq, speaker, message FROM session_messages WHERE session_id = ? AND seq < ? "
+            "ORDER BY seq DESC LIMIT ?",
+            (session_id, before if before is not None else 2 ** 62, limit),
+        ).fetchall()
+        return [tuple(r) for r in reversed(rows)]
+
+    def _apply(self, session_id, version, changed, removed, first_new, messages):
+        args: list = []
+        expr = "state"
+        if changed:
+            expr = "json_set(state, " + ", ".join("?, json(?)" for _ in changed) + ")"
+            for k, v in changed.items():
+                args += [f'$."{k}"', v]
+        if removed:
+            expr = f"json_remove({expr}, " + ", ".join("?" for _ in removed) + ")"
+            args += [f'$."{k}"' for k in removed]
+        with self._transaction() as conn:
+            cur = conn.execute(
+                f"UPDATE sessions SET state = {expr}, version = version + 1, updated_at = ?, claimed_until = 0 "
+                "WHERE id = ? AND version = ?",
+                (*args, self.clock(), session_id, version),
+            )
+            if cur.rowcount != 1:
+                raise SessionConflict(session_id)
+            conn.executemany(
+                "INSERT INTO session_messages (session_id, seq, speaker, message) VALUES (?, ?, ?, ?)",
+                [(session_id, first_new + i, s, t) for i, (s, t) in enumerate(messages)],
+            )
+
+    def claim_turn(self, session_id: str, version: int, lease: float) -> bool:
+        now = self.clock()
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE sessions SET claimed_until = ? WHERE id = ? AND version = ? AND claimed_until <= ?",
+                (now + lease, session_id, version, now),
+            ).rowcount == 1
+
+    def release_turn(self, session_id: str):
+        with self._transaction() as conn:
+            conn.execute("UPDATE sessions SET claimed_until = 0 WHERE id = ?", (session_id,))
+
+    def history(self, session_id: str, before: Optional[int] = None, limit: int = 50) -> List[Message]:
+        return self._messages(self._conn(), session_id, before, limit)
+
+    def delete(self, session_id: str) -> bool:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+            return conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount == 1
+
+    def sweep(self, ttl: float, now: Optional[float] = None) -> int:
+        cutoff = (now if now is not None else self.clock()) - ttl
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM session_messages WHERE session_id IN (SELECT id FROM sessions WHERE updated_at < ?)",
+                (cutoff,),
+            )
+            return conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+
+
+class SessionSweeper:
+    """Background thread that runs ``store.sweep(ttl)`` every ``interval`` seconds."""
+
+    def __init__(self, store: SessionStore, ttl: float, interval: float = 600.0):
+        self.store = store
+        self.ttl = ttl
+        self.interval = interval
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def run_once(self) -> int:
+        removed = self.store.sweep(self.ttl)
+        if removed:
+            logger.info("Expired %d idle sessions", removed)
+        return removed
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="session-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("Session sweep failed: %s", e)
+            self._stop.wait(self.interval)
@@ -0,0 +1,282 @@
+"""Columnar, memory-mapped snapshots of the schedule and the appointment ledger.
+
+A snapshot is a directory of one ``.npy`` file per column plus ``meta.json``:
+
+- dates are ``int32`` days since 1970-01-01
+- times are ``int16`` minutes since midnight
+- durations are ``int16``
+- text columns (patients, doctors, carriers, ...) are ``int32`` codes into a
+  categories list kept in ``meta.json``
+
+Columns are opened with ``mmap_mode="r"``, so loading costs a few ``open``
+calls and only the pages a query touches are read. A new snapshot is written
+under a fresh generation and switched to by atomically replacing
+``meta.json``; readers never see a half-written one. Writers take an
+exclusive lock on ``.lock`` in the directory, and a generation's files are
+only deleted once it is neither current nor the one just replaced and has
+been superseded for ``STALE_AFTER`` seconds, so a reader that opened
+``meta.json`` just before a switch can still map its columns. A snapshot
+whose files are missing anyway loads as no snapshot.
+
+    python -m appointment_agent.snapshot ledger --ledger final.jsonl --out final.snapshot
+    python -m appointment_agent.snapshot schedule --db schedule.db --out schedule.snapshot
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not serialized, the grace period still protects readers
+    fcntl = None
+
+DAY = "day"
+MINUTE = "minute"
+INT = "int"
+CATEGORY = "category"
+
+_DTYPES = {DAY: np.int32, MINUTE: np.int16, INT: np.int16, CATEGORY: np.int32}
+_EPOCH = date(1970, 1, 1).toordinal()
+_META = "meta.json"
+_LOCK = ".lock"
+STALE_AFTER = 300  # seconds a replaced generation's files are kept for readers
+
+
+def encode_day(value: str) -> int:
+    """'YYYY-MM-DD' -> days since 1970-01-01 (-1 when blank or invalid)."""
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal() - _EPOCH
+    except ValueError:
+        return -1
+
+
+def decode_day(value: int) -> str:
+    return "" if value < 0 else date.fromordinal(int(value) + _EPOCH).isoformat()
+
+
+def encode_minute(value: str) -> int:
+    """'HH:MM' -> minutes since midnight (-1 when blank or invalid)."""
+    text = str(value).strip()
+    try:
+        hours, minutes = text.split(":")[:2]
+        return int(hours) * 60 + int(minutes)
+    except ValueError:
+        return -1
+
+
+def decode_minute(value: int) -> str:
+    return "" if value < 0 else f"{value // 60:02d}:{value % 60:02d}"
+
+
+class Snapshot:
+    """A loaded snapshot: raw column arrays plus the categories to decode them."""
+
+    def __init__(self, path: str, meta: dict, columns: Dict[str, np.ndarray]):
+        self.path = path
+        self.meta = meta
+        self.columns = columns
+        self.schema: Dict[str, str] = meta["schema"]
+        self.categories: Dict[str, List[str]] = meta["categories"]
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @property
+    def source_offset(self) -> int:
+        """Byte offset in the source journal this snapshot covers up to (0 if not journal-backed)."""
+        return self.meta.get("source_offset", 0)
+
+    def code(self, column: str, value: str) -> int:
+        """Category code of ``value`` in ``column``, or -1 if absent (matches nothing)."""
+        try:
+            return self.categories[column].index(value)
+        except ValueError:
+            return -1
+
+    def decode(self, column: str, rows: Optional[Sequence[int]] = None) -> List:
+        values = self.columns[column] if rows is None else self.columns[column][rows]
+        kind = self.schema[column]
+        if kind == CATEGORY:
+            cats = self.categories[column]
+            return [cats[c] for c in values.tolist()]
+        if kind in (DAY, MINUTE):
+            # Few distinct days/times: decode each once.
+            uniques, inverse = np.unique(values, return_inverse=True)
+            fn = decode_day if kind == DAY else decode_minute
+            labels = [fn(v) for v in uniques.tolist()]
+            return [labels[i] for i in inverse.tolist()]
+        return values.tolist()
+
+    def records(self, rows: Optional[Sequence[int]] = None) -> List[dict]:
+        """Decode ``rows`` (default: all) back into dicts of strings/ints."""
+        decoded = {c: self.decode(c, rows) for c in self.schema}
+        n = len(self) if rows is None else len(rows)
+        return [{c: decoded[c][i] for c in self.schema} for i in range(n)]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        data = {}
+        for column, kind in self.schema.items():
+            values = np.asarray(self.columns[column])
+            if kind == CATEGORY:
+                data[column] = pd.Categorical.from_codes(values, categories=self.categories[column])
+            elif kind in (DAY, MINUTE):
+                data[column] = self.decode(column)
+            else:
+                data[column] = values
+        return pd.DataFrame(data, columns=list(self.schema))
+
+
+def _encode_column(values: pd.Series, kind: str) -> Tuple[np.ndarray, Optional[List[str]]]:
+    """Vectorized encoding of one column; returns the array and, for categories, their labels."""
+    if kind == CATEGORY:
+        codes, uniques = pd.factorize(values.fillna("").astype(str), sort=False)
+        return codes.astype(np.int32), [str(u) for u in uniques]
+    if kind == DAY:
+        days = pd.to_datetime(values.astype(str).str.slice(0, 10), format="%Y-%m-%d", errors="coerce")
+        offsets = (days - pd.Timestamp("1970-01-01")).dt.days
+        return offsets.fillna(-1).to_numpy(dtype=np.int32), None
+    if kind == MINUTE:
+        parts = values.astype(str).str.strip().str.extract(r"^(\d{1,2}):(\d{2})")
+        minutes = pd.to_numeric(parts[0], errors="coerce") * 60 + pd.to_numeric(parts[1], errors="coerce")
+        return minutes.fillna(-1).to_numpy(dtype=np.int16), None
+    return pd.to_numeric(values, errors="coerce").fillna(0).to_numpy(dtype=np.int16), None
+
+
+def write_snapshot(path: str, records: Iterable[Mapping], schema: Mapping[str, str],
+                   source_offset: int = 0) -> int:
+    """Encode ``records`` column by column into a new generation at ``path``. Returns rows written."""
+    os.makedirs(path, exist_ok=True)
+    frame = pd.DataFrame.from_records(list(records), columns=list(schema))
+    rows = len(frame)
+    arrays: Dict[str, np.ndarray] = {}
+    categories: Dict[str, List[str]] = {}
+    for column, kind in schema.items():
+        arrays[column], labels = _encode_column(frame[column], kind)
+        if labels is not None:
+            categories[column] = labels
+
+    generation = uuid.uuid4().hex[:12]
+    with _writer_lock(path):
+        previous = _read_meta(path)
+        files = {}
+        for column, kind in schema.items():
+            name = f"{column}.{generation}.npy"
+            np.save(os.path.join(path, name), arrays[column].astype(_DTYPES[kind], copy=False))
+            files[column] = name
+        meta = {
+            "rows": rows,
+            "schema": dict(schema),
+            "files": files,
+            "categories": categories,
+            "source_offset": source_offset,
+        }
+        tmp = os.path.join(path, f"{_META}.{generation}.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, os.path.join(path, _META))
+        keep = set(files.values()) | set((previous or {}).get("files", {}).values())
+        _remove_stale(path, keep, time.time() - STALE_AFTER)
+    return rows
+
+
+@contextmanager
+def _writer_lock(path: str):
+    """Exclusive lock serializing writers of the snapshot at ``path`` across processes."""
+    with open(os.path.join(path, _LOCK), "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _read_meta(path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(path, _META), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_stale(path: str, keep: set, before: float):
+    """Delete generation files not in ``keep`` that were last written before ``before``."""
+    for name in os.listdir(path):
+        if not (name.endswith(".npy") or name.endswith(".tmp")) or name in keep:
+            continue
+        try:
+            if os.path.getmtime(os.path.join(path, name)) < before:
+                os.remove(os.path.join(path, name))
+        except OSError:
+            pass  # already removed, or a reader on another platform still holds it open
+
+
+def load_snapshot(path: str, mmap: bool = True) -> Optional[Snapshot]:
+    """Open the current generation at ``path`` (memory-mapped by default).
+
+    None if there is none, or if ``meta.json`` or any column file of it is
+    missing or unreadable; callers then read or rebuild from the source.
+    """
+    meta = _read_meta(path)
+    if meta is None:
+        return None
+    mode = "r" if mmap else None
+    columns = {}
+    try:
+        for column, name in meta["files"].items():
+            columns[column] = np.load(os.path.join(path, name), mmap_mode=mode) if meta["rows"] else \
+                np.zeros(0, dtype=_DTYPES[meta["schema"][column]])
+    except (OSError, ValueError, KeyError):
+        return None
+    return Snapshot(path, meta, columns)
+
+
+SCHEDULE_SCHEMA = {
+    "date": DAY, "time": MINUTE, "doctor": CATEGORY, "patient": CATEGORY, "duration": INT,
+    "patient_type": CATEGORY, "location": CATEGORY,
+}
+
+
+def snapshot_schedule(store, path: str) -> int:
+    """Write every slot in ``store`` to a columnar snapshot."""
+    days = sorted(store.days())
+    if not days:
+        return write_snapshot(path, [], SCHEDULE_SCHEMA)
+    return write_snapshot(path, store.iter_slots(days[0], days[-1]), SCHEDULE_SCHEMA)
+
+
+def main(argv=None):
+    from .config import FINAL_LEDGER, SCHEDULE_DB
+    from .ledger import AppointmentLedger
+    from .schedule_store import SQLiteScheduleStore
+
+    parser = argparse.ArgumentParser(description="Write columnar snapshots of the schedule or the ledger.")
+    parser.add_argument("kind", choices=["ledger", "schedule"])
+    parser.add_argument("--ledger", default=FINAL_LEDGER)
+    parser.add_argument("--db", default=SCHEDULE_DB)
+    parser.add_argument("--out", help="snapshot directory (default: <source>.snapshot)")
+    args = parser.parse_args(argv)
+
+    if args.kind == "ledger":
+        ledger = AppointmentLedger(args.ledger, snapshot_dir=args.out)
+        rows = ledger.compact()
+        print(f"Snapshot of {rows} appointments written to {ledger.snapshot_dir}")
+    else:
+        out = args.out or os.path.splitext(args.db)[0] + ".snapshot"
+        rows = snapshot_schedule(SQLiteScheduleStore(args.db), out)
+        print(f"Snapshot of {rows} slots written to {out}")
+
+
+if __name__ == "__main__":
+    main()
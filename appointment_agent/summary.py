@@ -0,0 +1,127 @@
+"""Per-day schedule aggregates for the overview and quick-stats panels.
+
+``ScheduleSummary.day()`` returns a cached ``DaySummary`` (appointments,
+booked count, bookable starts per duration, per-doctor utilization) after a
+single indexed lookup of the day's version counter. Bookings made through
+the app are applied to the cached summary in place; a version that moved by
+anything other than our own booking (batch runs, other replicas) drops the
+cached day so it is rebuilt from one query on the next read.
+"""
+import threading
+from collections import OrderedDict
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, List, Sequence
+
+from .availability import DayAvailability, slots_needed, to_minutes
+from .schedule_store import ScheduleStore
+
+
+class DaySummary:
+    """Aggregates for one day across every doctor."""
+
+    def __init__(self, day: str, version: int, step: int, durations: Sequence[int]):
+        self.day = day
+        self.version = version
+        self.step = step
+        self.durations = tuple(durations)
+        self.appointments: List[dict] = []
+        self.total_slots: Dict[str, int] = {}
+        self.booked_slots: Dict[str, int] = {}
+        self._free: Dict[str, DayAvailability] = {}
+        self._starts: Dict[str, Dict[int, int]] = {}
+
+    @classmethod
+    def build(cls, day: str, version: int, slots, step: int, durations: Sequence[int]) -> "DaySummary":
+        """From the day's rows ordered by (doctor, time)."""
+        summary = cls(day, version, step, durations)
+        for doctor, rows in groupby(slots, key=itemgetter("doctor")):
+            rows = list(rows)
+            summary.total_slots[doctor] = len(rows)
+            summary.booked_slots[doctor] = sum(1 for r in rows if r["patient"])
+            summary.appointments.extend(
+                {k: r.get(k, "") for k in ("time", "patient", "duration", "patient_type", "doctor", "location")}
+                for r in rows if r["patient"] and r["duration"]
+            )
+            summary._free[doctor] = DayAvailability.from_slots(day, rows, step)
+            summary._count_starts(doctor)
+        summary.appointments.sort(key=itemgetter("time", "doctor"))
+        return summary
+
+    def _count_starts(self, doctor: str):
+        free = self._free[doctor]
+        self._starts[doctor] = {d: len(free.starts(d)) for d in self.durations}
+
+    @property
+    def booked(self) -> int:
+        """Appointments (not slots) booked on the day."""
+        return len(self.appointments)
+
+    @property
+    def has_schedule(self) -> bool:
+        return bool(self.total_slots)
+
+    def available(self, duration: int) -> int:
+        """Start times still bookable for ``duration`` across all doctors."""
+        return sum(starts.get(duration, 0) for starts in self._starts.values())
+
+    def utilization(self) -> Dict[str, float]:
+        """Booked share of each doctor's slots."""
+        return {d: self.booked_slots[d] / total for d, total in self.total_slots.items() if total}
+
+    def apply_booking(self, time: str, patient: str, duration: int, patient_type: str, doctor: str,
+                      location: str = ""):
+        """Account for one booking without re-reading the day: O(free intervals) for that doctor."""
+        if doctor in self._free:
+            self._free[doctor].take(to_minutes(time), duration)
+            self._count_starts(doctor)
+        self.booked_slots[doctor] = self.booked_slots.get(doctor, 0) + slots_needed(duration, self.step)
+        self.appointments.append({"time": time, "patient": patient, "duration": duration,
+                                  "patient_type": patient_type, "doctor": doctor, "location": location})
+        self.appointments.sort(key=itemgetter("time", "doctor"))
+
+
+class ScheduleSummary:
+    """Cache of ``DaySummary`` objects validated against the store's day versions."""
+
+    def __init__(self, store: ScheduleStore, step: int, durations: Sequence[int], max_days: int = 31):
+        self.store = store
+        self.step = step
+        self.durations = tuple(durations)
+        self.max_days = max_days
+        self._lock = threading.Lock()
+        self._days: "OrderedDict[str, DaySummary]" = OrderedDict()
+
+    def day(self, day_str: str) -> DaySummary:
+        version = self.store.day_version(day_str)
+        with self._lock:
+            cached = self._days.get(day_str)
+            if cached is not None and cached.version == version:
+                self._days.move_to_end(day_str)
+                return cached
+        # The version read above only picks the cache entry; the summary's own
+        # version must count exactly the bookings in its rows, or
+        # record_booking would apply one of them a second time.
+        version, rows = self.store.day_snapshot(day_str)
+        summary = DaySummary.build(day_str, version, rows, self.step, self.durations)
+        with self._lock:
+            self._days[day_str] = summary
+            self._days.move_to_end(day_str)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+        return summary
+
+    def record_booking(self, day_str: str, time: str, patient: str, duration: int, patient_type: str,
+                       doctor: str, location: str = ""):
+        """Fold a booking we just committed into the cached day, if nothing else changed it."""
+        version = self.store.day_version(day_str)
+        with self._lock:
+            cached = self._days.get(day_str)
+            if cached is None:
+                return
+            # Each claimed slot row bumps the version once.
+            if version == cached.version + slots_needed(duration, self.step):
+                cached.apply_booking(time, patient, duration, patient_type, doctor, location)
+                cached.version = version
+            else:
+                del self._days[day_str]
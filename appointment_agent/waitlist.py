@@ -0,0 +1,280 @@
+"""Live waitlist for slots freed by cancellations and reschedules.
+
+Patients who found no opening in their window can ask to be booked
+automatically if one frees up. Requests live in ``waitlist.db``, shared by
+every process, and each process indexes the waiting ones for backfill: one
+min-heap of ``(priority, added_at, id)`` per (day, duration, doctor), with a
+request pushed under every day of its window, and under doctor '' when any
+doctor will do. Offering a freed interval only looks at the heads of the
+heaps for that day, that doctor and the durations that fit; the rest of the
+list is never read.
+
+* ``best`` is the first request in priority order (lowest ``priority``, then
+  earliest added) that fits the interval;
+* ``take`` marks it booked in the database only if it is still waiting, so
+  two processes offering slots at once can't both book the same request;
+* heap entries of requests that were booked, withdrawn or handled by another
+  process are dropped when they reach the head, as are the entries left
+  over from before a request was restored and indexed again;
+* triggers stamp every inserted request and every status change with a
+  database-wide change counter (``changed_at``), so ``refresh`` picks up
+  requests other processes added, restored, booked or withdrew by reading
+  only the rows changed since its last call.
+
+``backfill`` fills a free run of one doctor's day from its start: the best
+request that fits is booked under a new appointment ID, and so on until
+nothing fits.
+"""
+import heapq
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from .availability import format_minutes, slot_times, slots_needed
+from .schedule_store import BookingStatus, ScheduleStore, new_appointment_id
+
+WAITING = "waiting"
+TAKEN = "booked"
+WITHDRAWN = "withdrawn"
+
+_COLUMNS = "id, name, dob, email, phone, patient_type, duration, first_day, last_day, doctor, priority, added_at"
+
+
+class WaitlistRequest(NamedTuple):
+    id: int
+    name: str
+    dob: str
+    email: str
+    phone: str
+    patient_type: str
+    duration: int
+    first_day: str
+    last_day: str
+    doctor: str  # '' for any doctor
+    priority: int  # lower goes first
+    added_at: float
+
+
+class Backfilled(NamedTuple):
+    request: WaitlistRequest
+    day: str
+    time: str
+    doctor: str
+    appointment_id: str
+
+
+class Waitlist:
+    def __init__(self, path: str, step: int, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.step = step
+        self.clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # entries are (priority, added_at, id, generation); a restored request is pushed again
+        # under a new generation and its older entries are skipped
+        self._heaps: Dict[Tuple[str, int, str], List[Tuple[int, float, int, int]]] = {}
+        self._requests: Dict[int, WaitlistRequest] = {}  # waiting, as far as this process knows
+        self._generations: Dict[int, int] = {}  # id -> generation of its live heap entries
+        self._durations: Set[int] = set()
+        self._synced = -1  # change counter seen by the last refresh; rows from before it have 0
+        self._today = ""
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS requests (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    dob TEXT NOT NULL,
+                    email TEXT NOT NULL DEFAULT '',
+                    phone TEXT NOT NULL DEFAULT '',
+                    patient_type TEXT NOT NULL,
+                    duration INTEGER NOT NULL,
+                    first_day TEXT NOT NULL,
+                    last_day TEXT NOT NULL,
+                    doctor TEXT NOT NULL DEFAULT '',
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    added_at REAL NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'waiting',
+                    appointment_id TEXT NOT NULL DEFAULT ''
+                )
+                """
+            )
+            if "changed_at" not in {r[1] for r in conn.execute("PRAGMA table_info(requests)")}:
+                conn.execute("ALTER TABLE requests ADD COLUMN changed_at INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_changed ON requests(changed_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS waitlist_version (id INTEGER PRIMARY KEY CHECK (id = 0), "
+                "version INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO waitlist_version (id, version) VALUES (0, 0)")
+            for event in ("INSERT", "UPDATE OF status"):
+                name = f"requests_{event.split()[0].lower()}_changed"
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                conn.execute(
+                    f"""
+                    CREATE TRIGGER {name} AFTER {event} ON requests
+                    BEGIN
+                        UPDATE waitlist_version SET version = version + 1;
+                        UPDATE requests SET changed_at = (SELECT version FROM waitlist_version) WHERE id = NEW.id;
+                    END
+                    """
+                )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def __len__(self):
+        return len(self._requests)
+
+    def add(self, name: str, dob: str, patient_type: str, duration: int, first_day: str, last_day: str,
+            doctor: str = "", email: str = "", phone: str = "", priority: int = 0) -> WaitlistRequest:
+        """Put a patient on the waitlist for ``[first_day, last_day]``."""
+        return self.add_many([dict(name=name, dob=dob, patient_type=patient_type, duration=duration,
+                                   first_day=first_day, last_day=last_day, doctor=doctor, email=email, phone=phone,
+                                   priority=priority)])[0]
+
+    def add_many(self, requests: Iterable[dict]) -> List[WaitlistRequest]:
+        """``add`` for many patients (dicts of its arguments) in one transaction."""
+        added_at = self.clock()
+        added = []
+        with self._transaction() as conn:
+            for r in requests:
+                values = (r["name"], r["dob"], r.get("email", ""), r.get("phone", ""), r["patient_type"],
+                          r["duration"], r["first_day"], r["last_day"], r.get("doctor", ""), r.get("priority", 0),
+                          added_at)
+                cur = conn.execute(
+                    "INSERT INTO requests (name, dob, email, phone, patient_type, duration, first_day, last_day, "
+                    "doctor, priority, added_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    values,
+                )
+                added.append(WaitlistRequest(cur.lastrowid, *values))
+        with self._lock:
+            for request in added:
+                self._index(request)
+        return added
+
+    def withdraw(self, request_id: int) -> bool:
+        """Take a waiting request off the list. False if it was already booked or withdrawn."""
+        with self._transaction() as conn:
+            cur = conn.execute("UPDATE requests SET status = ? WHERE id = ? AND status = ?",
+                               (WITHDRAWN, request_id, WAITING))
+        with self._lock:
+            self._requests.pop(request_id, None)
+        return cur.rowcount == 1
+
+    def refresh(self):
+        """Apply requests added or changed by any process since the last call; drop past days' heaps once a day."""
+        today = date.fromtimestamp(self.clock()).isoformat()
+        conn = self._conn()
+        # One read transaction so the counter and the rows agree.
+        conn.execute("BEGIN")
+        try:
+            version = conn.execute("SELECT version FROM waitlist_version").fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {_COLUMNS}, status FROM requests WHERE changed_at > ? AND last_day >= ? ORDER BY id",
+                (self._synced, today),
+            ).fetchall() if version > self._synced else []
+        finally:
+            conn.execute("COMMIT")
+        with self._lock:
+            for row in rows:
+                if row["status"] == WAITING:
+                    self._index(WaitlistRequest(*tuple(row)[:-1]))
+                else:
+                    self._requests.pop(row["id"], None)
+            self._synced = version
+            if today != self._today:
+                self._today = today
+                for key in [k for k in self._heaps if k[0] < today]:
+                    del self._heaps[key]
+                for request_id in [r.id for r in self._requests.values() if r.last_day < today]:
+                    del self._requests[request_id]
+                    self._generations.pop(request_id, None)
+
+    def _index(self, request: WaitlistRequest):
+        """Push ``request`` under each day of its window, unless it is indexed already."""
+        if request.id in self._requests:
+            return
+        self._requests[request.id] = request
+        self._durations.add(request.duration)
+        generation = self._generations[request.id] = self._generations.get(request.id, -1) + 1
+        entry = (request.priority, request.added_at, request.id, generation)
+        day = max(date.fromisoformat(request.first_day), date.fromtimestamp(self.clock()))
+        last = date.fromisoformat(request.last_day)
+        while day <= last:
+            heapq.heappush(self._heaps.setdefault((day.isoformat(), request.duration, request.doctor), []), entry)
+            day += timedelta(days=1)
+
+    def best(self, day: str, doctor: str, minutes: int) -> Optional[WaitlistRequest]:
+        """First request in priority order that takes ``doctor`` (or anyone) on ``day`` and fits in ``minutes``."""
+        with self._lock:
+            best = None
+            for duration in self._durations:
+                if slots_needed(duration, self.step) * self.step > minutes:
+                    continue
+                for who in {doctor, ""}:
+                    heap = self._heaps.get((day, duration, who))
+                    while heap and (heap[0][2] not in self._requests
+                                    or heap[0][3] != self._generations[heap[0][2]]):
+                        heapq.heappop(heap)
+                    if heap and (best is None or heap[0] < best):
+                        best = heap[0]
+            return self._requests[best[2]] if best else None
+
+    def take(self, request: WaitlistRequest, appointment_id: str) -> bool:
+        """Claim ``request`` for a booking. False if another process got to it first."""
+        with self._transaction() as conn:
+            cur = conn.execute("UPDATE requests SET status = ?, appointment_id = ? WHERE id = ? AND status = ?",
+                               (TAKEN, appointment_id, request.id, WAITING))
+        with self._lock:
+            self._requests.pop(request.id, None)
+        return cur.rowcount == 1
+
+    def restore(self, request: WaitlistRequest):
+        """Put back a request whose booking fell through."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE requests SET status = ?, appointment_id = '' WHERE id = ?", (WAITING, request.id))
+        with self._lock:
+            self._index(request)
+
+    def backfill(self, store: ScheduleStore, day: str, doctor: str, start: int, end: int) -> List[Backfilled]:
+        """Book waitlisted patients into ``doctor``'s free minutes ``[start, end)`` on ``day``, best first."""
+        self.refresh()
+        filled = []
+        while True:
+            request = self.best(day, doctor, end - start)
+            if request is None:
+                break
+            appointment_id = new_appointment_id()
+            if not self.take(request, appointment_id):
+                continue
+            times = slot_times(format_minutes(start), request.duration, self.step)
+            status = store.book(day, times, request.name, request.duration, request.patient_type, doctor,
+                                appointment_id)
+            if status != BookingStatus.BOOKED:  # someone booked into the gap meanwhile
+                self.restore(request)
+                break
+            filled.append(Backfilled(request, day, times[0], doctor, appointment_id))
+            start += slots_needed(request.duration, self.step) * self.step
+        return filled
@@ -0,0 +1,118 @@
+"""Doctor assignment: name-length hash vs. the load-aware ``DoctorAssigner``.
+
+Sets up ``--doctors`` doctors over ``--locations`` clinics and a
+``--days`` horizon in a scratch store. Then enough patients to fill
+``--load`` of the schedule each ask for a day, sooner days being more
+popular. A third of them are returning patients whose earlier visits are in
+the ledger. Each policy assigns a doctor, and
+the patient books that doctor's first free start on the day:
+
+* hash: ``DOCTORS[len(name) % len(DOCTORS)]``, as the doctor node used to;
+* assigner: ``DoctorAssigner.assign``, and ``colleague`` when the assigned
+  doctor's day is full.
+
+Reports how many requests found no slot on their day, the spread of utilization across
+doctors, how many returning patients saw their previous doctor, and the
+latency of an assignment.
+
+    python -m benchmarks.bench_assignment --doctors 6 --locations 3 --days 30 --load 0.8
+"""
+import argparse
+import os
+import random
+import tempfile
+import time as _time
+from datetime import date, time, timedelta
+
+from appointment_agent.assignment import DoctorAssigner
+from appointment_agent.availability import slot_times
+from appointment_agent.capacity import CapacityIndex
+from appointment_agent.horizon import ClinicCalendar, ScheduleHorizon
+from appointment_agent.ledger import AppointmentLedger
+from appointment_agent.metrics import quantile
+from appointment_agent.schedule_store import BookingStatus, open_schedule_store
+
+STEP = 30
+
+
+def run(policy: str, args, workdir: str) -> dict:
+    roster = {f"Dr. {i:02d}": f"Clinic {i % args.locations}" for i in range(args.doctors)}
+    doctors = list(roster)
+    store = open_schedule_store(os.path.join(workdir, f"{policy}.db"), os.path.join(workdir, "none.xlsx"))
+    horizon = ScheduleHorizon(store, ClinicCalendar(roster, (time(9), time(17)), STEP), args.days)
+    today = date.today()
+    horizon.ensure_range(today, args.days)
+    capacity = CapacityIndex(store, STEP)
+    ledger = AppointmentLedger(os.path.join(workdir, f"{policy}.jsonl"))
+    assigner = DoctorAssigner(capacity, ledger, roster)
+    last_day = (today + timedelta(days=args.days - 1)).isoformat()
+
+    rng = random.Random(args.seed)
+    # Mean visit: two thirds new (60 min), one third returning (30 min)
+    requests = int(args.load * args.doctors * args.days * (17 - 9) * 60 / 50)
+    weights = [1 / (1 + i / 5) for i in range(args.days)]
+    pool = [(f"Patient {'x' * rng.randrange(12)}{i}", f"19{rng.randrange(40, 99)}-01-01") for i in range(requests)]
+    returning, usual = [], {}
+    no_slot = kept = repeat = 0
+    latencies = []
+    for i in range(requests):
+        if returning and rng.random() < 1 / 3:
+            name, dob = rng.choice(returning)
+            duration = 30
+        else:
+            name, dob = pool[i]
+            duration = 60
+        day = (today + timedelta(days=rng.choices(range(args.days), weights)[0])).isoformat()
+        capacity.refresh()  # apply the previous booking outside the timed part
+        t0 = _time.perf_counter()
+        if policy == "hash":
+            doctor = doctors[len(name) % len(doctors)]
+        else:
+            doctor = assigner.assign(name, dob, duration, today.isoformat(), last_day).doctor
+        latencies.append(_time.perf_counter() - t0)
+        free = capacity.loads([doctor], duration, day, day)[0].first_day
+        if free is None and policy == "assigner":
+            doctor = assigner.colleague(doctor, duration, day) or doctor
+        if (name, dob) in usual:
+            repeat += 1
+            kept += usual[(name, dob)] == doctor
+        opening = capacity.earliest(day, day, duration, 1, doctor=doctor)
+        if not opening:
+            no_slot += 1
+            continue
+        _, start, _, _ = opening[0]
+        if store.book(day, slot_times(start, duration, STEP), name, duration, "New", doctor) != BookingStatus.BOOKED:
+            no_slot += 1
+            continue
+        ledger.append({"name": name, "dob": dob, "date": day, "time": start, "duration": duration, "doctor": doctor,
+                       "location": roster[doctor]})
+        usual[(name, dob)] = doctor
+        returning.append((name, dob))
+
+    loads = capacity.loads(doctors, STEP, today.isoformat(), last_day)
+    total = (17 - 9) * 60 * args.days
+    used = sorted(1 - l.free_minutes / total for l in loads)
+    latencies.sort()
+    return {"requests": requests, "no_slot": no_slot, "min_util": used[0], "max_util": used[-1], "kept": kept, "repeat": repeat,
+            "p50_us": quantile(latencies, 0.5) * 1e6, "p99_us": quantile(latencies, 0.99) * 1e6}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--doctors", type=int, default=6)
+    parser.add_argument("--locations", type=int, default=3)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--load", type=float, default=0.8, help="booking demand as a share of capacity")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp()
+    print(f"{'policy':>9} {'no slot':>12} {'util min':>9} {'util max':>9} {'same doctor':>12} {'p50 us':>8} {'p99 us':>8}")
+    for policy in ("hash", "assigner"):
+        r = run(policy, args, workdir)
+        print(f"{policy:>9} {r['no_slot']:>5}/{r['requests']:<6} {r['min_util']:>9.0%} {r['max_util']:>9.0%} "
+              f"{r['kept']:>5}/{r['repeat']:<6} {r['p50_us']:>8.0f} {r['p99_us']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Availability microbenchmarks on a 1-year x 3-doctor schedule.
+
+Compares the legacy per-slot DataFrame scan (``iterrows`` + a ``df_day``
+filter per needed sub-slot) with the interval engine in
+``appointment_agent.availability``.
+
+    python -m benchmarks.bench_availability --days 365 --doctors 3
+"""
+import argparse
+import random
+import time as _time
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
+
+from appointment_agent.availability import build_day_index, range_starts, to_minutes
+from appointment_agent.schedule_store import day_slot_rows
+
+SLOT_START = time(10, 0)
+SLOT_END = time(21, 0)
+SLOT_STEP_MIN = 30
+DURATIONS = (30, 45, 60, 90)
+
+
+def make_rows(days, doctors, fill, seed):
+    rng = random.Random(seed)
+    start = date(2030, 1, 1)
+    per_doctor = {}
+    for d in range(doctors):
+        doctor = f"Dr. {d}"
+        rows = []
+        for i in range(days):
+            for r in day_slot_rows((start + timedelta(days=i)).strftime("%Y-%m-%d"),
+                                   SLOT_START, SLOT_END, SLOT_STEP_MIN, doctor):
+                rows.append({"date": r[0], "time": r[1], "doctor": doctor,
+                             "patient": "x" if rng.random() < fill else ""})
+        per_doctor[doctor] = rows
+    return per_doctor
+
+
+def legacy_can_book_duration(df_day, start_time, duration_minutes):
+    start_dt = datetime.strptime(start_time, "%H:%M")
+    for i in range(duration_minutes // SLOT_STEP_MIN):
+        check_time = (start_dt + timedelta(minutes=i * SLOT_STEP_MIN)).strftime("%H:%M")
+        slot_row = df_day[df_day["time"] == check_time]
+        if slot_row.empty:
+            return False
+        patient_val = str(slot_row.iloc[0]["patient"]).strip()
+        if patient_val != "" and patient_val.lower() not in ("nan", "none"):
+            return False
+    return True
+
+
+def legacy_day(df_day, duration):
+    free_slots = df_day[df_day["patient"] == ""].sort_values("time")
+    return [row["time"] for _, row in free_slots.iterrows()
+            if legacy_can_book_duration(df_day, row["time"], duration)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--doctors", type=int, default=3)
+    parser.add_argument("--fill", type=float, default=0.4, help="fraction of slots already booked")
+    parser.add_argument("--legacy-days", type=int, default=20, help="day/doctor pairs to time on the legacy path")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    per_doctor = make_rows(args.days, args.doctors, args.fill, args.seed)
+    n_rows = sum(len(r) for r in per_doctor.values())
+    pairs = args.days * args.doctors
+    print(f"{n_rows} slot rows, {pairs} day/doctor pairs")
+
+    # Legacy: one DataFrame filter per day, one per sub-slot per candidate.
+    first = next(iter(per_doctor.values()))
+    df = pd.DataFrame(first)
+    days = sorted(df["date"].unique())[:args.legacy_days]
+    t0 = _time.perf_counter()
+    legacy = {}
+    for d in days:
+        legacy[d] = legacy_day(df[df["date"] == d].copy(), 60)
+    legacy_per_day = (_time.perf_counter() - t0) * 1000 / len(days)
+    print(f"legacy  60-min slots per day/doctor:      {legacy_per_day:9.3f} ms "
+          f"(~{legacy_per_day * pairs / 1000:.1f} s for the full year)")
+
+    t0 = _time.perf_counter()
+    indexes = {doc: build_day_index(rows, SLOT_STEP_MIN) for doc, rows in per_doctor.items()}
+    build_ms = (_time.perf_counter() - t0) * 1000
+    print(f"engine  build index (all pairs):          {build_ms:9.3f} ms ({build_ms * 1000 / pairs:.1f} us/pair)")
+
+    first_index = indexes[next(iter(per_doctor))]
+    for d in days:
+        assert first_index[d].start_times(60) == legacy[d], f"mismatch on {d}"
+
+    for duration in DURATIONS:
+        t0 = _time.perf_counter()
+        count = sum(1 for index in indexes.values() for _ in range_starts(index, duration))
+        ms = (_time.perf_counter() - t0) * 1000
+        print(f"engine  {duration:3d}-min starts, full year x doctors: {ms:9.3f} ms ({count} starts)")
+
+    rng = random.Random(args.seed)
+    queries = [(rng.choice(list(first_index)), to_minutes(rng.choice(["10:00", "12:30", "15:00", "20:30"])))
+               for _ in range(100_000)]
+    t0 = _time.perf_counter()
+    for d, m in queries:
+        first_index[d].can_book(m, 60)
+    us = (_time.perf_counter() - t0) * 1e6 / len(queries)
+    print(f"engine  can_book point query:             {us:9.3f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Batch waitlist scheduling vs. booking patients one at a time.
+
+Generates a seeded waitlist and books it into a fresh schedule twice: once
+with ``batch.schedule_waitlist`` (one read, one transaction) and once the way
+the chat flow does it, a day read and a ``book`` call per patient.
+
+    python -m benchmarks.bench_batch --patients 2000 --days 60
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time as _time
+from datetime import date, timedelta
+
+from appointment_agent.availability import DayAvailability, slot_times
+from appointment_agent.batch import read_waitlist, schedule_waitlist
+from appointment_agent.config import DOCTORS, SLOT_STEP_MIN
+from appointment_agent.engine import init_schedule_days
+from appointment_agent.schedule_store import BookingStatus, SQLiteScheduleStore
+
+
+def write_waitlist(path, n, start, days, seed):
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["name", "dob", "type", "preferred_dates", "doctor"])
+        for i in range(n):
+            prefs = ";".join(sorted({(start + timedelta(days=rng.randrange(days))).isoformat()
+                                     for _ in range(rng.randrange(3))}))
+            doctor = rng.choice(DOCTORS) if rng.random() < 0.3 else ""
+            kind = "new" if rng.random() < 0.4 else "recurring"
+            writer.writerow([f"Patient {i}", f"19{50 + i % 50}-01-{1 + i % 28:02d}", kind, prefs, doctor])
+
+
+def one_at_a_time(store, entries, start, days):
+    booked = 0
+    day_strs = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+    for e in entries:
+        done = False
+        for day in list(e.preferred_dates) + day_strs:
+            for doctor in [e.doctor] if e.doctor else DOCTORS:
+                avail = DayAvailability.from_slots(day, store.day_slots(day, doctor), SLOT_STEP_MIN)
+                first = avail.first_start(e.duration)
+                if first is None:
+                    continue
+                times = slot_times(f"{first // 60:02d}:{first % 60:02d}", e.duration, SLOT_STEP_MIN)
+                if store.book(day, times, e.name, e.duration, e.patient_type, doctor) == BookingStatus.BOOKED:
+                    booked += 1
+                    done = True
+                    break
+            if done:
+                break
+    return booked
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp()
+    start = date.today() + timedelta(days=1)
+    waitlist = os.path.join(tmp, "waitlist.csv")
+    write_waitlist(waitlist, args.patients, start, args.days, args.seed)
+    entries, _ = read_waitlist(waitlist)
+
+    store = SQLiteScheduleStore(os.path.join(tmp, "batch.db"))
+    init_schedule_days(start, args.days, store)
+    t0 = _time.perf_counter()
+    result = schedule_waitlist(store, entries, start, args.days)
+    batch_s = _time.perf_counter() - t0
+    print(f"batch:   {len(result.placed)} booked, {len(result.unplaced)} unplaced in {batch_s * 1000:.0f} ms")
+
+    store = SQLiteScheduleStore(os.path.join(tmp, "single.db"))
+    init_schedule_days(start, args.days, store)
+    t0 = _time.perf_counter()
+    booked = one_at_a_time(store, entries, start, args.days)
+    single_s = _time.perf_counter() - t0
+    print(f"single:  {booked} booked in {single_s * 1000:.0f} ms ({single_s / batch_s:.0f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
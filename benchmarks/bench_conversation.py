@@ -0,0 +1,231 @@
+"""End-to-end load test of the booking conversation.
+
+Generates seeded fixtures (``benchmarks.datagen``) in a temporary working
+directory, then runs ``--conversations`` complete chats through
+``build_graph()``/``run_turn`` on ``--sessions`` concurrent threads:
+greet (-> confirm_identity) -> doctor -> date -> slots -> book -> insurance -> finalize. About a
+third of the patients are new; the rest are picked from ``patients.csv``.
+Half the chats ask for "first available", the others a random day of the
+horizon and a random listed time; a slot lost to another session is retried
+from the times the agent suggests. Email/SMS go to stub senders that sleep
+``--notify-ms``.
+
+Per-node and per-turn latency come from ``metrics.METRICS``. Results are
+printed and, with ``--json``, written to a file; ``--compare`` checks them
+against an earlier file and exits 1 if bookings/sec or any node's p95 got
+worse by more than ``--tolerance``. Concurrent sessions contend for the
+GIL and SQLite locks, so compare runs made with ``--sessions 1`` when
+latency, not throughput, is the question.
+
+    python -m benchmarks.bench_conversation --patients 50000 --days 30 --sessions 8 --json run.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time as _time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pandas as pd
+
+from appointment_agent import engine
+from appointment_agent.metrics import METRICS
+from appointment_agent.notifications import Notifier
+from benchmarks.datagen import write_fixtures
+
+TIME_RE = re.compile(r"\b\d{2}:\d{2}\b")
+INSURANCE = "Insurance: Blue Cross, Member ID: 123456, Group Number: ABC123"
+
+
+class StubSender:
+    """Stands in for SMTP/Twilio: counts messages and sleeps like a network call."""
+
+    def __init__(self, delay_ms: float):
+        self.delay = delay_ms / 1000
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def send(self, recipient: str, subject: str, body: str):
+        _time.sleep(self.delay)
+        with self._lock:
+            self.sent += 1
+
+    def close(self):
+        pass
+
+
+def converse(graph, patient_line: str, rng: random.Random, first_available: bool, days: int):
+    """One chat to completion (or give-up). Returns (booked, turns)."""
+    state = engine.new_conversation()
+    turns = 0
+
+    def say(text):
+        nonlocal turns
+        turns += 1
+        return engine.run_turn(graph, state, text)
+
+    say(patient_line)
+    if state["current_node"] == "confirm_identity":  # a new patient close to a registered one
+        say("no")
+    say("ok")
+    if first_available:
+        say("first available")
+    else:
+        say((date.today() + timedelta(days=rng.randrange(days))).isoformat())
+        if state["current_node"] == "date":  # nothing left that day
+            say("first available")
+    if state["current_node"] != "book":
+        return False, turns
+    if state["offered_slots"]:
+        replies = say(str(rng.randint(1, len(state["offered_slots"]))))
+    else:
+        replies = say(rng.choice(TIME_RE.findall(state["conversation_history"][-1][1]) or ["10:00"]))
+    for _ in range(5):
+        if state["current_node"] != "book":
+            break
+        times = TIME_RE.findall(replies[-1] if replies else "")
+        if not times:
+            return False, turns
+        replies = say(rng.choice(times))
+    if state["current_node"] != "insurance":
+        return False, turns
+    say(INSURANCE)
+    return bool(state.get("completed")), turns
+
+
+def patient_lines(patients: pd.DataFrame, n: int, new_ratio: float, seed: int):
+    rng = random.Random(seed)
+    records = patients.to_dict("records")
+    lines = []
+    for i in range(n):
+        p = rng.choice(records)
+        if rng.random() < new_ratio:
+            # Born after every generated patient, so never found in the registry
+            dob = date(2016, 1, 1) + timedelta(days=rng.randrange(1500))
+            lines.append(f"Name: {p['name']}, DOB: {dob}, Email: new{i}@example.com, Phone: +1666{i:07d}")
+        else:
+            lines.append(f"Name: {p['name']}, DOB: {p['dob']}")
+    return lines
+
+
+def summarize(snapshot: dict, name: str, label: str) -> dict:
+    out = {}
+    for t in snapshot["timers"]:
+        if t["name"] == name:
+            out[t["labels"].get(label, "")] = {
+                "calls": t["calls"], "mean_ms": t["sum"] * 1000 / t["calls"],
+                **{q: t[q] * 1000 for q in ("p50", "p95", "p99")},
+            }
+    return out
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> bool:
+    """Print the change against ``baseline``; False if something regressed beyond ``tolerance``."""
+    ok = True
+    old, new = baseline["bookings_per_sec"], result["bookings_per_sec"]
+    flag = new < old * (1 - tolerance)
+    ok &= not flag
+    print(f"bookings/sec {old:.1f} -> {new:.1f}{'  REGRESSION' if flag else ''}")
+    for node, stats in sorted(result["nodes"].items()):
+        if node not in baseline["nodes"]:
+            continue
+        before = baseline["nodes"][node]["p95"]
+        flag = stats["p95"] > before * (1 + tolerance) and stats["p95"] - before > 0.05
+        ok &= not flag
+        print(f"{node:>10} p95 {before:8.2f} -> {stats['p95']:8.2f} ms{'  REGRESSION' if flag else ''}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=10000, help="rows in patients.csv")
+    parser.add_argument("--days", type=int, default=30, help="schedule horizon")
+    parser.add_argument("--fill", type=float, default=0.3, help="fraction of slots booked beforehand")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent conversations")
+    parser.add_argument("--conversations", type=int, default=300)
+    parser.add_argument("--new-ratio", type=float, default=0.3)
+    parser.add_argument("--notify-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--compare", help="results file of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    # Resolved now: the run changes into the fixture directory
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+
+    workdir = tempfile.mkdtemp()
+    t0 = _time.perf_counter()
+    write_fixtures(workdir, args.patients, date.today(), args.days, args.fill, args.seed)
+    print(f"fixtures: {args.patients} patients, {args.days} days in {_time.perf_counter() - t0:.1f} s")
+    patients = pd.read_csv(os.path.join(workdir, "patients.csv"), dtype=str)
+
+    # The engine's files are relative paths and its singletons are built on first use
+    os.chdir(workdir)
+    engine.SCHEDULE_HORIZON_DAYS = args.days
+    stub = StubSender(args.notify_ms)
+    engine.get_notifier = lambda: Notifier(stub, stub)
+    t0 = _time.perf_counter()
+    engine.bootstrap_storage(date.today())
+    engine.get_schedule_horizon().ensure_range(date.today(), args.days)
+    engine.get_capacity_index().refresh()
+    engine.get_patient_index().build_matcher()
+    print(f"warm-up (xlsx import, indexes): {_time.perf_counter() - t0:.1f} s")
+
+    graph = engine.build_graph()
+    lines = patient_lines(patients, args.conversations, args.new_ratio, args.seed)
+    METRICS.window = args.conversations * 10  # quantiles over the whole run
+    METRICS.reset()
+
+    def run(i):
+        rng = random.Random(args.seed * 1_000_003 + i)
+        return converse(graph, lines[i], rng, rng.random() < 0.5, args.days)
+
+    t0 = _time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        outcomes = list(pool.map(run, range(args.conversations)))
+    wall = _time.perf_counter() - t0
+    dispatcher = engine.get_notification_dispatcher()
+    dispatcher.stop(timeout=60)
+    while dispatcher.run_once():
+        pass
+
+    snap = METRICS.snapshot()
+    bookings = sum(booked for booked, _ in outcomes)
+    turns = sum(t for _, t in outcomes)
+    result = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+        "wall_seconds": wall,
+        "conversations": args.conversations,
+        "bookings": bookings,
+        "bookings_per_sec": bookings / wall,
+        "turns": turns,
+        "turns_per_sec": turns / wall,
+        "notifications_sent": stub.sent,
+        "turn": summarize(snap, "agent_turn_seconds", "node"),
+        "nodes": summarize(snap, "agent_node_seconds", "node"),
+        "storage": summarize(snap, "agent_storage_seconds", "op"),
+    }
+
+    print(f"{bookings}/{args.conversations} booked in {wall:.2f} s: {result['bookings_per_sec']:.1f} bookings/s, "
+          f"{result['turns_per_sec']:.0f} turns/s, {stub.sent} notifications")
+    for section in ("nodes", "storage"):
+        print(f"{section:>20} {'calls':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, s in sorted(result[section].items()):
+            print(f"{name:>20} {s['calls']:>7} {s['p50']:>8.2f} {s['p95']:>8.2f} {s['p99']:>8.2f}")
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+    if compare_path:
+        with open(compare_path, encoding="utf-8") as fh:
+            if not compare(result, json.load(fh), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
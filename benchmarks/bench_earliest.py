@@ -0,0 +1,72 @@
+"""Earliest-opening search: scanning the range's slots vs. the free-capacity index.
+
+Builds schedules of growing horizons where every day is full except the
+last few, then times a top-5 search for a 60-minute opening across all
+doctors: the scan reads every slot row of the range (``earliest_slots`` over
+``iter_slots``), the ``CapacityIndex`` bisects straight to days that fit.
+Also times a search right after a booking, which re-reads only that day.
+
+    python -m benchmarks.bench_earliest --horizons 30 90 365
+"""
+import argparse
+import os
+import tempfile
+import time as _time
+from datetime import date, timedelta
+
+from appointment_agent.availability import earliest_slots
+from appointment_agent.capacity import CapacityIndex
+from appointment_agent.config import DOCTOR_LOCATIONS, SLOT_END, SLOT_START, SLOT_STEP_MIN
+from appointment_agent.schedule_store import SQLiteScheduleStore, day_slot_rows
+
+
+def build(path, days, open_days):
+    """``days`` days for every doctor, all booked except the last ``open_days``."""
+    store = SQLiteScheduleStore(path)
+    start = date(2030, 1, 1)
+    rows = []
+    for i in range(days):
+        day_str = (start + timedelta(days=i)).isoformat()
+        booked = "x" if i < days - open_days else ""
+        for doctor, location in DOCTOR_LOCATIONS.items():
+            for r in day_slot_rows(day_str, SLOT_START, SLOT_END, SLOT_STEP_MIN, doctor, location):
+                rows.append((r[0], r[1], booked, r[3], r[4], r[5], r[6]))
+    store.add_slots(rows)
+    return store, start.isoformat(), (start + timedelta(days=days - 1)).isoformat()
+
+
+def timed(fn, repeat):
+    t0 = _time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (_time.perf_counter() - t0) * 1000 / repeat, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--horizons", type=int, nargs="+", default=[30, 90, 365])
+    parser.add_argument("--open-days", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp()
+    print(f"{'horizon':>8} {'scan ms':>9} {'index ms':>9} {'after booking ms':>17}")
+    for days in args.horizons:
+        store, first, last = build(os.path.join(tmp, f"h{days}.db"), days, args.open_days)
+        scan_ms, expected = timed(
+            lambda: earliest_slots(store.iter_slots(first, last), 60, SLOT_STEP_MIN, 5), args.repeat)
+        index = CapacityIndex(store, SLOT_STEP_MIN)
+        index.refresh()
+        index_ms, found = timed(lambda: index.earliest(first, last, 60, 5), args.repeat)
+        assert found == expected, (found, expected)
+
+        day, time_, doctor, _ = found[0]
+        store.book(day, [time_], "bench", 30, "Recurring", doctor)
+        t0 = _time.perf_counter()
+        index.earliest(first, last, 60, 5)
+        booked_ms = (_time.perf_counter() - t0) * 1000
+        print(f"{days:>8} {scan_ms:>9.2f} {index_ms:>9.3f} {booked_ms:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Live schedule size as the clinic runs for a year, with and without archiving.
+
+Simulates one process start per day: the old behaviour creates the next 7
+days and never removes any, the horizon rolls past days into the archive and
+creates days lazily as a 14-day earliest-openings search touches them.
+Reports live slot rows and the time of a full-table read (what exports and
+summaries over ``days()`` pay) at intervals.
+
+    python -m benchmarks.bench_horizon --days 365
+"""
+import argparse
+import os
+import tempfile
+import time as _time
+from datetime import date, timedelta
+
+from appointment_agent.availability import earliest_slots
+from appointment_agent.config import SLOT_STEP_MIN
+from appointment_agent.engine import clinic_calendar
+from appointment_agent.horizon import ScheduleHorizon
+from appointment_agent.schedule_store import SQLiteScheduleStore
+
+
+def live_rows(store):
+    return store._conn().execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--look-ahead", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp()
+    calendar = clinic_calendar()
+    grow = ScheduleHorizon(SQLiteScheduleStore(os.path.join(tmp, "grow.db")), calendar, args.look_ahead)
+    rolling = ScheduleHorizon(SQLiteScheduleStore(os.path.join(tmp, "rolling.db")), calendar, args.look_ahead)
+    start = date(2030, 1, 1)
+    print(f"{'day':>5} {'rows (no archive)':>18} {'scan ms':>8} {'rows (horizon)':>15} {'scan ms':>8}")
+    for i in range(args.days):
+        today = start + timedelta(days=i)
+        grow.generate(today + timedelta(days=k) for k in range(7))
+        rolling.roll(today)
+        rolling.ensure_range(today, 14, today)
+        earliest_slots(rolling.store.iter_slots(today.isoformat(), (today + timedelta(days=13)).isoformat()),
+                       60, SLOT_STEP_MIN, 5)
+        if (i + 1) % max(1, args.days // 6) == 0 or i + 1 == args.days:
+            cols = [i + 1]
+            for h in (grow, rolling):
+                t0 = _time.perf_counter()
+                h.store.to_dataframe()
+                cols += [live_rows(h.store), (_time.perf_counter() - t0) * 1000]
+            print(f"{cols[0]:>5} {cols[1]:>18} {cols[2]:>8.1f} {cols[3]:>15} {cols[4]:>8.1f}")
+    archived = rolling.store._conn().execute("SELECT COUNT(*) FROM slots_archive").fetchone()[0]
+    print(f"archive holds {archived} rows; export with archive: {len(rolling.store.to_dataframe(include_archive=True))} rows")
+
+
+if __name__ == "__main__":
+    main()
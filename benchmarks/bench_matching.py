@@ -0,0 +1,153 @@
+"""Fuzzy returning-patient lookup: linear scan vs. the blocked ``PatientMatcher``.
+
+Builds a registry of ``--patients`` (``benchmarks.datagen``), with surnames
+drawn from ``--surnames`` made-up ones (datagen's 40 give every birth date
+dozens of namesakes, far more than a real registry), and queries it
+with registered patients as they might type themselves: a typo in the first
+name, the middle initial left out, day and month swapped, one DOB digit
+wrong, surname first. Reports load and index build time, lookup latency,
+how often the right patient is the top match, and how often a patient who
+is *not* registered (a first name from the list, a registered surname and
+a random registered DOB) would be asked "is that you?".
+
+The linear scan scores every record with the same similarity function and
+runs on ``--linear-sample`` queries only.
+
+    python -m benchmarks.bench_matching --patients 1000000 --queries 5000
+"""
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time as _time
+from datetime import date
+
+import numpy as np
+
+from appointment_agent.config import PATIENT_MATCH_THRESHOLD
+from appointment_agent.matching import name_similarity, name_tokens
+from appointment_agent.metrics import quantile
+from appointment_agent.patient_index import PatientIndex
+from benchmarks.datagen import FIRST_NAMES, make_patients
+
+SYLLABLES = ["an", "ber", "cas", "dor", "el", "fen", "gar", "hal", "is", "jor", "ka", "lin", "mar", "nov", "or",
+             "pet", "quin", "ros", "sal", "tor", "ul", "van", "wes", "yar", "zel", "bro", "cki", "dahl", "ski", "ton"]
+
+
+def with_surnames(df, surnames: int, seed: int):
+    """``df`` with each surname replaced by one of ``surnames`` syllable names; (name, dob) kept unique."""
+    pool = ["".join(p).capitalize() for n in (2, 3) for p in itertools.product(SYLLABLES, repeat=n)]
+    rng = np.random.default_rng(seed)
+    pool = np.array(pool)[rng.permutation(len(pool))[:surnames]]
+    parts = df["name"].str.rsplit(" ", n=1, expand=True)
+    df = df.assign(name=parts[0] + " " + pool[rng.integers(0, len(pool), len(df))])
+    return df.drop_duplicates(["name", "dob"]).reset_index(drop=True)
+
+
+def typo(word: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(word) - 1) if len(word) > 2 else 0
+    if rng.random() < 0.5:
+        return word[:i] + word[i + 1:]
+    return word[:i] + word[i + 1:i + 2] + word[i] + word[i + 2:]
+
+
+def perturb(record: dict, kind: str, rng: random.Random):
+    first, middle, last = record["name"].split(" ")
+    y, m, d = record["dob"].split("-")
+    name, dob = record["name"], record["dob"]
+    if kind == "first name typo":
+        name = f"{typo(first, rng)} {last}"
+    elif kind == "no middle initial":
+        name = f"{first} {last}"
+    elif kind == "day/month swapped":
+        dob = f"{y}-{d}-{m}"
+    elif kind == "dob digit":
+        i = rng.choice([3, 6, 9])  # last digit of the year, month or day
+        dob = dob[:i] + str((int(dob[i]) + 1) % 10) + dob[i + 1:]
+    elif kind == "surname first":
+        name = f"{last}, {first}"
+    try:
+        dob = date.fromisoformat(dob).isoformat()
+    except ValueError:
+        return None
+    return name, dob
+
+
+def linear_scan(records, name: str, dob: str):
+    tokens = name_tokens(name)
+    best, best_score = None, 0.0
+    for record in records:
+        score = name_similarity(tokens, name_tokens(record["name"]))
+        if record["dob"] != dob:
+            score *= 0.9
+        if score > best_score:
+            best, best_score = record, score
+    return best if best_score >= PATIENT_MATCH_THRESHOLD else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=200_000)
+    parser.add_argument("--surnames", type=int, default=20_000, help="distinct surnames; 0 keeps datagen's 40")
+    parser.add_argument("--queries", type=int, default=2000, help="per perturbation")
+    parser.add_argument("--linear-sample", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    t0 = _time.perf_counter()
+    df = make_patients(args.patients, args.seed)
+    if args.surnames:
+        df = with_surnames(df, args.surnames, args.seed)
+    path = os.path.join(tempfile.mkdtemp(), "patients.csv")
+    df.to_csv(path, index=False)
+    print(f"generated {len(df)} patients in {_time.perf_counter() - t0:.1f} s")
+    records = df.to_dict("records")
+
+    t0 = _time.perf_counter()
+    index = PatientIndex(path)
+    print(f"PatientIndex load: {_time.perf_counter() - t0:.1f} s")
+    t0 = _time.perf_counter()
+    index.match("warm up", "2000-01-01")
+    print(f"matcher build (first match): {_time.perf_counter() - t0:.1f} s")
+
+    rng = random.Random(args.seed)
+    kinds = ["first name typo", "no middle initial", "day/month swapped", "dob digit", "surname first"]
+    print(f"{'query':>20} {'n':>6} {'top-1':>7} {'p50 us':>8} {'p99 us':>8}")
+    for kind in kinds:
+        latencies, hits, n = [], 0, 0
+        while n < args.queries:
+            record = rng.choice(records)
+            query = perturb(record, kind, rng)
+            if query is None or index.get(*query) is not None:
+                continue
+            t0 = _time.perf_counter()
+            matches = index.match(*query, limit=1)
+            latencies.append(_time.perf_counter() - t0)
+            hits += bool(matches) and matches[0].record["name"] == record["name"]
+            n += 1
+        latencies.sort()
+        print(f"{kind:>20} {n:>6} {hits / n:>7.1%} {quantile(latencies, 0.5) * 1e6:>8.0f} "
+              f"{quantile(latencies, 0.99) * 1e6:>8.0f}")
+
+    prompted, latencies = 0, []
+    for _ in range(args.queries):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(records)['name'].split(' ')[-1]}"
+        dob = rng.choice(records)["dob"]
+        t0 = _time.perf_counter()
+        prompted += bool(index.match(name, dob, limit=1))
+        latencies.append(_time.perf_counter() - t0)
+    latencies.sort()
+    print(f"{'not registered':>20} {args.queries:>6} {'':>7} {quantile(latencies, 0.5) * 1e6:>8.0f} "
+          f"{quantile(latencies, 0.99) * 1e6:>8.0f}  ({prompted / args.queries:.1%} would be asked to confirm)")
+
+    t0 = _time.perf_counter()
+    for record in records[:args.linear_sample]:
+        first, _, last = record["name"].split(" ")
+        linear_scan(records, f"{typo(first, rng)} {last}", record["dob"])
+    per_query = (_time.perf_counter() - t0) / max(1, args.linear_sample)
+    print(f"{'linear scan':>20} {args.linear_sample:>6} {'':>7} {per_query * 1e6:>8.0f} {'':>8}")
+
+
+if __name__ == "__main__":
+    main()
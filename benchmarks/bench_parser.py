@@ -0,0 +1,82 @@
+"""Parser accuracy and throughput: legacy per-field regexes vs. ``appointment_agent.parsing``.
+
+Both parsers run over ``tests/parser_corpus.py``, the corpus
+``tests/test_parsing.py`` checks the new parser against. Reports how many
+messages each gets right, then messages per second for each and the ratio.
+
+The legacy regexes are the faster of the two, about twice as fast: they run
+one search per field and return the raw match. The new parser also
+normalizes what it finds (ISO DOBs from several formats, phone digits,
+validated emails) and reports missing fields and issues.
+
+    python -m benchmarks.bench_parser --repeat 2000
+"""
+import argparse
+import re
+import time as _time
+
+from appointment_agent.parsing import parse_insurance, parse_patient
+from tests.parser_corpus import INSURANCE_CORPUS, PATIENT_CORPUS
+
+
+def legacy_parse_patient_text(text):
+    name_match = re.search(r"name[:\-]?\s*([A-Za-z][A-Za-z\s.'-]+)", text, re.IGNORECASE)
+    dob_match = re.search(r"(\d{4}-\d{2}-\d{2})|(\d{2}-\d{2}-\d{4})|(\d{1,2}[/-]\d{1,2}[/-]\d{4})", text)
+    email_match = re.search(r"email[:\-]?\s*([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})", text, re.IGNORECASE)
+    phone_match = re.search(r"phone[:\-]?\s*([+]?[\d\-\(\)\s]{10,15})", text, re.IGNORECASE)
+    return {
+        "name": name_match.group(1).strip() if name_match else "",
+        "dob": dob_match.group(0) if dob_match else "",
+        "email": email_match.group(1).strip() if email_match else "",
+        "phone": phone_match.group(1).strip() if phone_match else "",
+    }
+
+
+def legacy_parse_insurance_text(text):
+    def grab(field):
+        m = re.search(fr"{field}[:\-]?\s*([A-Za-z0-9\-\s]+)", text, re.IGNORECASE)
+        return m.group(1).strip() if m and m.group(1) else ""
+    return {
+        "insurance_carrier": grab("carrier|insurance"),
+        "member_id": grab(r"member[_\s]?id"),
+        "group_number": grab(r"group[_\s]?number"),
+    }
+
+
+def count_correct(parser, corpus):
+    ok = 0
+    for text, expected, _ in corpus:
+        result = parser(text)
+        ok += all(result.get(k, "") == v for k, v in expected.items())
+    return ok
+
+
+def throughput(fn, texts, repeat):
+    t0 = _time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return repeat * len(texts) / (_time.perf_counter() - t0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    total = len(PATIENT_CORPUS) + len(INSURANCE_CORPUS)
+    new_ok = count_correct(lambda t: parse_patient(t).fields, PATIENT_CORPUS) \
+        + count_correct(lambda t: parse_insurance(t).fields, INSURANCE_CORPUS)
+    legacy_ok = (count_correct(legacy_parse_patient_text, PATIENT_CORPUS)
+                 + count_correct(legacy_parse_insurance_text, INSURANCE_CORPUS))
+    print(f"corpus: new parser {new_ok}/{total} correct, legacy {legacy_ok}/{total}")
+
+    for label, corpus, legacy, new in (("patient", PATIENT_CORPUS, legacy_parse_patient_text, parse_patient),
+                                       ("insurance", INSURANCE_CORPUS, legacy_parse_insurance_text, parse_insurance)):
+        texts = [t for t, _, _ in corpus]
+        old_rate, new_rate = throughput(legacy, texts, args.repeat), throughput(new, texts, args.repeat)
+        print(f"{label + ':':<10} legacy {old_rate:9.0f} msg/s, new {new_rate:9.0f} msg/s ({new_rate / old_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Merging an external patient export: one row at a time vs. the bulk importer.
+
+Builds a registry of ``--registry`` patients and an export of ``--rows``
+rows in the shape clinics send them: separate first/last name columns,
+US-style dates for a third of the rows, stray whitespace, about
+``--overlap`` of the rows already registered (some with a different phone)
+and a few rows with no usable DOB. Then merges the export:
+
+* row by row, as ``save_patient_if_new`` does (index lookup, then an
+  fsync'd CSV append per new patient), on the first ``--row-sample`` rows;
+* with ``patient_import.import_patients`` for each ``--workers`` count.
+
+    python -m benchmarks.bench_patient_import --registry 200000 --rows 1000000 --workers 1 4
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time as _time
+
+import pandas as pd
+
+from appointment_agent.ledger import append_csv_row
+from appointment_agent.parsing import normalize_dob, normalize_name, normalize_phone
+from appointment_agent.patient_import import import_patients
+from appointment_agent.patient_index import PATIENT_COLUMNS, PatientIndex
+from benchmarks.datagen import make_patients
+
+
+def make_export(registry: pd.DataFrame, rows: int, overlap: float, seed: int) -> pd.DataFrame:
+    rng = random.Random(seed)
+    fresh = make_patients(rows, seed + 1)
+    known = registry.sample(n=min(len(registry), int(rows * overlap)), random_state=seed)
+    df = pd.concat([known, fresh.head(rows - len(known))], ignore_index=True).sample(frac=1, random_state=seed)
+    first, last, dob, phone = [], [], [], []
+    for name, d, p in zip(df["name"], df["dob"], df["phone"]):
+        given, _, family = name.rpartition(" ")
+        first.append(f"  {given}" if rng.random() < 0.1 else given)
+        last.append(family)
+        r = rng.random()
+        if r < 0.01:
+            dob.append("unknown")
+        elif r < 0.35:
+            y, m, day = d.split("-")
+            dob.append(f"{m}/{day}/{y}")
+        else:
+            dob.append(d)
+        phone.append(f"+1555{rng.randrange(10 ** 7):07d}" if rng.random() < 0.02 else p)
+    return pd.DataFrame({"First Name": first, "Last Name": last, "Date of Birth": dob,
+                         "Email": df["email"].tolist(), "Phone": phone})
+
+
+def row_by_row(registry_path: str, export: pd.DataFrame) -> int:
+    index = PatientIndex(registry_path)
+    added = 0
+    for rec in export.to_dict("records"):
+        patient = {"name": normalize_name(f"{rec['First Name']} {rec['Last Name']}"),
+                   "dob": normalize_dob(rec["Date of Birth"])[0], "email": rec["Email"],
+                   "phone": normalize_phone(rec["Phone"])}
+        if patient["name"] and patient["dob"] and index.get(patient["name"], patient["dob"]) is None:
+            append_csv_row(registry_path, PATIENT_COLUMNS, patient)
+            index.add(patient)
+            added += 1
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--registry", type=int, default=100_000)
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--overlap", type=float, default=0.3)
+    parser.add_argument("--row-sample", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp()
+    registry = make_patients(args.registry, args.seed)
+    base = os.path.join(tmp, "registry.csv")
+    registry.to_csv(base, index=False)
+    export = make_export(registry, args.rows, args.overlap, args.seed)
+    export_path = os.path.join(tmp, "export.csv")
+    export.to_csv(export_path, index=False)
+    print(f"registry {args.registry} rows, export {len(export)} rows ({os.path.getsize(export_path) / 1e6:.0f} MB)")
+
+    path = os.path.join(tmp, "row_by_row.csv")
+    shutil.copyfile(base, path)
+    sample = export.head(args.row_sample)
+    t0 = _time.perf_counter()
+    added = row_by_row(path, sample)
+    rate = len(sample) / (_time.perf_counter() - t0)
+    print(f"{'row by row':>14}: {rate:>10,.0f} rows/s ({added} of {len(sample)} sampled rows added; "
+          f"~{len(export) / rate:,.0f} s for the export)")
+
+    for workers in args.workers:
+        path = os.path.join(tmp, f"bulk{workers}.csv")
+        shutil.copyfile(base, path)
+        t0 = _time.perf_counter()
+        result = import_patients([export_path], path, workers, args.chunk_rows, os.path.join(tmp, "conflicts.csv"))
+        elapsed = _time.perf_counter() - t0
+        print(f"{f'bulk x{workers}':>14}: {result.rows / elapsed:>10,.0f} rows/s ({elapsed:.1f} s; {result.added} added, "
+              f"{result.duplicates} duplicates, {result.conflicts} conflicts, {result.invalid} invalid)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Reminder scheduler at scale: rebuild, per-tick cost and restart dedupe.
+
+Writes a synthetic ledger of upcoming appointments, rebuilds the heap from it,
+then advances a fake clock through the next day firing due reminders. A second
+scheduler over the same ledger and queue checks that a restart queues nothing
+twice.
+
+    python -m benchmarks.bench_reminders --appointments 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time as _time
+from datetime import datetime, timedelta
+
+from appointment_agent.ledger import FINAL_COLUMNS, AppointmentLedger
+from appointment_agent.notifications import NotificationQueue
+from appointment_agent.reminders import ReminderScheduler
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def write_ledger(path, n, start, days=30):
+    """``n`` appointments spread evenly over the next ``days`` days."""
+    with open(path, "w", encoding="utf-8") as fh:
+        for i in range(n):
+            when = start + timedelta(minutes=(i * days * 24 * 60 // n) // 30 * 30)
+            rec = {c: "" for c in FINAL_COLUMNS}
+            rec.update(name=f"Patient {i}", dob="1990-01-01", email=f"p{i}@example.com", phone=f"+1555{i:07d}",
+                       date=when.strftime("%Y-%m-%d"), time=when.strftime("%H:%M"), doctor="Dr. Smith")
+            fh.write(json.dumps(rec) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--appointments", type=int, default=100_000)
+    parser.add_argument("--tick-minutes", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp()
+    ledger_path, queue_path = os.path.join(tmp, "final.jsonl"), os.path.join(tmp, "notifications.db")
+    start = datetime.now().replace(second=0, microsecond=0) + timedelta(hours=12)
+    write_ledger(ledger_path, args.appointments, start)
+    clock = FakeClock(_time.time())
+    queue = NotificationQueue(queue_path, clock=clock)
+
+    scheduler = ReminderScheduler(AppointmentLedger(ledger_path), queue, clock=clock)
+    t0 = _time.perf_counter()
+    pending = scheduler.rebuild()
+    print(f"first rebuild (parses the journal, writes the snapshot): {pending} reminders from "
+          f"{args.appointments} appointments in "
+          f"{(_time.perf_counter() - t0) * 1000:.0f} ms")
+
+    ticks, queued, tick_s = 0, 0, 0.0
+    end = clock.now + 24 * 3600
+    while clock.now < end:
+        clock.now += args.tick_minutes * 60
+        t0 = _time.perf_counter()
+        queued += scheduler.run_due()
+        tick_s += _time.perf_counter() - t0
+        ticks += 1
+    print(f"24h of {args.tick_minutes}-min ticks: {ticks} ticks, {queued} jobs queued, "
+          f"{tick_s / ticks * 1000:.2f} ms per tick, {len(scheduler)} reminders left")
+
+    restarted = ReminderScheduler(AppointmentLedger(ledger_path), queue, clock=clock, grace_seconds=24 * 3600)
+    t0 = _time.perf_counter()
+    restarted.rebuild()
+    print(f"restart rebuild from the columnar snapshot: {(_time.perf_counter() - t0) * 1000:.0f} ms")
+    duplicates = restarted.run_due()
+    print(f"restart over the same day: {duplicates} duplicate jobs queued (expect 0)")
+
+
+if __name__ == "__main__":
+    main()
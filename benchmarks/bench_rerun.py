@@ -0,0 +1,114 @@
+"""Streamlit rerun latency: legacy xlsx startup vs. the cached SQLite path.
+
+"before" replays what every rerun used to do: ``ensure_files()`` rewriting
+``schedule.xlsx`` plus seven ``init_day_schedule`` calls, each a full read and
+write of the workbook. "after" measures the new ``bootstrap_storage`` work on
+a cold process and on a rerun that bypasses ``st.cache_resource`` (a real
+rerun is a cache hit and does no storage work at all).
+
+    python -m benchmarks.bench_rerun --history-days 90 --repeat 5
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time as _time
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
+
+from appointment_agent.schedule_store import SQLiteScheduleStore, day_slot_rows, open_schedule_store
+
+SLOT_START = time(10, 0)
+SLOT_END = time(21, 0)
+SLOT_STEP_MIN = 30
+
+
+def legacy_ensure_files(path):
+    df = pd.read_excel(path, dtype={"time": str, "date": str})
+    if not df.empty:
+        df["time"] = df["time"].astype(str).str.strip().str.extract(r"(\d{1,2}:\d{2})")[0]
+        df.to_excel(path, index=False)
+
+
+def legacy_init_day_schedule(path, day):
+    df = pd.read_excel(path)
+    day_str = day.strftime("%Y-%m-%d")
+    if not (df["date"] == day_str).any():
+        rows = day_slot_rows(day_str, SLOT_START, SLOT_END, SLOT_STEP_MIN)
+        new_rows = pd.DataFrame([r[:5] for r in rows], columns=["date", "time", "patient", "duration", "patient_type"])
+        df = pd.concat([df, new_rows], ignore_index=True)
+    df["time"] = df["time"].astype(str).str.strip().str.extract(r"(\d{1,2}:\d{2})")[0]
+    df.to_excel(path, index=False)
+
+
+def legacy_rerun(path, today):
+    legacy_ensure_files(path)
+    for i in range(7):
+        legacy_init_day_schedule(path, today + timedelta(days=i))
+
+
+def init_schedule_days(store, start, days):
+    wanted = [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+    missing = store.missing_days(wanted)
+    if missing:
+        store.add_slots(row for d in missing for row in day_slot_rows(d, SLOT_START, SLOT_END, SLOT_STEP_MIN))
+
+
+def make_history(path, today, history_days):
+    rows = []
+    for i in range(-history_days, 7):
+        rows.extend(r[:5] for r in day_slot_rows((today + timedelta(days=i)).strftime("%Y-%m-%d"),
+                                                 SLOT_START, SLOT_END, SLOT_STEP_MIN))
+    pd.DataFrame(rows, columns=["date", "time", "patient", "duration", "patient_type"]).to_excel(path, index=False)
+    return len(rows)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = _time.perf_counter()
+        fn()
+        samples.append((_time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history-days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    today = date.today()
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx = os.path.join(tmp, "schedule.xlsx")
+        n_rows = make_history(xlsx, today, args.history_days)
+
+        before = timed(lambda: legacy_rerun(xlsx, today), args.repeat)
+
+        db = os.path.join(tmp, "schedule.db")
+        t0 = _time.perf_counter()
+        store = open_schedule_store(db, xlsx)
+        migrate = (_time.perf_counter() - t0) * 1000
+        store.close()
+
+        def cold():
+            s = SQLiteScheduleStore(db)
+            init_schedule_days(s, today, 7)
+            s.close()
+
+        cold_ms = timed(cold, args.repeat)
+        store = SQLiteScheduleStore(db)
+        warm_ms = timed(lambda: init_schedule_days(store, today, 7), args.repeat * 20)
+        store.close()
+
+    print(f"schedule rows: {n_rows}")
+    print(f"before  (xlsx, every rerun):          {before:9.2f} ms")
+    print(f"after   one-time xlsx -> db import:   {migrate:9.2f} ms")
+    print(f"after   cold process bootstrap:       {cold_ms:9.2f} ms")
+    print(f"after   uncached rerun bootstrap:     {warm_ms:9.2f} ms")
+    print("after   cached rerun (st.cache_resource hit): ~0 ms")
+
+
+if __name__ == "__main__":
+    main()
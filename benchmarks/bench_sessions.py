@@ -0,0 +1,62 @@
+"""Session checkpoints: full state dump per turn vs. field/message deltas.
+
+Runs one conversation of ``--turns`` turns through the engine and checkpoints
+after each. The old store wrote the whole state, history included, as one
+JSON blob; the delta store writes the changed top-level fields and the new
+messages. Reports bytes per checkpoint at the end of the conversation and
+the time to resume it with the last page of history vs. all of it.
+
+    python -m benchmarks.bench_sessions --turns 500
+"""
+import argparse
+import json
+import os
+import tempfile
+import time as _time
+
+from appointment_agent.engine import build_graph, new_conversation, run_turn
+from appointment_agent.sessions import HISTORY, SQLiteSessionStore, checkpoint_delta, encode_fields
+
+
+def full_dump_bytes(state):
+    fields = encode_fields(state)
+    fields[HISTORY] = json.dumps(state[HISTORY])
+    return sum(len(v) for v in fields.values())
+
+
+def delta_bytes(state):
+    changed, removed, _, messages = checkpoint_delta(state)
+    return sum(len(v) for v in changed.values()) + sum(len(s) + len(t) for s, t in messages) + len(removed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--page", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    store = SQLiteSessionStore(os.path.join(tempfile.mkdtemp(), "sessions.db"))
+    graph = build_graph()
+    state = new_conversation()
+    session_id = store.create(state)
+    version = 1
+    full = delta = 0
+    t0 = _time.perf_counter()
+    for i in range(args.turns):
+        # Invalid greet input: the node stays put and each turn adds two messages
+        run_turn(graph, state, f"hello {i}")
+        full, delta = full_dump_bytes(state), delta_bytes(state)
+        version = store.save(session_id, state, version)
+    save_ms = (_time.perf_counter() - t0) * 1000 / args.turns
+
+    print(f"history: {len(state[HISTORY])} messages, {save_ms:.2f} ms per checkpoint")
+    print(f"last checkpoint: full dump {full} bytes, delta {delta} bytes")
+    for label, history in (("page", args.page), ("all", None)):
+        t0 = _time.perf_counter()
+        loaded, _ = store.load(session_id, history=history)
+        ms = (_time.perf_counter() - t0) * 1000
+        print(f"resume ({label}): {len(loaded[HISTORY])} messages in {ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""String slot rows vs. the typed ``SlotTable``: memory per row and availability build time.
+
+Rows look like ``ScheduleStore.iter_slots`` output (every column a string
+except duration). Compares a string DataFrame of them with ``SlotTable``,
+and the per-row ``DayAvailability.from_slots`` build with the table's single
+vectorized pass, checking both give the same free intervals; then the same
+from a SQLite store, where ``slot_table`` has SQLite compute the integers.
+
+    python -m benchmarks.bench_slot_table --days 365 --doctors 10
+"""
+import argparse
+import os
+import random
+import tempfile
+import time as _time
+from datetime import date, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+import pandas as pd
+
+from appointment_agent.availability import DayAvailability
+from appointment_agent.config import SLOT_END, SLOT_START, SLOT_STEP_MIN
+from appointment_agent.schedule_store import SCHEDULE_COLUMNS, SQLiteScheduleStore, day_slot_rows
+from appointment_agent.slot_table import SlotTable
+
+
+def make_rows(days, doctors, fill, seed):
+    """Rows ordered by (date, doctor, time), ``fill`` of them booked by distinct patients."""
+    rng = random.Random(seed)
+    start = date(2030, 1, 1)
+    rows = []
+    for i in range(days):
+        day_str = (start + timedelta(days=i)).strftime("%Y-%m-%d")
+        for d in range(doctors):
+            for r in day_slot_rows(day_str, SLOT_START, SLOT_END, SLOT_STEP_MIN, f"Dr. {d}", f"Clinic {d % 3}"):
+                row = dict(zip(("date", "time", "patient", "duration", "patient_type", "doctor", "location"), r))
+                if rng.random() < fill:
+                    row.update(patient=f"Patient {rng.randrange(days * 20)}", patient_type=rng.choice(["New", "Recurring"]))
+                rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--doctors", type=int, default=10)
+    parser.add_argument("--fill", type=float, default=0.4, help="fraction of slots already booked")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rows = make_rows(args.days, args.doctors, args.fill, args.seed)
+    print(f"{len(rows)} slot rows, {args.days * args.doctors} day/doctor pairs")
+
+    df = pd.DataFrame(rows, columns=SCHEDULE_COLUMNS)
+    df_bytes = df.memory_usage(deep=True).sum()
+    t0 = _time.perf_counter()
+    table = SlotTable.from_rows(rows)
+    ingest_ms = (_time.perf_counter() - t0) * 1000
+    interned = sum(len(s) + 49 for i in (table.patients, table.doctors, table.locations) for s in i.labels)
+    print(f"string DataFrame:   {df_bytes / len(rows):7.1f} bytes/row ({df_bytes / 2 ** 20:.1f} MiB)")
+    print(f"SlotTable columns:  {table.nbytes / len(rows):7.1f} bytes/row ({table.nbytes / 2 ** 20:.1f} MiB, "
+          f"+{interned / 2 ** 20:.1f} MiB interned strings); ingest {ingest_ms:.0f} ms")
+
+    t0 = _time.perf_counter()
+    legacy = {(doctor, day): DayAvailability.from_slots(day, list(group), SLOT_STEP_MIN)
+              for (day, doctor), group in groupby(rows, key=itemgetter("date", "doctor"))}
+    legacy_ms = (_time.perf_counter() - t0) * 1000
+    t0 = _time.perf_counter()
+    typed = table.availability(SLOT_STEP_MIN)
+    typed_ms = (_time.perf_counter() - t0) * 1000
+    assert legacy.keys() == typed.keys() and all(legacy[k].free == typed[k].free for k in legacy), "mismatch"
+    print(f"availability, per-row strings: {legacy_ms:7.1f} ms")
+    print(f"availability, SlotTable:       {typed_ms:7.1f} ms (same free intervals)")
+
+    # End to end from SQLite: dict rows + per-row parsing vs. typed columns computed in SQL.
+    store = SQLiteScheduleStore(os.path.join(tempfile.mkdtemp(), "schedule.db"))
+    store.add_slots(tuple(r[c] for c in SCHEDULE_COLUMNS) for r in rows)
+    first, last = rows[0]["date"], rows[-1]["date"]
+    t0 = _time.perf_counter()
+    for (day, doctor), group in groupby(store.iter_slots(first, last), key=itemgetter("date", "doctor")):
+        DayAvailability.from_slots(day, list(group), SLOT_STEP_MIN)
+    legacy_ms = (_time.perf_counter() - t0) * 1000
+    t0 = _time.perf_counter()
+    from_store = store.slot_table(first, last).availability(SLOT_STEP_MIN)
+    typed_ms = (_time.perf_counter() - t0) * 1000
+    assert all(legacy[k].free == from_store[k].free for k in legacy), "store mismatch"
+    print(f"from SQLite, iter_slots + from_slots:     {legacy_ms:7.1f} ms")
+    print(f"from SQLite, slot_table + availability:   {typed_ms:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
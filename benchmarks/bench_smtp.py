@@ -0,0 +1,105 @@
+"""SMTP throughput: a new connection per message vs. the pooled Notifier.
+
+Runs a minimal local SMTP sink (no TLS, no auth) and sends the same batch
+both ways. ``--handshake-ms`` delays the server greeting to stand in for the
+TLS handshake + login cost a real provider adds to every new connection.
+
+    python -m benchmarks.bench_smtp --messages 2000 --handshake-ms 20
+"""
+import argparse
+import smtplib
+import socketserver
+import threading
+import time as _time
+from email.mime.text import MIMEText
+
+from appointment_agent.notifications import EmailSender, Notifier, SMTPConnectionPool
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        if self.server.handshake_s:
+            _time.sleep(self.server.handshake_s)
+        self._reply("220 sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode("ascii", "replace").strip().upper()
+            if cmd.startswith(("EHLO", "HELO")):
+                self._reply("250 sink")
+            elif cmd == "DATA":
+                self._reply("354 end with .")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                with self.server.lock:
+                    self.server.received += 1
+                self._reply("250 queued")
+            elif cmd == "QUIT":
+                self._reply("221 bye")
+                return
+            else:  # MAIL, RCPT, RSET, NOOP
+                self._reply("250 ok")
+
+    def _reply(self, text):
+        self.wfile.write(text.encode("ascii") + b"\r\n")
+
+
+class SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_s):
+        super().__init__(("127.0.0.1", 0), _SinkHandler)
+        self.handshake_s = handshake_s
+        self.received = 0
+        self.lock = threading.Lock()
+
+
+def legacy_send(port, recipient, body):
+    msg = MIMEText(body, "plain")
+    msg["From"] = "clinic@example.com"
+    msg["To"] = recipient
+    msg["Subject"] = "Reminder"
+    server = smtplib.SMTP("127.0.0.1", port, timeout=30)
+    server.sendmail("clinic@example.com", recipient, msg.as_string())
+    server.quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--handshake-ms", type=float, default=20.0)
+    parser.add_argument("--max-per-connection", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    server = SinkServer(args.handshake_ms / 1000)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    batch = [("email", f"patient{i}@example.com", "Reminder", f"Your appointment #{i}") for i in range(args.messages)]
+
+    legacy_n = max(1, args.messages // 10)
+    t0 = _time.perf_counter()
+    for _, recipient, _, body in batch[:legacy_n]:
+        legacy_send(port, recipient, body)
+    legacy_rate = legacy_n / (_time.perf_counter() - t0)
+
+    pool = SMTPConnectionPool("127.0.0.1", port, size=args.workers, max_messages=args.max_per_connection,
+                              use_tls=False)
+    notifier = Notifier(email=EmailSender("clinic@example.com", "", "127.0.0.1", port, pool=pool))
+    t0 = _time.perf_counter()
+    errors = [e for e in notifier.send_bulk(batch, workers=args.workers) if e is not None]
+    pooled_rate = args.messages / (_time.perf_counter() - t0)
+    notifier.close()
+    server.shutdown()
+
+    print(f"handshake delay: {args.handshake_ms:.0f} ms, workers: {args.workers}")
+    print(f"legacy  connection per message: {legacy_rate:9.1f} msg/s ({legacy_n} sent)")
+    print(f"pooled  Notifier.send_bulk:     {pooled_rate:9.1f} msg/s ({args.messages} sent, "
+          f"{pool.connects} connections, {len(errors)} errors)")
+    print(f"server received {server.received} messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Loading the appointment ledger: xlsx vs. JSONL journal vs. columnar snapshot.
+
+Writes a synthetic ledger, exports it to xlsx, compacts it into a snapshot,
+then times a load of each and the Python heap it takes (tracemalloc
+peak), plus a typical query: upcoming appointments for one doctor.
+
+    python -m benchmarks.bench_snapshot --appointments 100000
+"""
+import argparse
+import os
+import tempfile
+import time as _time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from appointment_agent.ledger import FINAL_COLUMNS, AppointmentLedger
+from appointment_agent.snapshot import encode_day, load_snapshot
+
+from .bench_reminders import write_ledger
+
+
+def measure(label, fn):
+    """Time ``fn`` untraced, then run it again under tracemalloc for its peak (tracing skews timings)."""
+    t0 = _time.perf_counter()
+    result = fn()
+    elapsed = _time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<34} {elapsed * 1000:9.0f} ms  {peak / 2 ** 20:8.1f} MiB peak")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--appointments", type=int, default=100_000)
+    parser.add_argument("--skip-xlsx", action="store_true", help="xlsx export/read is slow at this size")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "final.jsonl")
+    start = datetime.now().replace(second=0, microsecond=0)
+    write_ledger(path, args.appointments, start)
+    ledger = AppointmentLedger(path, compact_every=None)
+    cutoff = (start + timedelta(days=15)).strftime("%Y-%m-%d")
+
+    if not args.skip_xlsx:
+        xlsx = os.path.join(tmp, "final.xlsx")
+        ledger.export_xlsx(xlsx)
+        df = measure("read_excel (xlsx)", lambda: pd.read_excel(xlsx, dtype=str))
+        measure("  query", lambda: df[(df["doctor"] == "Dr. Smith") & (df["date"] >= cutoff)].shape[0])
+
+    df = measure("parse JSONL journal", lambda: pd.DataFrame(list(ledger), columns=FINAL_COLUMNS))
+    measure("  query", lambda: df[(df["doctor"] == "Dr. Smith") & (df["date"] >= cutoff)].shape[0])
+
+    measure("compact into snapshot", ledger.compact)
+    snap = measure("load snapshot (mmap)", lambda: load_snapshot(ledger.snapshot_dir))
+    doctor, day = snap.code("doctor", "Dr. Smith"), encode_day(cutoff)
+    rows = measure("  query", lambda: np.flatnonzero((snap.columns["doctor"] == doctor)
+                                                      & (snap.columns["date"] >= day)))
+    measure("  decode matching rows", lambda: snap.records(rows))
+    size = sum(os.path.getsize(os.path.join(ledger.snapshot_dir, f)) for f in os.listdir(ledger.snapshot_dir))
+    print(f"journal {os.path.getsize(path) / 2 ** 20:.1f} MiB, snapshot {size / 2 ** 20:.1f} MiB on disk")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Waitlist backfill: scanning the list vs. the per-(day, duration, doctor) heaps.
+
+Puts ``--requests`` patients on a scratch waitlist. Each wants a 30- or
+60-minute visit on any day of a 1-7 day window inside a ``--days`` horizon,
+and a quarter of them want a particular doctor. ``--offers`` freed intervals
+(a random day and doctor, 30 to 120 minutes) then each pick a patient:
+
+* scan: every waiting request is checked and the best eligible one kept;
+* index: ``Waitlist.best``, which reads the heads of the heaps for that day,
+  that doctor and the durations that fit.
+
+Both must pick the same patient. Last, a fully booked schedule gets
+``--cancels`` cancellations, each released and backfilled from the waitlist
+the way the engine does it. Reports the latency of that and how much of the
+freed time was booked again.
+
+    python -m benchmarks.bench_waitlist --requests 100000 --offers 2000 --cancels 500
+"""
+import argparse
+import os
+import random
+import tempfile
+import time as _time
+from datetime import date, datetime, time, timedelta
+
+from appointment_agent.availability import slots_needed
+from appointment_agent.changes import ChangeStatus, cancel_appointment, offer_to_waitlist
+from appointment_agent.horizon import ClinicCalendar, ScheduleHorizon
+from appointment_agent.ledger import BOOKED, AppointmentLedger
+from appointment_agent.metrics import quantile
+from appointment_agent.schedule_store import Booking, new_appointment_id, open_schedule_store
+from appointment_agent.waitlist import Waitlist
+
+STEP = 30
+
+
+def scan_best(requests, taken, day: str, doctor: str, minutes: int):
+    best = None
+    for r in requests:
+        if (r.id in taken or not r.first_day <= day <= r.last_day or r.doctor not in ("", doctor)
+                or slots_needed(r.duration, STEP) * STEP > minutes):
+            continue
+        key = (r.priority, r.added_at, r.id)
+        if best is None or key < best[0]:
+            best = (key, r)
+    return best[1] if best else None
+
+
+def fill_schedule(store, ledger, roster, days):
+    """Book every slot of the horizon with alternating 60- and 30-minute appointments."""
+    bookings, records = [], []
+    for day in days:
+        for doctor, location in roster.items():
+            times = [s["time"] for s in store.day_slots(day, doctor)]
+            i = 0
+            while i < len(times):
+                duration = 60 if i % 3 == 0 and i + 1 < len(times) else 30
+                n = slots_needed(duration, STEP)
+                appointment_id = new_appointment_id()
+                bookings.append(Booking(day, tuple(times[i:i + n]), f"Booked {len(bookings)}", duration, "New",
+                                        doctor, appointment_id))
+                records.append({"name": f"Booked {len(records)}", "dob": "1970-01-01", "date": day,
+                                "time": times[i], "duration": duration, "doctor": doctor, "location": location,
+                                "appointment_id": appointment_id, "status": BOOKED})
+                i += n
+    store.book_many(bookings)
+    ledger.extend(records)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--offers", type=int, default=2000)
+    parser.add_argument("--cancels", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--doctors", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp()
+    roster = {f"Dr. {i:02d}": f"Clinic {i % 3}" for i in range(args.doctors)}
+    doctors = list(roster)
+    today = date.today() + timedelta(days=1)  # keeps the whole horizon in the future
+    days = [(today + timedelta(days=i)).isoformat() for i in range(args.days)]
+
+    waitlist = Waitlist(os.path.join(workdir, "waitlist.db"), STEP)
+    t0 = _time.perf_counter()
+    rows = []
+    for i in range(args.requests):
+        first = rng.randrange(args.days)
+        last = min(args.days - 1, first + rng.randrange(7))
+        rows.append(dict(name=f"Waiting {i}", dob="1980-01-01", patient_type="New", duration=rng.choice((30, 60)),
+                         first_day=days[first], last_day=days[last],
+                         doctor=rng.choice(doctors) if rng.random() < 0.25 else "",
+                         priority=rng.choice((0, 0, 0, 1, -1))))
+    requests = waitlist.add_many(rows)
+    print(f"waitlisted {len(requests)} requests in {_time.perf_counter() - t0:.1f} s")
+
+    offers = [(rng.choice(days), rng.choice(doctors), rng.choice((30, 60, 90, 120))) for _ in range(args.offers)]
+    scan, index, agree = [], [], 0
+    for day, doctor, minutes in offers:
+        t0 = _time.perf_counter()
+        expected = scan_best(requests, set(), day, doctor, minutes)
+        scan.append(_time.perf_counter() - t0)
+        t0 = _time.perf_counter()
+        got = waitlist.best(day, doctor, minutes)
+        index.append(_time.perf_counter() - t0)
+        agree += (expected and expected.id) == (got and got.id)
+    scan.sort()
+    index.sort()
+    print(f"{'pick':>6} {'p50 us':>10} {'p99 us':>10}")
+    for label, latencies in (("scan", scan), ("index", index)):
+        print(f"{label:>6} {quantile(latencies, 0.5) * 1e6:>10.1f} {quantile(latencies, 0.99) * 1e6:>10.1f}")
+    print(f"same patient picked for {agree}/{len(offers)} offers")
+
+    store = open_schedule_store(os.path.join(workdir, "schedule.db"), os.path.join(workdir, "none.xlsx"))
+    horizon = ScheduleHorizon(store, ClinicCalendar(roster, (time(9), time(17)), STEP), args.days + 1)
+    horizon.ensure_range(today, args.days)
+    ledger = AppointmentLedger(os.path.join(workdir, "final.jsonl"))
+    booked = fill_schedule(store, ledger, roster, days)
+    now = datetime.combine(today, time(0))
+    latencies, freed_minutes, refilled_minutes, backfilled = [], 0, 0, 0
+    for record in rng.sample(booked, min(args.cancels, len(booked))):
+        t0 = _time.perf_counter()
+        change = cancel_appointment(store, ledger, record["appointment_id"])
+        filled = offer_to_waitlist(waitlist, store, ledger, change.freed, now) \
+            if change.status == ChangeStatus.DONE else []
+        latencies.append(_time.perf_counter() - t0)
+        freed_minutes += record["duration"]
+        refilled_minutes += sum(slots_needed(b.request.duration, STEP) * STEP for b in filled)
+        backfilled += len(filled)
+    latencies.sort()
+    print(f"cancel + backfill: p50 {quantile(latencies, 0.5) * 1e3:.2f} ms, p99 {quantile(latencies, 0.99) * 1e3:.2f} ms; "
+          f"{backfilled} patients booked into {refilled_minutes}/{freed_minutes} freed minutes "
+          f"({refilled_minutes / max(1, freed_minutes):.0%}); {len(waitlist)} still waiting")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Seeded fixture generator: a large ``patients.csv`` and a partly booked ``schedule.xlsx``.
+
+Patients get a first name, middle initial and surname from fixed lists, a
+date of birth between 1940 and 2015, and an email and phone derived from the
+name; (name, dob) pairs are unique. The schedule has every doctor's slot grid
+for the open days from ``--start``, with roughly ``--fill`` of the slots
+taken by 30-minute (recurring) and 60-minute (new) appointments of those
+patients. The same seed always gives the same files.
+
+    python -m benchmarks.datagen --patients 100000 --days 90 --fill 0.5 --out fixtures
+"""
+import argparse
+import os
+import random
+import time as _time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from appointment_agent.config import NEW_PATIENT_DURATION, RECURRING_PATIENT_DURATION
+from appointment_agent.engine import clinic_calendar
+from appointment_agent.patient_index import PATIENT_COLUMNS
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Carlos", "Karen",
+    "Daniel", "Lisa", "Matthew", "Nancy", "Anthony", "Sofia", "Mark", "Aisha", "Wei", "Priya",
+    "Mohammed", "Fatima", "Hiroshi", "Yuki", "Olga", "Ivan", "Lucia", "Mateo", "Chloe", "Noah",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+    "Nguyen", "Patel", "Kim", "Chen", "Singh", "Kowalski", "Novak", "Okafor", "Haddad", "Tanaka",
+]
+
+
+def make_patients(n: int, seed: int = 0) -> pd.DataFrame:
+    """``n`` patients with unique (name, dob)."""
+    rng = np.random.default_rng(seed)
+    frames, have = [], 0
+    while have < n:
+        m = int((n - have) * 1.1) + 16
+        first = np.array(FIRST_NAMES)[rng.integers(0, len(FIRST_NAMES), m)]
+        middle = np.array(list("ABCDEFGHIJKLMNOPRSTW"))[rng.integers(0, 20, m)]
+        last = np.array(LAST_NAMES)[rng.integers(0, len(LAST_NAMES), m)]
+        dob = np.datetime64("1940-01-01") + rng.integers(0, 75 * 365, m).astype("timedelta64[D]")
+        df = pd.DataFrame({
+            "first": first, "last": last,
+            "name": pd.Series(first) + " " + pd.Series(middle) + ". " + pd.Series(last),
+            "dob": dob.astype(str),
+        })
+        frames.append(df)
+        have = len(pd.concat(frames).drop_duplicates(["name", "dob"]))
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(["name", "dob"]).head(n).reset_index(drop=True)
+    serial = pd.Series(np.arange(len(df))).astype(str)
+    df["email"] = df["first"].str.lower() + "." + df["last"].str.lower() + serial + "@example.com"
+    df["phone"] = "+1555" + pd.Series(rng.integers(0, 10 ** 7, len(df))).astype(str).str.zfill(7)
+    return df[PATIENT_COLUMNS]
+
+
+def make_schedule(patients: pd.DataFrame, start: date, days: int, fill: float, seed: int = 0) -> pd.DataFrame:
+    """Every doctor's grid for the open days in ``[start, start + days)``, about ``fill`` of it booked."""
+    rng = random.Random(seed)
+    calendar = clinic_calendar()
+    names = patients["name"].tolist()
+    step = calendar.step
+    rows = []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        if not calendar.is_open(day):
+            continue
+        for doctor in calendar.locations:
+            grid = [list(r) for r in calendar.slot_rows(day.isoformat(), doctor)]
+            j = 0
+            while j < len(grid):
+                new = rng.random() < 0.3
+                duration = NEW_PATIENT_DURATION if new else RECURRING_PATIENT_DURATION
+                span = -(-duration // step)
+                if rng.random() < fill and j + span <= len(grid):
+                    patient = rng.choice(names) if names else f"Patient {j}"
+                    for k in range(span):
+                        grid[j + k][2] = patient
+                        grid[j + k][3] = duration if k == 0 else 0
+                        grid[j + k][4] = "New" if new else "Recurring"
+                    j += span
+                else:
+                    j += 1
+            rows.extend(grid)
+    return pd.DataFrame(rows, columns=["date", "time", "patient", "duration", "patient_type", "doctor", "location"])
+
+
+def write_fixtures(directory: str, patients: int, start: date, days: int, fill: float, seed: int = 0):
+    """Write ``patients.csv`` and ``schedule.xlsx`` into ``directory``. Returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    df = make_patients(patients, seed)
+    patients_path = os.path.join(directory, "patients.csv")
+    df.to_csv(patients_path, index=False)
+    schedule_path = os.path.join(directory, "schedule.xlsx")
+    make_schedule(df, start, days, fill, seed).to_excel(schedule_path, index=False)
+    return patients_path, schedule_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--fill", type=float, default=0.5, help="fraction of slots already booked")
+    parser.add_argument("--start", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="fixtures")
+    args = parser.parse_args(argv)
+
+    t0 = _time.perf_counter()
+    for path in write_fixtures(args.out, args.patients, args.start, args.days, args.fill, args.seed):
+        print(f"wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    print(f"{_time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
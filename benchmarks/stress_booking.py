@@ -0,0 +1,111 @@
+"""Multi-process booking stress test.
+
+Several processes race to book overlapping 30/60/90-minute appointments on
+one day's slots. Afterwards every slot must belong to at most one booking and
+every booking must own all of its consecutive slots.
+
+    python -m benchmarks.stress_booking --workers 8 --attempts 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from collections import defaultdict
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+from appointment_agent.schedule_store import BookingStatus, SQLiteScheduleStore
+
+DAY = "2030-01-07"
+SLOT_STEP_MIN = 30
+
+
+def day_times():
+    cur = datetime(2030, 1, 7, 10, 0)
+    end = datetime(2030, 1, 7, 21, 0)
+    times = []
+    while cur <= end:
+        times.append(cur.strftime("%H:%M"))
+        cur += timedelta(minutes=SLOT_STEP_MIN)
+    return times
+
+
+def worker(args):
+    db_path, worker_id, attempts, seed = args
+    rng = random.Random(seed)
+    store = SQLiteScheduleStore(db_path)
+    times = day_times()
+    booked = []
+    taken = 0
+    for n in range(attempts):
+        duration = rng.choice([30, 60, 90])
+        needed = duration // SLOT_STEP_MIN
+        start = rng.randrange(0, len(times) - needed + 1)
+        claim = times[start:start + needed]
+        patient = f"w{worker_id}-{n}"
+        status = store.book(DAY, claim, patient, duration, "New")
+        if status == BookingStatus.BOOKED:
+            booked.append((patient, claim))
+        elif status == BookingStatus.SLOT_TAKEN:
+            taken += 1
+        else:
+            raise AssertionError(f"unexpected status {status} for {claim}")
+    store.close()
+    return booked, taken
+
+
+def check(store, bookings):
+    slots = {s["time"]: s for s in store.day_slots(DAY)}
+    owners = defaultdict(list)
+    for patient, claim in bookings:
+        for t in claim:
+            owners[t].append(patient)
+    errors = []
+    for t, patients in owners.items():
+        if len(patients) > 1:
+            errors.append(f"{t} double booked by {patients}")
+    for patient, claim in bookings:
+        for i, t in enumerate(claim):
+            row = slots[t]
+            if row["patient"] != patient:
+                errors.append(f"{patient} lost {t} to {row['patient']!r}")
+            expected = 0 if i else len(claim) * SLOT_STEP_MIN
+            if row["duration"] != expected:
+                errors.append(f"{patient} has duration {row['duration']} at {t}, expected {expected}")
+    claimed = {t for _, claim in bookings for t in claim}
+    for t, row in slots.items():
+        if row["patient"] and t not in claimed:
+            errors.append(f"{t} holds {row['patient']!r} but no worker reported it (half-written booking)")
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "schedule.db")
+        store = SQLiteScheduleStore(db_path)
+        store.add_slots((DAY, t, "", 30, "", "", "") for t in day_times())
+
+        jobs = [(db_path, w, args.attempts, args.seed * 1000 + w) for w in range(args.workers)]
+        with Pool(args.workers) as pool:
+            results = pool.map(worker, jobs)
+
+        bookings = [b for booked, _ in results for b in booked]
+        taken = sum(t for _, t in results)
+        errors = check(store, bookings)
+        store.close()
+
+    print(f"{len(bookings)} bookings, {taken} slot-taken conflicts, {len(errors)} errors")
+    for e in errors[:20]:
+        print("  " + e)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""Shared fixtures: a schedule store holding one doctor's day, a ledger and a settable clock."""
+import pytest
+
+from appointment_agent.ledger import AppointmentLedger
+from appointment_agent.schedule_store import SQLiteScheduleStore
+
+DAY = "2026-10-22"
+DOCTOR = "Dr. Lee"
+LOCATION = "Main"
+TIMES = ("09:00", "09:30", "10:00", "10:30", "11:00", "11:30")
+
+
+class Clock:
+    """Injectable ``clock``; tests move ``now`` by hand."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def grid(day=DAY, doctor=DOCTOR, location=LOCATION, times=TIMES):
+    """Free slot rows, as ``ScheduleStore.add_slots`` takes them."""
+    return [(day, t, "", 30, "", doctor, location) for t in times]
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    """``make_store(cls=SQLiteScheduleStore, rows=grid())``: a store under ``tmp_path`` holding ``rows``."""
+    def make(cls=SQLiteScheduleStore, rows=None):
+        store = cls(str(tmp_path / "schedule.db"))
+        store.add_slots(grid() if rows is None else rows)
+        return store
+    return make
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store()
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return AppointmentLedger(str(tmp_path / "final.jsonl"), compact_every=None)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
@@ -0,0 +1,41 @@
+"""Messages with the fields the parser must read from them, shared by the tests and ``bench_parser``."""
+
+# (message, expected patient fields, expected missing)
+PATIENT_CORPUS = [
+    ("Name: John Doe, DOB: 1990-01-15, Email: john@email.com, Phone: +1234567890",
+     {"name": "John Doe", "dob": "1990-01-15", "email": "john@email.com", "phone": "+1234567890"}, []),
+    ("Name: Jane Doe, DOB: 1992-05-10", {"name": "Jane Doe", "dob": "1992-05-10", "email": "", "phone": ""}, []),
+    ("name: jon doe dob: 01/15/1990", {"name": "jon doe", "dob": "1990-01-15"}, []),
+    ("Name - Jane O'Neil; Date of Birth: 15 March 1985; e-mail jane@x.org; phone (555) 123-4567",
+     {"name": "Jane O'Neil", "dob": "1985-03-15", "email": "jane@x.org", "phone": "5551234567"}, []),
+    ("Full name: Ana-Maria Lopez\nDOB: Feb 3, 1977\nMobile: +44 20 7946 0958",
+     {"name": "Ana-Maria Lopez", "dob": "1977-02-03", "phone": "+442079460958"}, []),
+    ("Name: Ravi Kumar, DOB: 27-10-1993", {"name": "Ravi Kumar", "dob": "1993-10-27"}, []),
+    ("Name: Ravi Kumar, DOB: 10/27/1993", {"name": "Ravi Kumar", "dob": "1993-10-27"}, []),
+    ("Name: Ravi Kumar, DOB: 1993/10/27", {"name": "Ravi Kumar", "dob": "1993-10-27"}, []),
+    ("Name: Ravi Kumar, DOB: 2/3/1993", {"dob": "1993-02-03"}, []),
+    ("Name: Ravi Kumar, born 1993-10-27", {"name": "Ravi Kumar", "dob": "1993-10-27"}, []),
+    ("Name: Ravi Kumar, DOB: 1993-02-30", {"dob": ""}, ["dob"]),
+    ("Name: Ravi Kumar, DOB: 2999-01-01", {"dob": ""}, ["dob"]),
+    ("DOB: 1990-01-15, Email: a@b.co", {"name": "", "email": "a@b.co"}, ["name"]),
+    ("Name: Li Wei", {"name": "Li Wei", "dob": ""}, ["dob"]),
+    ("Patient name: Mary-Kate Smith, D.O.B. 1988-07-04, email: mk@smith.com, tel: 555-010-2030",
+     {"name": "Mary-Kate Smith", "dob": "1988-07-04", "email": "mk@smith.com", "phone": "5550102030"}, []),
+    ("Name: Sam Lee DOB 1991-12-01 Email sam@lee.io Phone +15551234567",
+     {"name": "Sam Lee", "dob": "1991-12-01", "email": "sam@lee.io", "phone": "+15551234567"}, []),
+    ("Name: Sam Lee, DOB: 1991-12-01, Phone: 123", {"phone": ""}, []),
+    ("", {"name": "", "dob": ""}, ["name", "dob"]),
+]
+
+INSURANCE_CORPUS = [
+    ("Insurance: Blue Cross, Member ID: 123456, Group Number: ABC123",
+     {"insurance_carrier": "Blue Cross", "member_id": "123456", "group_number": "ABC123"}, []),
+    ("Carrier: Aetna Group Health, member id 99-88, group # G-1",
+     {"insurance_carrier": "Aetna Group Health", "member_id": "99-88", "group_number": "G-1"}, []),
+    ("insurance carrier: United; Member Number: X1; Group: 55",
+     {"insurance_carrier": "United", "member_id": "X1", "group_number": "55"}, []),
+    ("Insurance Provider: Kaiser Permanente\nMember_ID: K 7781\nGroup No. 12-B",
+     {"insurance_carrier": "Kaiser Permanente", "member_id": "K 7781", "group_number": "12-B"}, []),
+    ("Member ID: 5, Group Number: 7", {"insurance_carrier": ""}, ["insurance_carrier"]),
+    ("Insurance: Cigna", {"insurance_carrier": "Cigna"}, ["member_id", "group_number"]),
+]
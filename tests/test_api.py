@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from appointment_agent import api
+from appointment_agent.sessions import SQLiteSessionStore
+
+
+class SlowTurns:
+    """Stands in for ``run_turn``: records each turn and holds the first until released."""
+
+    def __init__(self):
+        self.turns = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, graph, state, text):
+        self.turns.append(text)
+        state.setdefault("conversation_history", []).append(("User", text))
+        if len(self.turns) == 1:
+            self.started.set()
+            assert self.release.wait(10)
+        if text == "boom":
+            raise RuntimeError(text)
+        state["booked"] = state.get("booked", 0) + 1  # the side effect that must not repeat
+        return [f"booked #{state['booked']}"]
+
+
+@pytest.fixture
+def turns(monkeypatch):
+    slow = SlowTurns()
+    monkeypatch.setattr(api, "run_turn", slow)
+    monkeypatch.setattr(api, "bootstrap_storage", lambda today: None)
+    return slow
+
+
+@pytest.fixture
+def client(tmp_path, turns):
+    with TestClient(api.create_app(SQLiteSessionStore(str(tmp_path / "sessions.db")), graph=object())) as client:
+        yield client
+
+
+def test_a_second_message_while_a_turn_runs_is_refused_before_it_runs(client, turns):
+    session_id = client.post("/sessions").json()["session_id"]
+    url = f"/sessions/{session_id}/messages"
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(client.post, url, json={"text": "yes"})
+        assert turns.started.wait(10)
+        second = pool.submit(client.post, url, json={"text": "yes"}).result(10)
+        turns.release.set()
+        first = first.result(10)
+    assert first.status_code == 200 and first.json()["replies"] == ["booked #1"]
+    assert second.status_code == 409
+    assert turns.turns == ["yes"]
+
+    # The resend runs against the state the first turn saved.
+    resent = client.post(url, json={"text": "yes"})
+    assert resent.status_code == 200 and resent.json()["replies"] == ["booked #2"]
+    history = client.get(f"/sessions/{session_id}").json()["history"]
+    assert [text for speaker, text in history if speaker == "User"] == ["yes", "yes"]
+
+
+def test_a_failed_turn_releases_the_session(client, turns):
+    turns.release.set()
+    session_id = client.post("/sessions").json()["session_id"]
+    url = f"/sessions/{session_id}/messages"
+    with pytest.raises(RuntimeError):
+        client.post(url, json={"text": "boom"})
+    assert client.post(url, json={"text": "yes"}).json()["replies"] == ["booked #1"]
+
+
+def test_a_claim_expires_after_its_lease(tmp_path, clock):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), clock=clock)
+    session_id = store.create({"current_node": "greet"})
+    assert store.claim_turn(session_id, 1, 60)
+    assert not store.claim_turn(session_id, 1, 60)
+    clock.now += 61
+    assert store.claim_turn(session_id, 1, 60)
+    assert not store.claim_turn(session_id, 2, 60)
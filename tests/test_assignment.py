@@ -0,0 +1,87 @@
+from datetime import date, time
+
+import pytest
+
+from appointment_agent.assignment import AVAILABILITY, CONTINUITY, NO_OPENINGS, Assignment, DoctorAssigner
+from appointment_agent.capacity import CapacityIndex
+from appointment_agent.horizon import ClinicCalendar, ScheduleHorizon
+from appointment_agent.schedule_store import SQLiteScheduleStore
+
+MON, TUE, WED = "2026-10-19", "2026-10-20", "2026-10-21"
+ROSTER = {"Dr. A": "North", "Dr. B": "South", "Dr. C": "North"}
+# Dr. B covers North on Mondays: three doctors there that day, one on other days.
+CALENDAR = ClinicCalendar(ROSTER, (time(9), time(10)), 30, rotation={"Dr. B": {0: "North"}})
+TIMES = ["09:00", "09:30", "10:00"]
+
+
+@pytest.fixture
+def setup(tmp_path, ledger):
+    store = SQLiteScheduleStore(str(tmp_path / "schedule.db"))
+    ScheduleHorizon(store, CALENDAR, 7).generate([date(2026, 10, 19), date(2026, 10, 20), date(2026, 10, 21)])
+    return store, DoctorAssigner(CapacityIndex(store, 30), ledger, ROSTER)
+
+
+def _fill(store, day, doctor, times=TIMES):
+    for t in times:
+        store.book(day, [t], "Someone", 30, "Recurring", doctor)
+
+
+def test_returning_patients_keep_their_doctor(setup, ledger):
+    store, assigner = setup
+    ledger.extend([{"name": "Jane Doe", "dob": "1990-01-15", "date": "2026-09-01", "doctor": "Dr. A"},
+                   {"name": "Jane Doe", "dob": "1990-01-15", "date": "2026-10-01", "doctor": "Dr. B"}])
+    assert assigner.assign("jane doe", "1990-01-15", 30, MON, WED) == Assignment("Dr. B", "North", CONTINUITY)
+    _fill(store, MON, "Dr. B")
+    assert assigner.assign("Jane Doe", "1990-01-15", 30, MON, WED) == Assignment("Dr. B", "South", CONTINUITY)
+    ledger.append({"name": "Jane Doe", "dob": "1990-01-15", "date": "2026-10-02", "doctor": "Dr. C"})
+    assert assigner.usual_doctor("Jane Doe", "1990-01-15") == "Dr. C"
+
+
+def test_load_is_measured_over_the_asked_window_only(setup):
+    store, assigner = setup
+    _fill(store, TUE, "Dr. A")
+    _fill(store, WED, "Dr. A")
+    _fill(store, MON, "Dr. B", ["09:00"])
+    _fill(store, MON, "Dr. C", ["09:00"])
+    loads = {l.doctor: l for l in assigner.capacity.loads(ROSTER, 30, MON, MON)}
+    assert [loads[d].free_minutes for d in ROSTER] == [90, 60, 60]
+    # Over the three days Dr. A is the busiest, but on Monday alone the least booked.
+    assert assigner.assign("New Patient", "2000-01-01", 30, MON, MON) == Assignment("Dr. A", "North", AVAILABILITY)
+    assert assigner.assign("New Patient", "2000-01-01", 30, MON, WED).doctor == "Dr. B"
+
+
+def test_free_minutes_count_only_runs_long_enough_for_the_visit(setup):
+    store, assigner = setup
+    _fill(store, MON, "Dr. A", ["09:30"])
+    (load,) = assigner.capacity.loads(["Dr. A"], 60, MON, TUE)
+    assert (load.first_day, load.free_minutes) == (TUE, 90)
+
+
+def test_a_preferred_location_uses_the_days_each_doctor_works_there(setup):
+    store, assigner = setup
+    assert assigner.assign("P", "2000-01-01", 30, MON, WED, location="South") == Assignment("Dr. B", "South",
+                                                                                          AVAILABILITY)
+    _fill(store, TUE, "Dr. B")
+    _fill(store, WED, "Dr. B")
+    # Dr. B has room on Monday, but at North; nobody has room at South, so anyone will do.
+    assignment = assigner.assign("P", "2000-01-01", 30, MON, WED, location="South")
+    assert assignment.reason == AVAILABILITY and assignment.location == "North"
+
+
+def test_nobody_has_room(setup):
+    store, assigner = setup
+    for doctor in ROSTER:
+        _fill(store, MON, doctor)
+    assert assigner.assign("P", "2000-01-01", 30, MON, MON) == Assignment("Dr. A", "North", NO_OPENINGS)
+
+
+def test_colleague_at_the_same_clinic_that_day(setup):
+    store, assigner = setup
+    _fill(store, MON, "Dr. A")
+    _fill(store, MON, "Dr. C", ["09:00"])
+    assert assigner.colleague("Dr. A", 30, MON) == "Dr. B"  # covering North on Mondays, least booked
+    _fill(store, TUE, "Dr. A")
+    assert assigner.colleague("Dr. A", 30, TUE) == "Dr. C"  # Dr. B is back at South
+    assert assigner.colleague("Dr. B", 30, TUE) is None
+    _fill(store, TUE, "Dr. C")
+    assert assigner.colleague("Dr. A", 30, TUE) is None
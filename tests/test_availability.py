@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from appointment_agent.availability import (
+    DayAvailability, build_day_index, earliest_slots, format_minutes, range_starts, slot_times, slots_needed,
+)
+from tests.conftest import DAY
+
+STEP = 30
+
+
+def _slots(booked, day=DAY, doctor="Dr. Lee", first=9 * 60, count=12):
+    """A day's rows from ``first`` with the slots at the ``booked`` indexes taken."""
+    return [{"date": day, "time": format_minutes(first + i * STEP), "patient": "X" if i in booked else "",
+             "doctor": doctor, "location": "Main"} for i in range(count)]
+
+
+def _naive_starts(slots, duration):
+    """Every start whose needed consecutive slots all exist and are free, checked slot by slot."""
+    free = {s["time"] for s in slots if not s["patient"]}
+    return [s["time"] for s in slots if all(t in free for t in slot_times(s["time"], duration, STEP))]
+
+
+def test_free_rows_become_intervals():
+    avail = DayAvailability.from_slots(DAY, _slots({2, 3, 7}), STEP)
+    assert avail.free == [(540, 600), (660, 750), (780, 900)]
+    assert avail.free_minutes() == 270 and avail.longest_free() == 120
+
+
+@pytest.mark.parametrize("duration", [15, 30, 45, 60, 90, 120, 240])
+def test_starts_match_a_slot_by_slot_check_for_any_duration(duration):
+    rng = random.Random(duration)
+    for _ in range(50):
+        slots = _slots({i for i in range(12) if rng.random() < 0.3})
+        avail = DayAvailability.from_slots(DAY, slots, STEP)
+        assert avail.start_times(duration) == _naive_starts(slots, duration)
+
+
+def test_can_book_and_take():
+    avail = DayAvailability.from_slots(DAY, _slots({4}), STEP)
+    assert avail.can_book(540, 60) and avail.can_book(600, 60)
+    assert not avail.can_book(630, 60) and not avail.can_book(660, 30)
+    assert avail.first_start(120) == 540
+    avail.take(570, 60)
+    assert avail.free == [(540, 570), (630, 660), (690, 900)]
+    assert not avail.can_book(570, 30) and avail.can_book(630, 30)
+    assert avail.first_start(90) == 690
+
+
+def test_slot_arithmetic():
+    assert [slots_needed(d, STEP) for d in (10, 30, 31, 60, 90)] == [1, 1, 2, 2, 3]
+    assert slot_times("10:30", 60, STEP) == ["10:30", "11:00"]
+
+
+def test_multi_day_range():
+    rows = _slots({0, 1}, "2026-10-22") + _slots(set(range(12)), "2026-10-23") + _slots(set(), "2026-10-24")
+    index = build_day_index(rows, STEP)
+    assert sorted(index) == ["2026-10-22", "2026-10-23", "2026-10-24"]
+    starts = list(range_starts(index, 300))
+    assert starts == [("2026-10-22", "10:00"), ("2026-10-24", "09:00"), ("2026-10-24", "09:30"),
+                      ("2026-10-24", "10:00")]
+
+
+def test_earliest_slots_merge_doctors_by_start_time():
+    rows = sorted(_slots({0, 1, 2}, doctor="Dr. A") + _slots({0}, doctor="Dr. B", first=9 * 60 + 30),
+                  key=lambda r: (r["date"], r["doctor"], r["time"]))
+    assert earliest_slots(rows, 60, STEP, 3) == [
+        (DAY, "10:00", "Dr. B", "Main"), (DAY, "10:30", "Dr. A", "Main"), (DAY, "10:30", "Dr. B", "Main"),
+    ]
@@ -0,0 +1,92 @@
+from appointment_agent.batch import (
+    WaitlistEntry, commit, load_availability, plan, read_waitlist, record_placements,
+)
+from appointment_agent.ledger import BOOKED
+from appointment_agent.patient_index import PatientIndex
+from tests.conftest import grid
+
+D1, D2 = "2026-10-22", "2026-10-23"
+LEE, SMITH = "Dr. Lee", "Dr. Smith"
+
+
+def _entry(row, duration=60, preferred=(), doctor="", name=None):
+    return WaitlistEntry(row, name or f"Patient {row}", "1990-01-15", "New" if duration == 60 else "Recurring",
+                         duration, tuple(preferred), doctor, "", "")
+
+
+def _plan(make_store, rows, entries, days=(D1, D2)):
+    store = make_store(rows=rows)
+    availability, locations = load_availability(store, list(days))
+    return store, plan(entries, availability, list(days), locations)
+
+
+def test_csv_rows_are_parsed_or_reported(tmp_path):
+    patients_csv = tmp_path / "patients.csv"
+    patients_csv.write_text("name,dob,email,phone\nJohn Roe,1980-02-02,,\n")
+    waitlist_csv = tmp_path / "waitlist.csv"
+    waitlist_csv.write_text(
+        "Name,DOB,Type,Preferred_Dates,Doctor\n"
+        f"Jane Doe,1990-01-15,new,{D2}; {D1},Dr. Lee\n"
+        "John Roe,1980-02-02,,,\n"
+        "No Dob,,new,,\n"
+        "Odd Type,1990-01-15,weekly,,\n"
+        "Who,1990-01-15,new,,Dr. Nobody\n"
+    )
+    entries, invalid = read_waitlist(str(waitlist_csv), PatientIndex(str(patients_csv)))
+    assert [(e.row, e.name, e.patient_type, e.duration, e.preferred_dates, e.doctor) for e in entries] == [
+        (2, "Jane Doe", "New", 60, (D2, D1), LEE),
+        (3, "John Roe", "Recurring", 30, (), ""),  # blank type: found in the registry
+    ]
+    assert invalid == [(4, "missing name or dob"), (5, "unknown type 'weekly'"), (6, "unknown doctor 'Dr. Nobody'")]
+
+
+def test_most_constrained_patients_are_placed_first(make_store):
+    rows = grid(D1, LEE, times=("09:00", "09:30")) + grid(D2, LEE, times=("09:00", "09:30"))
+    # Row 2 could go either day; row 3 only fits Dr. Lee on D1, so it is placed first.
+    _, (placed, unplaced) = _plan(make_store, rows, [_entry(2), _entry(3, preferred=[D1], doctor=LEE)])
+    assert [(p.entry.row, p.day, p.time, p.preferred) for p in placed] == [(2, D2, "09:00", False),
+                                                                           (3, D1, "09:00", True)]
+    assert unplaced == []
+
+
+def test_longer_visits_go_before_shorter_ones(make_store):
+    rows = grid(D1, LEE, times=("09:00", "09:30", "10:00")) + grid(D1, SMITH, times=("09:00", "09:30", "10:00"))
+    # Row 4 is fixed to Dr. Lee; then the 60-minute visit takes Dr. Smith's 09:00 before the 30-minute one.
+    _, (placed, unplaced) = _plan(make_store, rows, [_entry(2, 30), _entry(3, 60), _entry(4, 60, doctor=LEE)],
+                                  days=(D1,))
+    assert [(p.entry.row, p.time, p.doctor) for p in placed] == [
+        (2, "10:00", LEE), (3, "09:00", SMITH), (4, "09:00", LEE),
+    ]
+    assert unplaced == []
+
+
+def test_ties_go_to_the_least_booked_doctor(make_store):
+    rows = grid(D1, LEE) + grid(D1, SMITH)
+    rows[-1] = (D1, "11:30", "Someone", 30, "Recurring", SMITH, rows[-1][6])
+    _, (placed, _) = _plan(make_store, rows, [_entry(2, 30)], days=(D1,))
+    assert [(p.time, p.doctor) for p in placed] == [("09:00", LEE)]
+
+
+def test_patients_without_an_opening_are_left_unplaced(make_store):
+    _, (placed, unplaced) = _plan(make_store, grid(D1, LEE, times=("09:00",)),
+                                  [_entry(2, 60), _entry(3, 30, doctor=SMITH), _entry(4, 30)], days=(D1,))
+    assert [p.entry.row for p in placed] == [4]
+    assert [(e.row, reason) for e, reason in unplaced] == [
+        (2, "no opening in the window"), (3, "no opening with Dr. Smith in the window"),
+    ]
+
+
+def test_commit_books_everything_it_can_and_reports_slots_taken_meanwhile(make_store, ledger, tmp_path):
+    rows = grid(D1, LEE, times=("09:00", "09:30", "10:00", "10:30"))
+    store, (placed, _) = _plan(make_store, rows, [_entry(2), _entry(3)], days=(D1,))
+    store.book(D1, ["10:30"], "Walk In", 30, "Recurring", LEE)
+    booked, lost = commit(store, placed)
+    assert [(p.entry.row, p.time) for p in booked] == [(2, "09:00")] and booked[0].appointment_id
+    assert [(p.entry.row, p.time) for p in lost] == [(3, "10:00")]
+    assert [s["patient"] for s in store.day_slots(D1, LEE)] == ["Patient 2", "Patient 2", "", "Walk In"]
+
+    patients = PatientIndex(str(tmp_path / "patients.csv"))
+    record_placements(booked, ledger, patients)
+    record_placements(booked, ledger, patients)
+    assert [(r["appointment_id"], r["status"]) for r in ledger] == [(booked[0].appointment_id, BOOKED)] * 2
+    assert (tmp_path / "patients.csv").read_text().count("Patient 2") == 1
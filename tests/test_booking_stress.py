@@ -0,0 +1,51 @@
+import multiprocessing
+
+from appointment_agent.schedule_store import BookingStatus, SQLiteScheduleStore
+from benchmarks.stress_booking import DAY, check, day_times, worker
+
+WORKERS = 4
+
+
+def _race(db_path, worker_id, start, results):
+    store = SQLiteScheduleStore(db_path)
+    start.wait()
+    results.put((worker_id, store.book(DAY, ["10:00", "10:30"], f"w{worker_id}", 60, "New").value))
+    store.close()
+
+
+def _store(tmp_path):
+    db_path = str(tmp_path / "schedule.db")
+    store = SQLiteScheduleStore(db_path)
+    store.add_slots((DAY, t, "", 30, "", "", "") for t in day_times())
+    return db_path, store
+
+
+def test_processes_racing_for_the_same_slots_have_one_winner(tmp_path):
+    db_path, store = _store(tmp_path)
+    ctx = multiprocessing.get_context("spawn")
+    start, results = ctx.Barrier(WORKERS), ctx.Queue()
+    procs = [ctx.Process(target=_race, args=(db_path, w, start, results)) for w in range(WORKERS)]
+    for p in procs:
+        p.start()
+    outcomes = dict(results.get(timeout=60) for _ in procs)
+    for p in procs:
+        p.join(timeout=60)
+        assert p.exitcode == 0
+
+    winners = [w for w, status in outcomes.items() if status == BookingStatus.BOOKED.value]
+    assert len(winners) == 1
+    assert list(outcomes.values()).count(BookingStatus.SLOT_TAKEN.value) == WORKERS - 1
+    rows = {s["time"]: s for s in store.day_slots(DAY)}
+    assert [rows[t]["patient"] for t in ("10:00", "10:30")] == [f"w{winners[0]}"] * 2
+    assert [rows[t]["duration"] for t in ("10:00", "10:30")] == [60, 0]
+    assert sum(1 for s in rows.values() if s["patient"]) == 2
+
+
+def test_overlapping_bookings_from_many_processes_never_share_a_slot(tmp_path):
+    db_path, store = _store(tmp_path)
+    jobs = [(db_path, w, 40, 1000 + w) for w in range(WORKERS)]
+    with multiprocessing.get_context("spawn").Pool(WORKERS) as pool:
+        results = pool.map(worker, jobs)
+    bookings = [b for booked, _ in results for b in booked]
+    assert bookings and sum(taken for _, taken in results)
+    assert check(store, bookings) == []
@@ -0,0 +1,78 @@
+from datetime import date, time
+
+from appointment_agent.capacity import CapacityIndex, _day_runs
+from appointment_agent.horizon import ClinicCalendar, ScheduleHorizon
+from appointment_agent.schedule_store import SQLiteScheduleStore
+
+MON, TUE = "2026-10-19", "2026-10-20"
+# Dr. B covers North on Mondays, so North has two doctors that day.
+CALENDAR = ClinicCalendar({"Dr. A": "North", "Dr. B": "South"}, (time(9), time(10)), 30,
+                          rotation={"Dr. B": {0: "North"}})
+
+
+def _index(tmp_path):
+    store = SQLiteScheduleStore(str(tmp_path / "schedule.db"))
+    ScheduleHorizon(store, CALENDAR, 7).generate([date(2026, 10, 19), date(2026, 10, 20)])
+    return store, CapacityIndex(store, 30)
+
+
+def test_location_search_covers_every_doctor_working_there_that_day(tmp_path):
+    store, index = _index(tmp_path)
+    assert store.day_slots(MON, "Dr. B")[0]["location"] == "North"
+    assert store.day_slots(TUE, "Dr. B")[0]["location"] == "South"
+    assert index.earliest(MON, TUE, 60, 10, location="North") == [
+        (MON, "09:00", "Dr. A", "North"), (MON, "09:00", "Dr. B", "North"),
+        (MON, "09:30", "Dr. A", "North"), (MON, "09:30", "Dr. B", "North"),
+        (TUE, "09:00", "Dr. A", "North"), (TUE, "09:30", "Dr. A", "North"),
+    ]
+    assert index.earliest(MON, TUE, 60, 10, location="South") == [
+        (TUE, "09:00", "Dr. B", "South"), (TUE, "09:30", "Dr. B", "South"),
+    ]
+    assert index.doctors("North") == ["Dr. A", "Dr. B"] and index.doctors("South") == ["Dr. B"]
+
+
+def test_location_search_follows_bookings(tmp_path):
+    store, index = _index(tmp_path)
+    index.refresh()
+    store.book(MON, ["09:00", "09:30"], "Jane Doe", 60, "New", "Dr. A")
+    assert index.earliest(MON, MON, 60, 10, location="North") == [
+        (MON, "09:00", "Dr. B", "North"), (MON, "09:30", "Dr. B", "North"),
+    ]
+    loads = {l.doctor: l for l in index.loads(["Dr. A", "Dr. B"], 60, MON, TUE)}
+    assert (loads["Dr. A"].first_day, loads["Dr. A"].location) == (TUE, "North")
+    assert (loads["Dr. B"].first_day, loads["Dr. B"].location) == (MON, "North")
+
+
+class CountingStore(SQLiteScheduleStore):
+    """Records the days each ``slot_table`` call covers and how many rows it returns."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.reads = []
+
+    def slot_table(self, start_day, end_day, location=None, doctor=None):
+        table = super().slot_table(start_day, end_day, location, doctor)
+        self.reads.append((start_day, end_day, len(table)))
+        return table
+
+
+def test_refresh_reads_only_the_changed_days(tmp_path):
+    store = CountingStore(str(tmp_path / "schedule.db"))
+    ScheduleHorizon(store, CALENDAR, 7).generate(date(2026, 10, 19 + i) for i in range(5))
+    index = CapacityIndex(store, 30)
+    index.refresh()
+    assert store.reads == [("2026-10-19", "2026-10-23", 30)]
+    store.reads.clear()
+    store.book(MON, ["09:00"], "Jane Doe", 30, "Recurring", "Dr. A")
+    store.book("2026-10-22", ["09:00"], "John Roe", 30, "Recurring", "Dr. B")
+    store.book("2026-10-23", ["09:00"], "Ann Poe", 30, "Recurring", "Dr. B")
+    assert index.refresh() == [MON, "2026-10-22", "2026-10-23"]
+    assert store.reads == [(MON, MON, 6), ("2026-10-22", "2026-10-23", 12)]  # not the days in between
+    assert index.earliest(MON, MON, 30, 1) == [(MON, "09:00", "Dr. B", "North")]
+
+
+def test_day_runs():
+    assert list(_day_runs([])) == []
+    assert list(_day_runs(["2026-10-30", "2026-10-31", "2026-11-01", "2026-11-03"])) == [
+        ("2026-10-30", "2026-11-01"), ("2026-11-03", "2026-11-03"),
+    ]
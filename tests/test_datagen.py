@@ -0,0 +1,56 @@
+from datetime import date
+
+import pandas as pd
+
+from appointment_agent.engine import clinic_calendar
+from appointment_agent.patient_index import PATIENT_COLUMNS
+from appointment_agent.schedule_store import SQLiteScheduleStore
+from benchmarks.bench_conversation import compare, patient_lines
+from benchmarks.datagen import make_patients, make_schedule, write_fixtures
+
+START = date(2026, 10, 19)
+
+
+def test_same_seed_gives_the_same_fixtures():
+    patients = make_patients(500, seed=7)
+    pd.testing.assert_frame_equal(patients, make_patients(500, seed=7))
+    assert not patients.equals(make_patients(500, seed=8))
+    pd.testing.assert_frame_equal(make_schedule(patients, START, 7, 0.5, seed=7),
+                                  make_schedule(patients, START, 7, 0.5, seed=7))
+    assert patient_lines(patients, 20, 0.3, seed=7) == patient_lines(patients, 20, 0.3, seed=7)
+
+
+def test_patients_are_unique_with_contact_details():
+    patients = make_patients(2000, seed=1)
+    assert list(patients.columns) == PATIENT_COLUMNS and len(patients) == 2000
+    assert not patients.duplicated(["name", "dob"]).any()
+    assert patients["email"].is_unique and patients["phone"].str.fullmatch(r"\+1555\d{7}").all()
+
+
+def test_schedule_is_every_open_grid_about_fill_booked():
+    calendar = clinic_calendar()
+    schedule = make_schedule(make_patients(200, seed=2), START, 14, 0.5, seed=2)
+    open_days = {d for d in pd.date_range(START, periods=14).date if calendar.is_open(d)}
+    assert set(schedule["date"]) == {d.isoformat() for d in open_days}
+    assert not schedule.duplicated(["date", "time", "doctor"]).any()
+    booked = schedule[schedule["patient"] != ""]
+    assert 0.3 < len(booked) / len(schedule) < 0.7
+    # Each appointment starts with its duration and continues over the next slots with 0.
+    starts = booked[booked["duration"] > 0]
+    assert set(starts["duration"]) <= {30, 60}
+    assert booked["duration"].sum() == len(booked) * calendar.step
+
+
+def test_fixtures_load_into_the_store(tmp_path):
+    patients_path, schedule_path = write_fixtures(str(tmp_path), 100, START, 3, 0.5, seed=3)
+    store = SQLiteScheduleStore(str(tmp_path / "schedule.db"))
+    assert store.import_xlsx(schedule_path) == len(pd.read_excel(schedule_path))
+    assert len(pd.read_csv(patients_path)) == 100
+
+
+def test_compare_flags_regressions(capsys):
+    baseline = {"bookings_per_sec": 100.0, "nodes": {"book": {"p95": 10.0}}}
+    assert compare({"bookings_per_sec": 95.0, "nodes": {"book": {"p95": 10.5}}}, baseline, 0.1)
+    assert not compare({"bookings_per_sec": 80.0, "nodes": {"book": {"p95": 10.0}}}, baseline, 0.1)
+    assert not compare({"bookings_per_sec": 100.0, "nodes": {"book": {"p95": 12.0}}}, baseline, 0.1)
+    assert "REGRESSION" in capsys.readouterr().out
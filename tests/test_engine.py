@@ -0,0 +1,33 @@
+from datetime import date, datetime, time, timedelta
+
+from appointment_agent import engine
+from appointment_agent.availability import DayAvailability
+
+TODAY = date(2026, 10, 22)
+NOW = datetime.combine(TODAY, time(10, 15))
+
+
+def _day(monkeypatch, day):
+    avail = DayAvailability(day.isoformat(), 30, [(9 * 60, 12 * 60)])
+    monkeypatch.setattr(engine, "get_day_availability", lambda d, doctor: avail)
+    return avail
+
+
+def test_past_starts_are_not_offered_today(monkeypatch):
+    _day(monkeypatch, TODAY)
+    assert engine.get_available_slots_for_patient(TODAY, False, "Dr. Lee", NOW) == ["10:30", "11:00", "11:30"]
+    assert engine.get_available_slots_for_patient(TODAY, True, "Dr. Lee", NOW) == ["10:30", "11:00"]
+
+
+def test_later_days_offer_the_whole_day(monkeypatch):
+    tomorrow = TODAY + timedelta(days=1)
+    _day(monkeypatch, tomorrow)
+    assert engine.get_available_slots_for_patient(tomorrow, False, "Dr. Lee", NOW)[0] == "09:00"
+
+
+def test_a_past_start_cannot_be_booked():
+    avail = DayAvailability(TODAY.isoformat(), 30, [(9 * 60, 12 * 60)])
+    from_minute = engine.earliest_start(TODAY, NOW)
+    assert not engine.can_book_duration(avail, "10:00", 30, from_minute)
+    assert engine.can_book_duration(avail, "10:30", 30, from_minute)
+    assert engine.earliest_start(TODAY + timedelta(days=1), NOW) == 0
@@ -0,0 +1,72 @@
+from datetime import date, time, timedelta
+
+from appointment_agent.horizon import ClinicCalendar, ScheduleHorizon
+from appointment_agent.schedule_store import SQLiteScheduleStore
+
+MON = date(2026, 10, 19)
+CALENDAR = ClinicCalendar({"Dr. A": "North", "Dr. B": "South"}, (time(9), time(10)), 30,
+                          hours={"Dr. B": (time(9), time(11))}, closed_weekdays=frozenset({6}),
+                          closed_dates=frozenset({"2026-10-21"}), rotation={"Dr. B": {0: "North"}})
+
+
+def _horizon(tmp_path, look_ahead=7):
+    return ScheduleHorizon(SQLiteScheduleStore(str(tmp_path / "schedule.db")), CALENDAR, look_ahead)
+
+
+def _days(store):
+    return sorted({s["date"] for s in store.iter_slots("2000-01-01", "2100-01-01")})
+
+
+def test_window_covers_look_ahead_days(tmp_path):
+    horizon = _horizon(tmp_path)
+    assert horizon.window(MON) == (MON, date(2026, 10, 25))
+    assert horizon.in_window(MON, MON) and horizon.in_window(date(2026, 10, 25), MON)
+    assert not horizon.in_window(MON - timedelta(days=1), MON) and not horizon.in_window(date(2026, 10, 26), MON)
+
+
+def test_grids_are_created_on_first_query_inside_the_window_only(tmp_path):
+    horizon = _horizon(tmp_path)
+    assert _days(horizon.store) == []
+    created = horizon.ensure_range(MON - timedelta(days=1), 3, today=MON)
+    assert created == {"Dr. A": ["2026-10-19", "2026-10-20"], "Dr. B": ["2026-10-19", "2026-10-20"]}
+    assert horizon.ensure_range(MON, 2, today=MON) == {}  # already there
+    assert horizon.ensure([date(2026, 11, 30)], today=MON) == {}  # past the look-ahead
+    assert _days(horizon.store) == ["2026-10-19", "2026-10-20"]
+
+
+def test_a_new_process_does_not_recreate_existing_grids(tmp_path):
+    _horizon(tmp_path).ensure([MON], today=MON)
+    horizon = _horizon(tmp_path)
+    horizon.store.book(MON.isoformat(), ["09:00"], "Jane Doe", 30, "Recurring", "Dr. A")
+    assert horizon.ensure([MON], today=MON) == {}
+    assert horizon.store.day_slots(MON.isoformat(), "Dr. A")[0]["patient"] == "Jane Doe"
+
+
+def test_closed_days_get_no_slots(tmp_path):
+    horizon = _horizon(tmp_path)
+    horizon.ensure_range(MON, 7, today=MON)
+    assert "2026-10-21" not in _days(horizon.store) and "2026-10-25" not in _days(horizon.store)
+    assert len(_days(horizon.store)) == 5
+
+
+def test_hours_and_location_follow_the_doctor_and_weekday(tmp_path):
+    horizon = _horizon(tmp_path)
+    horizon.ensure_range(MON, 2, today=MON)
+    a, b = horizon.store.day_slots("2026-10-19", "Dr. A"), horizon.store.day_slots("2026-10-19", "Dr. B")
+    assert [s["time"] for s in a] == ["09:00", "09:30", "10:00"]
+    assert [s["time"] for s in b] == ["09:00", "09:30", "10:00", "10:30", "11:00"]
+    assert {s["location"] for s in b} == {"North"}  # Monday cover
+    assert {s["location"] for s in horizon.store.day_slots("2026-10-20", "Dr. B")} == {"South"}
+
+
+def test_roll_archives_past_days_and_export_keeps_them(tmp_path):
+    horizon = _horizon(tmp_path)
+    horizon.ensure_range(MON, 3, today=MON)
+    horizon.store.book("2026-10-19", ["09:00"], "Jane Doe", 30, "Recurring", "Dr. A")
+    assert horizon.roll(date(2026, 10, 20)) == 8
+    assert _days(horizon.store) == ["2026-10-20"]
+    exported = horizon.store.to_dataframe(include_archive=True)
+    assert sorted(set(exported["date"])) == ["2026-10-19", "2026-10-20"]
+    assert list(exported[exported["patient"] != ""]["patient"]) == ["Jane Doe"]
+    # An archived day is outside the new window and is not generated again.
+    assert horizon.ensure([MON], today=date(2026, 10, 20)) == {}
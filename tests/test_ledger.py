@@ -0,0 +1,83 @@
+import os
+
+import pandas as pd
+
+from appointment_agent.ledger import (
+    BOOKED, CANCELLED, FINAL_COLUMNS, RESCHEDULED, AppointmentLedger, append_csv_row, append_csv_rows,
+)
+from tests.conftest import DAY
+
+
+def _record(appointment_id, status=BOOKED, time="10:00", **extra):
+    return dict({"name": "Jane Doe", "dob": "1990-01-15", "date": DAY, "time": time, "duration": 30,
+                 "doctor": "Dr. Lee", "appointment_id": appointment_id, "status": status}, **extra)
+
+
+def test_append_adds_one_line_without_rewriting(ledger):
+    ledger.extend(_record(f"a{i}") for i in range(3))
+    size = os.path.getsize(ledger.path)
+    with open(ledger.path, "rb") as fh:
+        head = fh.read()
+    ledger.append(_record("a3"))
+    with open(ledger.path, "rb") as fh:
+        data = fh.read()
+    assert data.startswith(head) and data[size:].count(b"\n") == 1
+    assert [r["appointment_id"] for r in ledger] == ["a0", "a1", "a2", "a3"]
+
+
+def test_torn_last_line_is_skipped_and_left_for_the_next_read(ledger):
+    ledger.append(_record("a1"))
+    with open(ledger.path, "a") as fh:
+        fh.write('{"name": "half')
+    assert [r["appointment_id"] for r in ledger] == ["a1"]
+    records, offset = ledger.read_from(0)
+    assert len(records) == 1 and offset < os.path.getsize(ledger.path)
+
+
+def test_find_returns_the_latest_state_from_the_tail_or_the_snapshot(ledger):
+    ledger.extend([_record("a1"), _record("a2")])
+    ledger.append(_record("a1", RESCHEDULED, time="14:00"))
+    assert ledger.find("a1")["time"] == "14:00"
+    ledger.compact()
+    assert ledger.find("a1")["time"] == "14:00"  # from the snapshot
+    ledger.append(_record("a1", CANCELLED, time="14:00"))
+    assert ledger.find("a1")["status"] == CANCELLED  # from the tail again
+    assert ledger.find("missing") is None and ledger.find("") is None
+
+
+def test_load_compacts_once_the_tail_is_long(tmp_path):
+    ledger = AppointmentLedger(str(tmp_path / "final.jsonl"), compact_every=5)
+    ledger.extend(_record(f"a{i}") for i in range(7))
+    snap, tail, offset = ledger.load()
+    assert len(snap) == 7 and tail == [] and offset == os.path.getsize(ledger.path)
+    ledger.append(_record("a7"))
+    snap, tail, _ = ledger.load()
+    assert len(snap) == 7 and [r["appointment_id"] for r in tail] == ["a7"]
+
+
+def test_export_has_one_row_per_appointment(ledger, tmp_path):
+    ledger.extend([_record("a1"), _record("a2"), _record("", name="Legacy Patient")])
+    ledger.compact()
+    ledger.append(_record("a1", CANCELLED))
+    xlsx = str(tmp_path / "final.xlsx")
+    assert ledger.export_xlsx(xlsx) == 3
+    df = pd.read_excel(xlsx, dtype=str)
+    assert list(df.columns) == FINAL_COLUMNS
+    assert dict(zip(df["appointment_id"].fillna(""), df["status"])) == {"a1": CANCELLED, "a2": BOOKED, "": BOOKED}
+
+
+def test_legacy_xlsx_seeds_a_new_ledger(tmp_path):
+    xlsx = str(tmp_path / "final.xlsx")
+    pd.DataFrame([{"name": "Jane Doe", "dob": "1990-01-15", "date": DAY, "time": "10:00"}]).to_excel(xlsx, index=False)
+    ledger = AppointmentLedger(str(tmp_path / "final.jsonl"), legacy_xlsx=xlsx)
+    assert [(r["name"], r["email"]) for r in ledger] == [("Jane Doe", "")]
+
+
+def test_csv_rows_are_appended_under_one_header(tmp_path):
+    path = str(tmp_path / "patients.csv")
+    append_csv_row(path, ["name", "dob"], {"name": "Jane Doe", "dob": "1990-01-15"})
+    with open(path, "a") as fh:
+        fh.write("Torn,1980-01-01")  # no trailing newline
+    append_csv_rows(path, ["name", "dob"], [{"name": "John Roe", "dob": None}])
+    with open(path) as fh:
+        assert fh.read() == "name,dob\nJane Doe,1990-01-15\nTorn,1980-01-01\nJohn Roe,\n"
@@ -0,0 +1,74 @@
+import pytest
+
+from appointment_agent import matching
+from appointment_agent.matching import PatientMatcher, dob_variants, jaro_winkler, name_tokens, soundex
+
+JOHN = {"name": "John A. Doe", "dob": "1990-01-15", "email": "john@doe.com", "phone": "+15550001111"}
+
+
+def _matcher(*records):
+    matcher = PatientMatcher()
+    for record in records:
+        matcher.add(record)
+    return matcher
+
+
+def test_name_helpers():
+    assert [soundex(t) for t in ("robert", "rupert", "tymczak", "ashcraft", "")] == ["R163", "R163", "T522",
+                                                                                      "A261", ""]
+    assert name_tokens("Doe, John A.") == ("doe", "john") and name_tokens("O'Brien") == ("obrien", "obrien")
+    assert jaro_winkler("martha", "marhta") == pytest.approx(0.9611, abs=1e-4)
+    assert jaro_winkler("abc", "") == 0.0 and jaro_winkler("same", "same") == 1.0
+
+
+def test_dob_variants_are_valid_dates_one_typo_away():
+    variants = dob_variants("1990-03-04")
+    assert {"1990-04-03", "1990-03-05", "1990-03-40", "1909-03-04", "1991-03-04"} & set(variants) == {
+        "1990-04-03", "1990-03-05", "1909-03-04", "1991-03-04"}  # no 40th of March
+    assert "1990-03-04" not in variants and dob_variants("not a date") == []
+
+
+@pytest.mark.parametrize("name, dob", [
+    ("Jon Doe", "1990-01-15"),
+    ("Doe, John", "1990-01-15"),
+    ("John Doe", "15/01/1990"),
+    ("Jhon Doe", "1990-01-15"),
+])
+def test_typos_in_the_name_still_match(name, dob):
+    (match,) = _matcher(JOHN).match(name, dob)
+    assert match.record is JOHN and match.exact_dob
+
+
+def test_a_near_dob_matches_with_a_lower_score():
+    matcher = _matcher(JOHN)
+    exact = matcher.match("John Doe", "1990-01-15")[0].score
+    (near,) = matcher.match("John Doe", "1990-01-16")
+    assert not near.exact_dob and near.score == pytest.approx(exact * matching.NEAR_DOB_FACTOR)
+    swapped = _matcher(dict(JOHN, dob="1990-03-04")).match("John Doe", "1990-04-03")
+    assert [m.exact_dob for m in swapped] == [False]
+
+
+def test_a_name_alone_never_matches():
+    matcher = _matcher(JOHN)
+    assert matcher.match("John Doe", "1975-06-30") == []
+    assert matcher.match("Mary Smith", "1990-01-15") == []
+    assert matcher.match("", "1990-01-15") == [] and matcher.match("John Doe", "") == []
+
+
+def test_contact_details_lift_a_weak_name_over_the_threshold():
+    matcher = _matcher(JOHN)
+    assert matcher.match("Jack Doe", "1990-01-15", threshold=0.75) == []  # scores 0.66
+    (match,) = matcher.match("Jack Doe", "1990-01-15", email="JOHN@doe.com", threshold=0.75)
+    assert match.record is JOHN and match.score == pytest.approx(0.7625)
+    (match,) = matcher.match("Jack Doe", "1990-01-15", phone="+15550001111", threshold=0.75)
+    assert match.record is JOHN
+
+
+def test_a_lookup_scores_only_its_blocks(monkeypatch):
+    others = [{"name": f"Patient{i} Smith", "dob": f"19{50 + i % 40}-0{1 + i % 9}-1{i % 10}"} for i in range(2000)]
+    matcher = _matcher(JOHN, {"name": "Jane Doe", "dob": "1990-01-15"}, *others)
+    scored = []
+    real = matching.name_similarity
+    monkeypatch.setattr(matching, "name_similarity", lambda a, b: scored.append(b) or real(a, b))
+    assert [m.record for m in matcher.match("John Doe", "1990-01-15")] == [JOHN]
+    assert sorted(scored) == [("jane", "doe"), ("john", "doe")]
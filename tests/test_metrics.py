@@ -0,0 +1,83 @@
+import json
+import os
+import time
+
+import pytest
+
+from appointment_agent.metrics import Metrics, MetricsFileWriter, profile_turn, quantile
+
+
+def test_nearest_rank_quantiles():
+    ordered = [float(i) for i in range(1, 101)]
+    assert [quantile(ordered, q) for q in (0.5, 0.95, 0.99, 1.0)] == [50.0, 95.0, 99.0, 100.0]
+    assert quantile([], 0.5) == 0.0 and quantile([3.0], 0.99) == 3.0
+
+
+def test_timers_keep_totals_and_quantiles_over_the_window():
+    metrics = Metrics(window=4)
+    for seconds in (10.0, 1.0, 2.0, 3.0, 4.0):
+        metrics.observe("agent_node_seconds", seconds, node="book")
+    (timer,) = metrics.snapshot()["timers"]
+    assert (timer["labels"], timer["calls"], timer["sum"]) == ({"node": "book"}, 5, 20.0)
+    assert (timer["p50"], timer["p99"]) == (2.0, 4.0)  # the 10s sample has left the window
+
+
+def test_timer_records_blocks_that_raise():
+    metrics = Metrics()
+
+    @metrics.timed("agent_storage_seconds", op="load")
+    def load():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        load()
+    with metrics.timer("agent_storage_seconds", op="load"):
+        pass
+    assert metrics.snapshot()["timers"][0]["calls"] == 2
+
+
+def test_prometheus_text():
+    metrics = Metrics()
+    metrics.observe("agent_turn_seconds", 0.5, node="book")
+    metrics.count("agent_rows_read_total", 3, op="slots")
+    metrics.count("agent_rows_read_total", 2, op="slots")
+    metrics.count("agent_notifications_total", channel='say "hi"')
+    assert metrics.render_prometheus().splitlines() == [
+        "# TYPE agent_turn_seconds summary",
+        'agent_turn_seconds{node="book",quantile="0.5"} 0.5',
+        'agent_turn_seconds{node="book",quantile="0.95"} 0.5',
+        'agent_turn_seconds{node="book",quantile="0.99"} 0.5',
+        'agent_turn_seconds_sum{node="book"} 0.5',
+        'agent_turn_seconds_count{node="book"} 1',
+        "# TYPE agent_notifications_total counter",
+        'agent_notifications_total{channel="say \\"hi\\""} 1',
+        "# TYPE agent_rows_read_total counter",
+        'agent_rows_read_total{op="slots"} 5',
+    ]
+    metrics.reset()
+    assert metrics.render_prometheus() == "\n"
+
+
+def test_file_writer_appends_one_snapshot_per_run(tmp_path):
+    metrics, path = Metrics(), str(tmp_path / "metrics.jsonl")
+    writer = MetricsFileWriter(metrics, path, interval=3600)
+    metrics.count("agent_rows_written_total", 4, op="book")
+    writer.run_once()
+    writer.start()
+    writer.stop(timeout=5)  # writes a final snapshot
+    with open(path) as fh:
+        records = [json.loads(line) for line in fh]
+    assert len(records) == 2 and records[-1]["pid"] == os.getpid()
+    assert records[-1]["counters"] == [{"name": "agent_rows_written_total", "labels": {"op": "book"}, "value": 4}]
+
+
+def test_profile_turn_saves_only_slow_turns(tmp_path):
+    with profile_turn("cprofile", str(tmp_path / "fast"), "book", min_ms=10_000):
+        pass
+    with profile_turn("cprofile", str(tmp_path / "slow"), "book", min_ms=0):
+        time.sleep(0.01)
+    with profile_turn("off", str(tmp_path / "off"), "book"):
+        pass
+    assert not (tmp_path / "fast").exists() and not (tmp_path / "off").exists()
+    (saved,) = os.listdir(tmp_path / "slow")
+    assert "-book-" in saved and saved.endswith(".prof")
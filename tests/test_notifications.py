@@ -0,0 +1,180 @@
+import socket
+import time
+
+import pytest
+
+from appointment_agent.notifications import (
+    FAILED, PENDING, SENDING, SENT, EmailSender, NotificationDispatcher, NotificationQueue, Notifier,
+    SMSSender, SMTPConnectionPool,
+)
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class Inbox:
+    """aiosmtpd handler that keeps every message it accepts."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode("utf-8", "replace")))
+        return "250 OK"
+
+
+class FakeTwilio:
+    """Stands in for ``twilio.rest.Client``: ``messages.create`` fails ``failures`` times, then succeeds."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+        self.messages = self
+
+    def create(self, body, from_, to):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("twilio unavailable")
+        self.sent.append((to, body))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp():
+    inbox = Inbox()
+    controller = aiosmtpd_controller.Controller(inbox, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    yield controller, inbox
+    controller.stop()
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return NotificationQueue(str(tmp_path / "notifications.db"), lease_seconds=60, clock=clock)
+
+
+def _dispatcher(queue, smtp=None, twilio=None, **kwargs):
+    email = None
+    if smtp is not None:
+        controller, _ = smtp
+        pool = SMTPConnectionPool(controller.hostname, controller.port, use_tls=False, timeout=5)
+        email = EmailSender("clinic@example.com", "", controller.hostname, controller.port, pool=pool)
+    sms = SMSSender("sid", "token", "+15550000000", client=twilio) if twilio is not None else None
+    return NotificationDispatcher(queue, Notifier(email, sms), **kwargs)
+
+
+def test_email_is_delivered_through_smtp(queue, smtp):
+    dispatcher = _dispatcher(queue, smtp)
+    assert queue.enqueue("email", "jane@doe.com", "See you soon", "Confirmation", "a1:email:confirmation")
+    assert dispatcher.run_once() == 1
+    job = queue.status("a1:email:confirmation")
+    assert (job["status"], job["attempts"], job["last_error"]) == (SENT, 1, "")
+    (rcpt, content), = smtp[1].messages
+    assert rcpt == ["jane@doe.com"] and "Subject: Confirmation" in content and "See you soon" in content
+    dispatcher.notifier.close()
+
+
+def test_failed_sms_is_retried_with_exponential_backoff(queue, clock):
+    twilio = FakeTwilio(failures=2)
+    dispatcher = _dispatcher(queue, twilio=twilio, backoff_base=30, backoff_cap=3600)
+    queue.enqueue("sms", "+15551234567", "hello", dedupe_key="a1:sms:confirmation")
+    start = clock.now
+
+    assert dispatcher.run_once() == 1
+    job = queue.status("a1:sms:confirmation")
+    assert (job["status"], job["attempts"], job["next_attempt_at"]) == (PENDING, 1, start + 30)
+    assert "twilio unavailable" in job["last_error"]
+    assert dispatcher.run_once() == 0  # not due yet
+
+    clock.now = start + 30
+    assert dispatcher.run_once() == 1
+    job = queue.status("a1:sms:confirmation")
+    assert (job["status"], job["attempts"], job["next_attempt_at"]) == (PENDING, 2, start + 30 + 60)
+
+    clock.now = start + 90
+    assert dispatcher.run_once() == 1
+    job = queue.status("a1:sms:confirmation")
+    assert (job["status"], job["attempts"]) == (SENT, 3)
+    assert twilio.sent == [("+15551234567", "hello")]
+
+
+def test_backoff_is_capped():
+    dispatcher = NotificationDispatcher(None, Notifier(), backoff_base=30, backoff_cap=100)
+    assert [dispatcher.backoff(n) for n in (1, 2, 3, 4)] == [30, 60, 100, 100]
+
+
+def test_job_fails_permanently_after_max_attempts(queue, clock):
+    dispatcher = _dispatcher(queue, twilio=FakeTwilio(failures=10), max_attempts=3, backoff_base=10)
+    queue.enqueue("sms", "+15551234567", "hello", dedupe_key="a1:sms:reminder-24h")
+    for _ in range(3):
+        assert dispatcher.run_once() == 1
+        clock.now += 1000
+    job = queue.status("a1:sms:reminder-24h")
+    assert (job["status"], job["attempts"]) == (FAILED, 3)
+    assert dispatcher.run_once() == 0
+    assert queue.counts() == {FAILED: 1}
+
+
+def test_unreachable_smtp_server_is_retried(queue, clock):
+    port = _free_port()  # nothing listens here
+    pool = SMTPConnectionPool("127.0.0.1", port, use_tls=False, timeout=2)
+    dispatcher = NotificationDispatcher(queue, Notifier(EmailSender("clinic@example.com", "", "127.0.0.1", port,
+                                                                    pool=pool)))
+    queue.enqueue("email", "jane@doe.com", "hi", "subject", "a1:email:confirmation")
+    dispatcher.run_once()
+    job = queue.status("a1:email:confirmation")
+    assert (job["status"], job["attempts"]) == (PENDING, 1)
+    assert job["next_attempt_at"] == clock.now + dispatcher.backoff(1)
+
+
+def test_dedupe_key_suppresses_a_second_send(queue, smtp):
+    dispatcher = _dispatcher(queue, smtp)
+    assert queue.enqueue("email", "jane@doe.com", "first", "Confirmation", "a1:email:confirmation")
+    assert not queue.enqueue("email", "jane@doe.com", "again", "Confirmation", "a1:email:confirmation")
+    assert queue.enqueue_many([
+        {"channel": "email", "recipient": "jane@doe.com", "body": "again", "dedupe_key": "a1:email:confirmation"},
+        {"channel": "email", "recipient": "jane@doe.com", "body": "reminder", "dedupe_key": "a1:email:reminder-24h"},
+    ]) == 1
+    assert dispatcher.run_once() == 2
+    dispatcher.run_once()  # rerun after delivery: nothing left
+    assert not queue.enqueue("email", "jane@doe.com", "after", "Confirmation", "a1:email:confirmation")
+    assert dispatcher.run_once() == 0
+    bodies = [content for _, content in smtp[1].messages]
+    assert len(bodies) == 2 and not any("again" in b or "after" in b for b in bodies)
+    dispatcher.notifier.close()
+
+
+def test_status_transitions_and_lease_expiry(queue, clock):
+    queue.enqueue("sms", "+15551234567", "hello", dedupe_key="k")
+    assert queue.status("k")["status"] == PENDING
+    job, = queue.claim(10)
+    assert queue.status("k")["status"] == SENDING
+    assert queue.claim(10) == []  # leased to the first worker
+
+    clock.now += 61  # the worker died: the lease runs out and the job is claimable again
+    again, = queue.claim(10)
+    assert again["id"] == job["id"]
+    queue.mark_sent(job["id"])
+    assert queue.status("k")["status"] == SENT
+    assert queue.claim(10) == []
+
+
+def test_background_dispatcher_delivers_queued_jobs(queue):
+    twilio = FakeTwilio()
+    dispatcher = _dispatcher(queue, twilio=twilio, workers=2, poll_interval=0.05)
+    dispatcher.start()
+    try:
+        for i in range(5):
+            dispatcher.enqueue("sms", f"+1555000000{i}", f"msg {i}", dedupe_key=f"k{i}")
+        for _ in range(100):
+            if queue.counts().get(SENT) == 5:
+                break
+            time.sleep(0.02)
+    finally:
+        dispatcher.stop(timeout=5)
+    assert queue.counts() == {SENT: 5}
+    assert sorted(body for _, body in twilio.sent) == [f"msg {i}" for i in range(5)]
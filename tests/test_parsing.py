@@ -0,0 +1,54 @@
+from datetime import date
+
+import pytest
+
+from appointment_agent.parsing import AMBIGUOUS, UNLABELLED, normalize_dob, normalize_phone, parse_insurance, parse_patient
+
+from .parser_corpus import INSURANCE_CORPUS, PATIENT_CORPUS
+
+
+@pytest.mark.parametrize("text, expected, missing", PATIENT_CORPUS)
+def test_patient_corpus(text, expected, missing):
+    result = parse_patient(text)
+    assert {k: result[k] for k in expected} == expected
+    assert sorted(result.missing) == sorted(missing)
+
+
+@pytest.mark.parametrize("text, expected, missing", INSURANCE_CORPUS)
+def test_insurance_corpus(text, expected, missing):
+    result = parse_insurance(text)
+    assert {k: result[k] for k in expected} == expected
+    assert sorted(result.missing) == sorted(missing)
+
+
+def test_labels_match_in_any_case_including_non_ascii_text():
+    # "İ" lowercases to two characters, so this message takes the IGNORECASE scan
+    result = parse_patient("NAME: İlker Öz, DOB: 1990-01-15, EMAIL: ilker@example.com")
+    assert (result["dob"], result["email"]) == ("1990-01-15", "ilker@example.com")
+    assert parse_patient("NAME: Ann Lee, D.O.B.: 1990-01-15")["name"] == "Ann Lee"
+
+
+def test_dob_formats_and_confidence():
+    today = date(2026, 10, 18)
+    assert normalize_dob("1990-01-15", today) == ("1990-01-15", 1.0)
+    assert normalize_dob("03/04/1990", today) == ("1990-03-04", AMBIGUOUS)
+    assert normalize_dob("born on the 3rd March, 1990 in Leeds", today) == ("1990-03-03", 1.0)
+    assert normalize_dob("Sept. 9th, 2001", today) == ("2001-09-09", 1.0)
+    assert normalize_dob("Name: Ravi Kumar, 12 apples, born 1993-10-27", today)[0] == "1993-10-27"
+    assert normalize_dob("2026-10-19", today) == ("", 0.0)  # tomorrow
+    assert normalize_dob("1899-12-31", today) == ("", 0.0)
+
+
+def test_unlabelled_values_have_lower_confidence():
+    result = parse_patient("Name: Jo Smith, born 1990-01-15, jo@smith.com")
+    assert result.confidence["dob"] == UNLABELLED and result.confidence["email"] == UNLABELLED
+
+
+def test_issues_are_reported():
+    assert parse_patient("Name: A B, DOB: 1993-02-30").issues == ["unrecognized date of birth '1993-02-30'"]
+    assert parse_patient("Name: A B, DOB: 1990-01-01, Email: nope").issues == ["invalid email 'nope'"]
+    assert parse_insurance("Insurance: ###, Member ID: 1, Group: 2").issues == ["unreadable insurance carrier '###'"]
+
+
+def test_phone_whitespace_is_dropped():
+    assert normalize_phone("+44\t20 7946 0958") == "+442079460958"
@@ -0,0 +1,31 @@
+import csv
+
+from appointment_agent.patient_import import import_patients, load_registry
+
+
+def _write(path, rows, header=("name", "dob", "email", "phone")):
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def test_registry_rows_are_normalized_before_matching(tmp_path):
+    registry = tmp_path / "patients.csv"
+    _write(registry, [
+        ["Jane  Doe", "01/15/1990", "jane@doe.com", "(555) 123-4567"],
+        ["John Roe", "1985-03-02", "john@roe.com", "+1 555 000 1111"],
+    ])
+    keys = load_registry(str(registry), 10)
+    assert keys[("jane doe", "1990-01-15")] == ("jane@doe.com", "5551234567")
+
+    export = tmp_path / "export.csv"
+    _write(export, [
+        ["Jane Doe", "1990-01-15", "JANE@doe.com", "555-123-4567"],
+        ["John Roe", "03/02/1985", "john@roe.com", "+15550001111"],
+        ["New Person", "2000-12-31", "new@x.com", ""],
+    ])
+    result = import_patients([str(export)], str(registry), chunk_rows=2)
+    assert (result.added, result.duplicates, result.conflicts) == (1, 2, 0)
+    with open(registry, encoding="utf-8") as fh:
+        assert sum(1 for _ in fh) == 4
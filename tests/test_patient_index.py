@@ -0,0 +1,52 @@
+import os
+
+from appointment_agent.ledger import append_csv_row
+from appointment_agent.patient_index import PATIENT_COLUMNS, PatientIndex
+
+
+def _registry(tmp_path, *rows):
+    path = tmp_path / "patients.csv"
+    path.write_text("name,dob,email,phone\n" + "".join(f"{r}\n" for r in rows))
+    return str(path)
+
+
+def test_lookup_is_normalized_and_returns_contact_info(tmp_path):
+    index = PatientIndex(_registry(tmp_path, "Jane Doe,1990-01-15,jane@doe.com,+15550001234",
+                                   " John Roe ,1985-06-01,nan,"))
+    assert index.get("  jane DOE", "1990-01-15") == {"name": "Jane Doe", "dob": "1990-01-15",
+                                                    "email": "jane@doe.com", "phone": "+15550001234"}
+    assert index.get("John Roe", "1985-06-01")["email"] == ""
+    assert index.get("Jane Doe", "1990-01-16") is None
+
+
+def test_appended_rows_are_read_from_the_tail(tmp_path):
+    path = _registry(tmp_path, "Jane Doe,1990-01-15,jane@doe.com,+15550001234")
+    index = PatientIndex(path)
+    offset = index._offset
+    with open(path, "a") as fh:  # another process appends, and leaves a line half-written
+        fh.write("Ann Lee,2000-02-02,ann@lee.com,+15550009999\nBob")
+    assert index.get("Ann Lee", "2000-02-02") is not None and len(index) == 2
+    assert index._offset == offset + len("Ann Lee,2000-02-02,ann@lee.com,+15550009999\n")
+    with open(path, "a") as fh:
+        fh.write(" Ray,1970-07-07,bob@ray.com,\n")
+    assert index.get("Bob Ray", "1970-07-07")["email"] == "bob@ray.com"
+
+
+def test_replaced_file_is_reloaded(tmp_path):
+    path = _registry(tmp_path, "Jane Doe,1990-01-15,jane@doe.com,+15550001234")
+    index = PatientIndex(path)
+    new = tmp_path / "new.csv"
+    new.write_text("name,dob,email,phone\nJohn Roe,1985-06-01,john@roe.com,+15550004321\n")
+    os.replace(new, path)
+    assert index.get("Jane Doe", "1990-01-15") is None
+    assert index.get("John Roe", "1985-06-01") is not None and len(index) == 1
+
+
+def test_added_patient_is_visible_without_rereading(tmp_path):
+    path = _registry(tmp_path)
+    index = PatientIndex(path)
+    patient = {"name": "Jane Doe", "dob": "1990-01-15", "email": "jane@doe.com", "phone": "+15550001234"}
+    append_csv_row(path, PATIENT_COLUMNS, patient)
+    index.add(patient)
+    assert index.get("jane doe", "1990-01-15") == patient
+    assert len(index) == 1  # the refresh that parses the appended tail doesn't add it twice
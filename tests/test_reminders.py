@@ -0,0 +1,137 @@
+from datetime import datetime
+
+from appointment_agent.ledger import BOOKED, CANCELLED, RESCHEDULED, AppointmentLedger
+from appointment_agent.notifications import NotificationQueue
+from appointment_agent.reminders import ReminderScheduler, reminder_jobs
+from tests.conftest import Clock
+
+NOW = datetime(2026, 10, 20, 8, 0).timestamp()
+
+
+def _setup(tmp_path, clock):
+    ledger = AppointmentLedger(str(tmp_path / "final.jsonl"))
+    queue = NotificationQueue(str(tmp_path / "notifications.db"), clock=clock)
+    return ledger, queue, ReminderScheduler(ledger, queue, clock=clock)
+
+
+def _record(appointment_id, status=BOOKED, day="2026-10-22", time="10:00"):
+    return {"name": "Jane Doe", "dob": "1990-01-15", "email": "jane@doe.com", "phone": "+15550001234",
+            "date": day, "time": time, "doctor": "Dr. Lee", "location": "Main", "appointment_id": appointment_id,
+            "status": status}
+
+
+def test_rebooking_a_cancelled_slot_gets_its_own_reminders(tmp_path):
+    clock = Clock(NOW)
+    ledger, queue, scheduler = _setup(tmp_path, clock)
+    ledger.append(_record("first"))
+    scheduler.rebuild()
+    clock.now = datetime(2026, 10, 21, 10, 0).timestamp()
+    assert scheduler.run_due() == 2  # 24h email + SMS
+
+    ledger.extend([_record("first", CANCELLED), _record("second")])
+    clock.now = datetime(2026, 10, 22, 7, 0).timestamp()
+    scheduler.poll_ledger()
+    assert scheduler.run_due() == 2  # 3h for the new booking only
+    assert queue.status("second:2026-10-22T10:00:email:reminder-3h") is not None
+    assert queue.status("first:2026-10-22T10:00:email:reminder-3h") is None
+
+
+def test_rescheduled_appointment_is_reminded_at_its_new_time(tmp_path):
+    clock = Clock(NOW)
+    ledger, queue, scheduler = _setup(tmp_path, clock)
+    ledger.append(_record("a1"))
+    scheduler.rebuild()
+    clock.now = datetime(2026, 10, 21, 10, 0).timestamp()
+    scheduler.run_due()
+    ledger.append(_record("a1", RESCHEDULED, time="14:00"))
+    scheduler.poll_ledger()
+    clock.now = datetime(2026, 10, 21, 14, 0).timestamp()
+    assert scheduler.run_due() == 2
+    assert queue.status("a1:2026-10-22T14:00:sms:reminder-24h") is not None
+
+
+def test_legacy_records_without_an_id_keep_the_old_key():
+    record = _record("")
+    keys = [job["dedupe_key"] for job in reminder_jobs(record, "24h")]
+    assert keys == ["Jane Doe|1990-01-15|2026-10-22|10:00|Dr. Lee:email:reminder-24h",
+                    "Jane Doe|1990-01-15|2026-10-22|10:00|Dr. Lee:sms:reminder-24h"]
+
+
+def test_reminders_fire_24h_3h_and_30min_before(tmp_path):
+    clock = Clock(NOW)
+    ledger, queue, scheduler = _setup(tmp_path, clock)
+    ledger.append(_record("a1"))  # 2026-10-22 10:00
+    assert scheduler.rebuild() == 3
+    fired = []
+    for when in (datetime(2026, 10, 21, 9, 59), datetime(2026, 10, 21, 10, 0), datetime(2026, 10, 22, 6, 59),
+                 datetime(2026, 10, 22, 7, 0), datetime(2026, 10, 22, 9, 30)):
+        clock.now = when.timestamp()
+        fired.append(scheduler.run_due())
+    assert fired == [0, 2, 0, 2, 2]
+    assert len(scheduler) == 0 and scheduler.next_due() is None
+    assert queue.status("a1:2026-10-22T10:00:sms:reminder-30min") is not None
+
+
+def test_restart_does_not_resend_reminders(tmp_path):
+    clock = Clock(datetime(2026, 10, 21, 10, 5).timestamp())
+    ledger, queue, scheduler = _setup(tmp_path, clock)
+    ledger.append(_record("a1"))
+    scheduler.rebuild()
+    assert scheduler.run_due() == 2
+
+    restarted = ReminderScheduler(ledger, queue, clock=clock)
+    assert restarted.rebuild() == 3  # the 24h reminder is still within the grace period
+    assert restarted.run_due() == 0  # but its jobs are already queued
+    assert queue.counts() == {"pending": 2}
+
+
+def test_reminders_missed_during_downtime_respect_the_grace_period(tmp_path):
+    clock = Clock(NOW)
+    ledger, queue, scheduler = _setup(tmp_path, clock)
+    ledger.extend([_record("early", time="09:50"), _record("late", time="10:05")])
+    # Down until 09:45 on the day: the 24h and 3h reminders are long overdue and the
+    # 30min ones are 25 and 10 minutes overdue; only the last is within the 15 minute grace.
+    clock.now = datetime(2026, 10, 22, 9, 45).timestamp()
+    assert scheduler.rebuild() == 1
+    assert scheduler.run_due() == 2
+    assert queue.status("late:2026-10-22T10:05:email:reminder-30min") is not None
+    assert queue.status("early:2026-10-22T09:50:email:reminder-30min") is None
+
+
+def test_new_appointments_are_picked_up_from_the_ledger(tmp_path):
+    clock = Clock(NOW)
+    ledger, _, scheduler = _setup(tmp_path, clock)
+    scheduler.rebuild()
+    assert scheduler.next_due() is None
+    ledger.append(_record("a1"))
+    assert scheduler.poll_ledger() == 3
+    assert scheduler.next_due() == datetime(2026, 10, 21, 10, 0).timestamp()
+
+
+def test_rebuild_from_a_snapshot(tmp_path):
+    clock = Clock(NOW)
+    ledger, queue, scheduler = _setup(tmp_path, clock)
+    ledger.extend(_record(f"a{i}", time=f"{9 + i:02d}:00") for i in range(3))
+    ledger.append(_record("a1", CANCELLED, time="10:00"))
+    ledger.compact()
+    ledger.append(_record("a3", time="14:00"))
+    assert scheduler.rebuild() == 15  # a1's are dropped when they come due
+    clock.now = datetime(2026, 10, 22, 8, 0).timestamp()
+    # 24h and 3h for a0 and a2, 24h for a3 (from the tail); nothing for cancelled a1
+    assert scheduler.run_due() == 5 * 2
+    assert queue.status("a1:2026-10-22T10:00:sms:reminder-24h") is None
+
+
+def test_run_forever_sleeps_until_the_next_reminder(tmp_path):
+    clock = Clock(datetime(2026, 10, 21, 9, 59, 50).timestamp())
+    ledger, queue, scheduler = _setup(tmp_path, clock)
+    ledger.append(_record("a1"))
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    scheduler.run_forever(poll_interval=60, sleep=sleep, stop=lambda: len(sleeps) >= 2)
+    assert sleeps[0] == 10  # woke for the 24h reminder rather than the full poll interval
+    assert queue.counts() == {"pending": 2}
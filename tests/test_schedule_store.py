@@ -0,0 +1,22 @@
+from appointment_agent.schedule_store import Booking, BookingStatus, ScheduleStore
+from tests.conftest import DAY
+
+
+def test_empty_times_is_no_such_slot(store):
+    assert store.book(DAY, [], "Jane Doe", 30, "returning", "Dr. Lee") == BookingStatus.NO_SUCH_SLOT
+    statuses = store.book_many([Booking(DAY, (), "Jane Doe", 30, "returning", "Dr. Lee", ""),
+                                Booking(DAY, ("09:00",), "John Roe", 30, "returning", "Dr. Lee", "")])
+    assert statuses == [BookingStatus.NO_SUCH_SLOT, BookingStatus.BOOKED]
+    assert [s["patient"] for s in store.day_slots(DAY, "Dr. Lee")] == ["John Roe"] + [""] * 5
+
+
+def test_move_to_no_times_keeps_the_appointment(store):
+    store.book(DAY, ["09:30"], "Jane Doe", 30, "returning", "Dr. Lee", "a1")
+    assert store.move("a1", DAY, [], "Dr. Lee") == (BookingStatus.NO_SUCH_SLOT, None)
+    assert store.appointment("a1").times == ("09:30",)
+
+
+def test_missing_days(store):
+    assert store.missing_days([DAY, "2026-10-23"], "Dr. Lee") == ["2026-10-23"]
+    assert store.missing_days([], "Dr. Lee") == []
+    assert ScheduleStore.missing_days(store, [], "Dr. Lee") == []
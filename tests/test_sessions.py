@@ -0,0 +1,90 @@
+import json
+import sqlite3
+from datetime import date
+
+import pytest
+
+from appointment_agent.sessions import (
+    HISTORY, MemorySessionStore, SessionConflict, SessionSweeper, SQLiteSessionStore, checkpoint_delta,
+    trim_history,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def sessions(request, tmp_path, clock):
+    if request.param == "memory":
+        return MemorySessionStore(clock=clock)
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), clock=clock)
+
+
+def _state(messages=3):
+    return {"current_node": "greet", "patient": {"name": "Jane Doe"},
+            HISTORY: [("Assistant" if i % 2 == 0 else "User", f"m{i}") for i in range(messages)]}
+
+
+def test_a_save_writes_only_what_the_turn_changed(sessions):
+    session_id = sessions.create(_state())
+    state, version = sessions.load(session_id)
+    assert checkpoint_delta(state) == ({}, [], 3, [])
+    state["current_node"] = "date"
+    state["appointment_date"] = date(2026, 10, 22)
+    del state["patient"]
+    state[HISTORY].append(("User", "m3"))
+    assert checkpoint_delta(state) == ({"current_node": '"date"', "appointment_date": '"2026-10-22"'},
+                                       ["patient"], 3, [("User", "m3")])
+    assert sessions.save(session_id, state, version) == version + 1
+    assert checkpoint_delta(state) == ({}, [], 4, [])
+
+    resumed, version = sessions.load(session_id)
+    assert version == 2 and resumed["appointment_date"] == date(2026, 10, 22) and "patient" not in resumed
+    assert resumed[HISTORY] == [m[1:] for m in sessions.history(session_id, limit=10)]
+
+
+def test_a_stale_save_is_refused(sessions):
+    session_id = sessions.create(_state())
+    first, version = sessions.load(session_id)
+    second, _ = sessions.load(session_id)
+    first["current_node"] = "date"
+    sessions.save(session_id, first, version)
+    second["current_node"] = "doctor"
+    with pytest.raises(SessionConflict):
+        sessions.save(session_id, second, version)
+    assert sessions.load(session_id)[0]["current_node"] == "date"
+
+
+def test_resume_with_the_last_page_and_page_back(sessions):
+    session_id = sessions.create(_state(messages=7))
+    state, version = sessions.load(session_id, history=2)
+    assert state[HISTORY] == [("User", "m5"), ("Assistant", "m6")]
+    state[HISTORY].append(("User", "m7"))
+    version = sessions.save(session_id, state, version)
+    trim_history(state, 1)
+    state[HISTORY].append(("Assistant", "m8"))
+    sessions.save(session_id, state, version)
+
+    assert [seq for seq, _, _ in sessions.history(session_id, limit=100)] == list(range(9))
+    assert [text for _, _, text in sessions.history(session_id, before=5, limit=2)] == ["m3", "m4"]
+    assert sessions.load(session_id, history=0)[0][HISTORY] == []
+
+
+def test_idle_sessions_are_swept(sessions, clock):
+    old = sessions.create(_state())
+    clock.now += 100
+    fresh = sessions.create(_state())
+    assert SessionSweeper(sessions, ttl=50).run_once() == 1
+    assert sessions.load(old) is None and sessions.history(old) == []
+    assert sessions.load(fresh) is not None
+    assert sessions.delete(fresh) and not sessions.delete(fresh)
+
+
+def test_history_kept_inside_the_state_is_migrated(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE sessions (id TEXT PRIMARY KEY, state TEXT NOT NULL, version INTEGER NOT NULL, "
+                 "updated_at REAL NOT NULL)")
+    conn.execute("INSERT INTO sessions VALUES ('s1', ?, 3, 0)",
+                 (json.dumps({"current_node": "greet", HISTORY: [["Assistant", "hi"], ["User", "yo"]]}),))
+    conn.commit()
+    conn.close()
+    state, version = SQLiteSessionStore(path).load("s1")
+    assert version == 3 and state[HISTORY] == [("Assistant", "hi"), ("User", "yo")]
@@ -0,0 +1,69 @@
+import numpy as np
+
+from appointment_agent.availability import DayAvailability
+from appointment_agent.schedule_store import ScheduleStore
+from appointment_agent.slot_table import Interner, PatientType, SlotTable
+from tests.conftest import DAY, grid
+
+D2 = "2026-10-23"
+COLUMNS = ["date", "time", "patient", "duration", "patient_type", "doctor", "location"]
+
+
+def _store(make_store):
+    store = make_store(rows=grid() + grid(DAY, "Dr. Smith", "North") + grid(D2, "Dr. Smith", "South"))
+    store.book(DAY, ["09:30", "10:00"], "Jane Doe", 60, "New", "Dr. Lee")
+    store.book(D2, ["11:30"], "John Roe", 30, "Recurring", "Dr. Smith")
+    return store
+
+
+def test_columns_are_typed_and_sorted(make_store):
+    table = _store(make_store).slot_table(DAY, D2)
+    assert [getattr(table, c).dtype for c in ("day", "minute", "duration", "patient_type", "patient", "doctor",
+                                              "location")] == [np.int32, np.int16, np.int16, np.int8, np.int32,
+                                                               np.int16, np.int16]
+    assert len(table) == 18 and table.nbytes == 18 * 17
+    keys = list(zip(table.day.tolist(), table.doctor.tolist(), table.minute.tolist()))
+    assert keys == sorted(keys)
+
+
+def test_round_trip_matches_the_store_rows(make_store):
+    store = _store(make_store)
+    rows = sorted(store.iter_slots(DAY, D2), key=lambda r: (r["date"], r["doctor"], r["time"]))
+    expected = [[r[c] or (0 if c == "duration" else "") for c in COLUMNS] for r in rows]
+    sqlite_table = store.slot_table(DAY, D2)
+    generic_table = ScheduleStore.slot_table(store, DAY, D2)  # SlotTable.from_rows over iter_slots
+    for table in (sqlite_table, generic_table):
+        assert table.to_dataframe()[COLUMNS].values.tolist() == expected
+
+
+def test_availability_matches_day_availability_from_slots(make_store):
+    store = _store(make_store)
+    index = store.slot_table(DAY, D2).availability(30)
+    assert sorted(index) == [("Dr. Lee", DAY), ("Dr. Smith", DAY), ("Dr. Smith", D2)]
+    for (doctor, day), avail in index.items():
+        assert avail.free == DayAvailability.from_slots(day, store.day_slots(day, doctor), 30).free
+    assert index[("Dr. Lee", DAY)].free == [(540, 570), (630, 720)]
+    assert store.slot_table(DAY, D2).day_locations() == {
+        ("Dr. Lee", DAY): "Main", ("Dr. Smith", DAY): "North", ("Dr. Smith", D2): "South",
+    }
+
+
+def test_empty_table():
+    table = SlotTable.from_rows([])
+    assert len(table) == 0 and table.availability(30) == {} and table.day_locations() == {}
+    assert table.to_dataframe().empty
+
+
+def test_patient_ids_are_stable_across_tables_sharing_an_interner(make_store):
+    store, patients = _store(make_store), Interner()
+    first = SlotTable.from_rows(store.iter_slots(DAY, DAY), patients)
+    second = SlotTable.from_rows(store.iter_slots(D2, D2), patients)
+    jane, john = patients.ids["Jane Doe"], patients.ids["John Roe"]
+    assert set(first.patient.tolist()) == {0, jane} and set(second.patient.tolist()) == {0, john}
+
+
+def test_patient_type_labels():
+    assert [PatientType.from_label(s) for s in ("New", " recurring ", "", None, "other")] == [
+        PatientType.NEW, PatientType.RECURRING, PatientType.NONE, PatientType.NONE, PatientType.NONE,
+    ]
+    assert [t.label for t in PatientType] == ["", "New", "Recurring"]
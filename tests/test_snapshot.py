@@ -0,0 +1,55 @@
+import os
+import threading
+
+from appointment_agent.snapshot import load_snapshot
+from tests.conftest import DAY
+
+
+def _fill(ledger, n=50):
+    ledger.extend({"name": f"P{i}", "date": DAY, "time": "09:00", "duration": 30,
+                   "appointment_id": f"id{i}", "status": "booked"} for i in range(n))
+
+
+def test_concurrent_compactions_leave_a_loadable_snapshot(ledger):
+    _fill(ledger)
+    errors = []
+
+    def compact():
+        try:
+            for _ in range(10):
+                ledger.compact()
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=compact) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    snap = load_snapshot(ledger.snapshot_dir)
+    assert snap is not None and len(snap) == 50
+    assert ledger.find("id7")["name"] == "P7"
+
+
+def test_previous_generation_survives_a_compaction(ledger):
+    _fill(ledger)
+    ledger.compact()
+    before = load_snapshot(ledger.snapshot_dir)
+    ledger.compact()
+    for name in before.meta["files"].values():
+        assert os.path.exists(os.path.join(ledger.snapshot_dir, name))
+
+
+def test_missing_column_file_loads_as_no_snapshot(ledger):
+    _fill(ledger)
+    ledger.compact()
+    meta = load_snapshot(ledger.snapshot_dir).meta
+    os.remove(os.path.join(ledger.snapshot_dir, meta["files"]["name"]))
+    assert load_snapshot(ledger.snapshot_dir) is None
+    snap, tail, _ = ledger.load()
+    assert snap is None and len(tail) == 50
+    assert ledger.find("id3")["name"] == "P3"
+    assert len(ledger.to_dataframe(current=True)) == 50
+    ledger.compact()  # recovers
+    assert len(load_snapshot(ledger.snapshot_dir)) == 50
@@ -0,0 +1,53 @@
+from appointment_agent.schedule_store import BookingStatus, SQLiteScheduleStore
+from appointment_agent.summary import DaySummary, ScheduleSummary
+from tests.conftest import DAY
+
+
+class RacingStore(SQLiteScheduleStore):
+    """Commits a booking right after the next ``day_version`` read, like another replica would."""
+
+    pending = None
+
+    def day_version(self, day_str):
+        version = super().day_version(day_str)
+        if self.pending:
+            booking, self.pending = self.pending, None
+            assert self.book(*booking) == BookingStatus.BOOKED
+        return version
+
+
+def _fresh(store):
+    version, rows = store.day_snapshot(DAY)
+    return DaySummary.build(DAY, version, rows, 30, (30, 60))
+
+
+def test_booking_between_version_and_rows_is_not_applied_twice(make_store):
+    store = make_store(RacingStore)
+    summary = ScheduleSummary(store, 30, (30, 60))
+    store.pending = (DAY, ["09:00", "09:30"], "Jane Doe", 60, "new", "Dr. Lee")
+    day = summary.day(DAY)
+    assert day.booked == 1
+
+    summary.record_booking(DAY, "09:00", "Jane Doe", 60, "new", "Dr. Lee", "Main")
+    day = summary.day(DAY)
+    fresh = _fresh(store)
+    assert (day.booked, day.available(30), day.available(60)) == (1, 4, 3)
+    assert (fresh.booked, fresh.available(30), fresh.available(60)) == (1, 4, 3)
+
+
+def test_own_booking_is_folded_into_the_cached_day(store):
+    summary = ScheduleSummary(store, 30, (30, 60))
+    cached = summary.day(DAY)
+    assert store.book(DAY, ["10:00"], "Jane Doe", 30, "returning", "Dr. Lee") == BookingStatus.BOOKED
+    summary.record_booking(DAY, "10:00", "Jane Doe", 30, "returning", "Dr. Lee", "Main")
+    assert summary.day(DAY) is cached
+    assert (cached.booked, cached.available(30), cached.available(60)) == (1, 5, 3)
+    assert cached.version == store.day_version(DAY)
+
+
+def test_snapshot_version_matches_its_rows(store):
+    before, _ = store.day_snapshot(DAY)
+    store.book(DAY, ["11:00", "11:30"], "Jane Doe", 60, "new", "Dr. Lee")
+    version, rows = store.day_snapshot(DAY)
+    assert version == store.day_version(DAY) == before + 2
+    assert [r["time"] for r in rows if r["patient"]] == ["11:00", "11:30"]
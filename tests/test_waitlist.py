@@ -0,0 +1,128 @@
+from datetime import datetime
+
+import pytest
+
+from appointment_agent.changes import cancel_appointment, offer_to_waitlist, reschedule_appointment
+from appointment_agent.waitlist import Waitlist
+from tests.conftest import DAY, DOCTOR, Clock
+
+NOW = datetime(2026, 10, 20, 8, 0)
+
+
+@pytest.fixture
+def clock():
+    return Clock(NOW.timestamp())
+
+
+@pytest.fixture
+def open_waitlist(tmp_path, clock):
+    return lambda: Waitlist(str(tmp_path / "waitlist.db"), 30, clock)
+
+
+@pytest.fixture
+def waitlist(open_waitlist):
+    return open_waitlist()
+
+
+def _add(waitlist, name, duration=30, doctor="", priority=0, first_day=DAY, last_day=DAY):
+    return waitlist.add(name, "1990-01-15", "Recurring" if duration == 30 else "New", duration, first_day, last_day,
+                        doctor, priority=priority)
+
+
+def _live_entries(waitlist, request_id):
+    """Heap entries of ``request_id`` that ``best`` would still act on."""
+    return sum(1 for heap in waitlist._heaps.values() for _, _, rid, gen in heap
+               if rid == request_id and rid in waitlist._requests and gen == waitlist._generations[rid])
+
+
+def test_best_follows_priority_then_age_and_take_claims_once(waitlist, clock):
+    first = _add(waitlist, "First")
+    clock.now += 1
+    urgent = _add(waitlist, "Urgent", priority=-1)
+    _add(waitlist, "Too Long", duration=60, priority=-5)
+    assert waitlist.best(DAY, DOCTOR, 30) == urgent
+    assert waitlist.take(urgent, "a1") and not waitlist.take(urgent, "a2")
+    assert waitlist.best(DAY, DOCTOR, 30) == first
+    assert waitlist.best(DAY, "Dr. Other", 30) == first  # any doctor will do
+    assert waitlist.best("2026-10-23", DOCTOR, 30) is None
+
+
+def test_restore_puts_a_request_back_once(waitlist):
+    request = _add(waitlist, "Jane Doe", first_day="2026-10-21", last_day=DAY)
+    assert waitlist.take(request, "a1")
+    waitlist.restore(request)
+    waitlist.restore(request)
+    waitlist.refresh()
+    assert waitlist.best(DAY, DOCTOR, 30) == request and len(waitlist) == 1
+    assert _live_entries(waitlist, request.id) == 2  # one per day of the window
+    assert waitlist.take(request, "a2")
+    assert waitlist.best(DAY, DOCTOR, 30) is None and waitlist.best("2026-10-21", DOCTOR, 30) is None
+
+
+def test_refresh_follows_changes_made_by_another_process(waitlist, open_waitlist):
+    other = open_waitlist()
+    request = _add(other, "Jane Doe")
+    waitlist.refresh()
+    assert waitlist.best(DAY, DOCTOR, 30) == request
+
+    assert other.take(request, "a1")
+    waitlist.refresh()
+    assert waitlist.best(DAY, DOCTOR, 30) is None
+
+    other.restore(request)  # the booking fell through over there
+    waitlist.refresh()
+    assert waitlist.best(DAY, DOCTOR, 30) == request and _live_entries(waitlist, request.id) == 1
+
+    assert other.withdraw(request.id) and not other.withdraw(request.id)
+    waitlist.refresh()
+    assert waitlist.best(DAY, DOCTOR, 30) is None and len(waitlist) == 0
+
+
+def test_requests_saved_before_change_tracking_are_indexed(tmp_path, clock):
+    path = str(tmp_path / "waitlist.db")
+    old = Waitlist(path, 30, clock)
+    request = _add(old, "Jane Doe")
+    old._conn().execute("UPDATE requests SET changed_at = 0")
+    fresh = Waitlist(path, 30, clock)
+    fresh.refresh()
+    assert fresh.best(DAY, DOCTOR, 30) == request
+
+
+def test_backfill_books_the_best_requests_that_fit(waitlist, store):
+    long_visit = _add(waitlist, "Long Visit", duration=60)
+    short_visit = _add(waitlist, "Short Visit", priority=1)
+    other_doctor = _add(waitlist, "Other Doctor", doctor="Dr. Other", priority=-1)
+    filled = waitlist.backfill(store, DAY, DOCTOR, 9 * 60, 10 * 60 + 30)
+    assert [(b.request, b.time) for b in filled] == [(long_visit, "09:00"), (short_visit, "10:00")]
+    rows = {s["time"]: s for s in store.day_slots(DAY, DOCTOR)}
+    assert [rows[t]["patient"] for t in ("09:00", "09:30", "10:00", "10:30")] == [
+        "Long Visit", "Long Visit", "Short Visit", ""]
+    assert store.appointment(filled[0].appointment_id).times == ("09:00", "09:30")
+    assert waitlist.best(DAY, "Dr. Other", 30) == other_doctor
+
+
+def test_backfill_restores_a_request_when_the_gap_was_taken(waitlist, store):
+    request = _add(waitlist, "Jane Doe", duration=60)
+    store.book(DAY, ["09:30"], "Walk In", 30, "Recurring", DOCTOR)
+    assert waitlist.backfill(store, DAY, DOCTOR, 9 * 60, 10 * 60) == []
+    assert waitlist.best(DAY, DOCTOR, 60) == request
+
+
+def test_cancel_and_reschedule_offer_the_freed_time(waitlist, store, ledger):
+    store.book(DAY, ["09:00", "09:30"], "Jane Doe", 60, "New", DOCTOR, "appt-1")
+    store.book(DAY, ["10:00"], "John Roe", 30, "Recurring", DOCTOR, "appt-2")
+    for t in ("10:30", "11:00", "11:30"):
+        store.book(DAY, [t], "Someone", 30, "Recurring", DOCTOR)
+    first, second = _add(waitlist, "Waiting One"), _add(waitlist, "Waiting Two")
+
+    change = cancel_appointment(store, ledger, "appt-1")
+    filled = offer_to_waitlist(waitlist, store, ledger, change.freed, NOW)
+    assert [(b.request, b.time) for b in filled] == [(first, "09:00"), (second, "09:30")]
+    assert [r["name"] for r in ledger if r.get("notes") == "booked from the waitlist"] == ["Waiting One",
+                                                                                         "Waiting Two"]
+
+    third = _add(waitlist, "Waiting Three")
+    store.add_slots([("2026-10-21", "09:00", "", 30, "", DOCTOR, "Main")])
+    change = reschedule_appointment(store, ledger, "appt-2", "2026-10-21", "09:00", 30)
+    filled = offer_to_waitlist(waitlist, store, ledger, change.freed, NOW)
+    assert [(b.request, b.day, b.time) for b in filled] == [(third, DAY, "10:00")]